@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import platform
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from document_processor import SimpleDocumentProcessor
+from chatbot import FinancialAdvisorRAG
+from query_cache import QueryCache
+from ingestion import ingest_files
+from retrieval import ExactSearcher, QuantizedIndex, ranking_agreement
+from document_generator import create_synthetic_corpus
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Queries timed against every corpus
+DEFAULT_QUERIES = [
+    "How should I diversify my portfolio?",
+    "What is tax-loss harvesting?",
+    "How much income do I need in retirement?",
+    "Which sectors do well during an economic expansion?",
+    "How do I manage investment risk?",
+    "What are the contribution limits for HSAs?",
+    "How should I withdraw from retirement accounts?",
+    "What valuation metrics identify undervalued stocks?"
+]
+
+def latency_summary(seconds: List[float]) -> Dict:
+    """Summarize latency samples in milliseconds"""
+    samples = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'count': len(samples),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'max_ms': float(samples.max())
+    }
+
+def peak_rss_mb(who: str = 'self') -> Optional[float]:
+    """Return the peak resident set size of this process or its children in MB"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == 'self' else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return usage.ru_maxrss / scale
+
+def matrix_nbytes(matrix) -> int:
+    """Return the bytes held by a sparse matrix's data, indices and indptr"""
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+def precision_report(processor, queries: List[str], k: int = 10, sample_chunks: int = 200,
+                     precisions: Tuple[str, ...] = ('float32', 'uint16', 'uint8'), seed: int = 0) -> Dict:
+    """Compare reduced-precision indexes with the float64 matrix on memory and ranking agreement
+    
+    The queries are the given ones plus a sample of indexed chunk texts.
+    'bytes' is the searchable structure each weight_dtype keeps in memory,
+    a float32 matrix or quantized postings, in place of the float64 matrix;
+    those modes also keep the raw counts ('counts_bytes') memory-mapped.
+    """
+    vectors = processor.vectors
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(processor.chunks), size=min(sample_chunks, len(processor.chunks)), replace=False)
+    query_vectors = processor._encode_queries(list(queries) + [processor.chunks[row] for row in rows],
+                                              vectors.shape[1])
+    
+    reference = ExactSearcher(vectors)
+    report = {'float64_bytes': matrix_nbytes(vectors), 'counts_bytes': matrix_nbytes(processor._counts)}
+    for precision in precisions:
+        if precision == 'float32':
+            reduced = vectors.astype(np.float32)
+            searcher, nbytes = ExactSearcher(reduced), matrix_nbytes(reduced)
+        else:
+            searcher = QuantizedIndex.from_vectors(vectors, precision)
+            nbytes = searcher.nbytes
+        report[precision] = ranking_agreement(reference, searcher, query_vectors, k)
+        report[precision]['bytes'] = nbytes
+        del searcher
+    return report
+
+def benchmark_corpus(file_paths: List[str], queries: List[str] = DEFAULT_QUERIES, repeats: int = 5,
+                     max_workers: Optional[int] = None) -> Dict:
+    """Ingest a corpus into a new index and time retrieval and response generation against it"""
+    processor = SimpleDocumentProcessor()
+    ingest_report = ingest_files(processor, file_paths, max_workers=max_workers)
+    
+    start_time = time.perf_counter()
+    processor.prepare()
+    build_seconds = time.perf_counter() - start_time
+    
+    search_times = []
+    for _ in range(repeats):
+        for query in queries:
+            start_time = time.perf_counter()
+            processor.search_similar_content(query, k=3)
+            search_times.append(time.perf_counter() - start_time)
+    
+    # Disable the response cache so every call measures retrieval and composition
+    advisor = FinancialAdvisorRAG(processor, cache=QueryCache(max_entries=0))
+    response_times = []
+    for _ in range(repeats):
+        for query in queries:
+            start_time = time.perf_counter()
+            advisor.generate_response(query)
+            response_times.append(time.perf_counter() - start_time)
+    
+    return {
+        'documents': len(processor.documents),
+        'pages': ingest_report['pages'],
+        'chunks': len(processor.document_chunks),
+        'vocabulary': len(processor.vocabulary),
+        'failed': len(ingest_report['failed']),
+        'ingest_seconds': ingest_report['seconds'],
+        'pages_per_second': ingest_report['pages_per_second'],
+        'mb_per_second': ingest_report['mb_per_second'],
+        'build_seconds': build_seconds,
+        'search_latency': latency_summary(search_times),
+        'response_latency': latency_summary(response_times),
+        'precision': precision_report(processor, queries),
+        'peak_rss_mb': peak_rss_mb('self'),
+        'peak_worker_rss_mb': peak_rss_mb('children')
+    }
+
+def run_benchmark(sizes: List[int], output_path: Optional[str] = None, corpus_dir: Optional[str] = None,
+                  pages_per_document: int = 3, queries: List[str] = DEFAULT_QUERIES, repeats: int = 5,
+                  max_workers: Optional[int] = None, seed: int = 0) -> Dict:
+    """Benchmark ingestion and query latency for synthetic corpora of each size
+    
+    Corpora are generated under corpus_dir and reused by later runs with the
+    same settings; without corpus_dir they go to a temporary directory that
+    is removed afterwards. Peak RSS is the high-water mark of the whole
+    process, so sizes are run smallest first.
+    """
+    work_dir = corpus_dir or tempfile.mkdtemp(prefix='rag-benchmark-')
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'pages_per_document': pages_per_document,
+        'repeats': repeats,
+        'queries': len(queries),
+        'runs': []
+    }
+    
+    try:
+        for size in sorted(sizes):
+            directory = os.path.join(work_dir, f"{size}x{pages_per_document}_seed{seed}")
+            paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)) \
+                if os.path.isdir(directory) else []
+            if len(paths) != size:
+                start_time = time.perf_counter()
+                paths = create_synthetic_corpus(directory, size, pages_per_document, seed=seed)
+                logger.info(f"Generated {size} documents in {time.perf_counter() - start_time:.1f}s")
+            
+            run = benchmark_corpus(paths, queries, repeats, max_workers)
+            results['runs'].append(run)
+            logger.info(f"{size} documents: {run['pages_per_second']:.1f} pages/s, "
+                        f"search p95 {run['search_latency']['p95_ms']:.2f}ms, "
+                        f"response p95 {run['response_latency']['p95_ms']:.2f}ms")
+    finally:
+        if corpus_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and retrieval latency")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help="Corpus sizes in documents")
+    parser.add_argument('--pages', type=int, default=3, help="Pages per generated document")
+    parser.add_argument('--repeats', type=int, default=5, help="Times each query is timed")
+    parser.add_argument('--workers', type=int, default=None, help="Ingestion worker processes")
+    parser.add_argument('--corpus-dir', default=None, help="Keep generated corpora here for reuse")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic corpus")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Run the benchmark suite from the command line"""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    run_benchmark(args.sizes, args.output, args.corpus_dir, args.pages,
+                  repeats=args.repeats, max_workers=args.workers, seed=args.seed)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,221 @@
 import logging
 import random
 import re
-from typing import List, Dict
+import time
+import threading
+from collections import Counter
+from typing import List, Dict, Optional
+from query_cache import QueryCache, normalize_query
+from conversation_store import ConversationStore
+from metrics import REGISTRY
+
+# Marks a cache miss in QueryCache lookups
+_MISSING = object()
+
+# Session used when callers do not supply one
+DEFAULT_SESSION = 'default'
 
 class FinancialAdvisorRAG:
     """Financial Advisory Chatbot using RAG architecture with simplified components"""
     
-    def __init__(self, document_processor):
+    def __init__(self, document_processor, cache: Optional[QueryCache] = None,
+                 conversations: Optional[ConversationStore] = None):
         self.document_processor = document_processor
         self.logger = logging.getLogger(__name__)
-        self.conversation_history = []
         
-    def generate_response(self, query: str) -> str:
-        """Generate dynamic responses to financial queries"""
+        # Bounded per-session conversation history
+        self.conversations = conversations if conversations is not None else ConversationStore()
+        
+        # Retrieved content parts per normalized query, k and index version
+        self.cache = cache if cache is not None else QueryCache()
+        
+        # Requests using each processor, so swapped-out ones are closed only once idle
+        self._processor_lock = threading.Lock()
+        self._processor_users = Counter()
+        self._retired = set()
+    
+    @property
+    def conversation_history(self) -> List[Dict]:
+        """Conversation history of the default session"""
+        return self.conversations.get_history(DEFAULT_SESSION)
+    
+    def generate_response(self, query: str, session_id: str = DEFAULT_SESSION,
+                          filters: Optional[Dict] = None) -> str:
+        """Generate dynamic responses to financial queries
+        
+        filters restricts retrieval, e.g. {'topics': ['tax']}; its keys are the
+        filter arguments of search_similar_content.
+        """
+        start_time = time.perf_counter()
+        # Use one index for the whole request, even if a rebuilt one is swapped in meanwhile
+        processor = self._acquire_processor()
         try:
             # Store query in conversation history
-            self.conversation_history.append({"role": "user", "content": query})
-            
-            # Retrieve relevant content
-            relevant_content = self.document_processor.search_similar_content(query, k=3)
+            self.conversations.append(session_id, "user", query)
             
-            if not relevant_content:
-                return "I don't have enough information to answer that question."
+            # Retrieve relevant content, reusing cached results for repeated queries
+            filters = filters or {}
+            key = self._cache_key(query, 3, processor, filters)
+            content_parts = self.cache.get(key, _MISSING)
+            if content_parts is _MISSING:
+                relevant_content = processor.search_similar_content(query, k=3, **filters)
+                
+                if not relevant_content:
+                    return "I don't have enough information to answer that question."
+                
+                with REGISTRY.timer('composition'):
+                    content_parts = self._extract_content_parts(relevant_content)
+                self.cache.put(key, content_parts)
             
-            # Generate response using retrieved content
-            response = self._create_dynamic_response(query, relevant_content)
+            # Generate response using retrieved content; the wording is varied on every call
+            with REGISTRY.timer('composition'):
+                response = self._compose_response(query, content_parts)
             
             # Add to conversation history
-            self.conversation_history.append({"role": "assistant", "content": response})
+            self.conversations.append(session_id, "assistant", response)
             
+            REGISTRY.inc('responses')
+            REGISTRY.observe('response_seconds', time.perf_counter() - start_time)
             return response
-            
+        
         except Exception as e:
             self.logger.error(f"Error generating response: {str(e)}")
+            REGISTRY.inc('errors', stage='response')
             return "I apologize, but I encountered an error processing your question."
+        finally:
+            self._release_processor(processor)
+    
+    def generate_responses(self, queries: List[str]) -> List[str]:
+        """Generate responses to many independent queries with one batched retrieval
+        
+        Batch queries are not recorded in the conversation history.
+        """
+        processor = self._acquire_processor()
+        try:
+            keys = [self._cache_key(query, 3, processor) for query in queries]
+            batch_parts = [self.cache.get(key, _MISSING) for key in keys]
+            
+            # Retrieve only the queries that missed the cache, in one batch
+            misses = [i for i, content_parts in enumerate(batch_parts) if content_parts is _MISSING]
+            if misses:
+                batch_content = processor.search_similar_content_batch(
+                    [queries[i] for i in misses], k=3)
+                for i, relevant_content in zip(misses, batch_content):
+                    batch_parts[i] = None
+                    if relevant_content:
+                        batch_parts[i] = self._extract_content_parts(relevant_content)
+                        self.cache.put(keys[i], batch_parts[i])
             
+            responses = []
+            for query, content_parts in zip(queries, batch_parts):
+                if content_parts is None:
+                    responses.append("I don't have enough information to answer that question.")
+                else:
+                    responses.append(self._compose_response(query, content_parts))
+            
+            return responses
+        
+        except Exception as e:
+            self.logger.error(f"Error generating responses: {str(e)}")
+            return ["I apologize, but I encountered an error processing your question."] * len(queries)
+        finally:
+            self._release_processor(processor)
+    
+    def swap_processor(self, document_processor, close_previous: bool = True):
+        """Atomically replace the document processor, returning the previous one
+        
+        Requests already running keep using the processor they started with.
+        The previous processor is closed, releasing resources such as shard
+        worker processes, as soon as the last of those requests finishes;
+        pass close_previous=False to keep it open for the caller.
+        """
+        with self._processor_lock:
+            previous = self.document_processor
+            self.document_processor = document_processor
+            if not close_previous or previous is None or previous is document_processor:
+                return previous
+            busy = self._processor_users[previous] > 0
+            if busy:
+                self._retired.add(previous)
+        if not busy:
+            self._close_processor(previous)
+        return previous
+    
+    def _acquire_processor(self):
+        """Return the current processor, marking it in use by one more request"""
+        with self._processor_lock:
+            processor = self.document_processor
+            self._processor_users[processor] += 1
+        return processor
+    
+    def _release_processor(self, processor):
+        """Mark a request done with a processor, closing it if it was swapped out meanwhile"""
+        with self._processor_lock:
+            self._processor_users[processor] -= 1
+            if self._processor_users[processor] > 0:
+                return
+            del self._processor_users[processor]
+            if processor not in self._retired:
+                return
+            self._retired.discard(processor)
+        self._close_processor(processor)
+    
+    def _close_processor(self, processor):
+        """Close a processor that is no longer served"""
+        try:
+            if hasattr(processor, 'close'):
+                processor.close()
+        except Exception as e:
+            self.logger.error(f"Error closing swapped-out index: {str(e)}")
+    
+    def _cache_key(self, query: str, k: int, processor, filters: Optional[Dict] = None):
+        """Key cached retrieval results by query text, k, filters and the index they came from"""
+        index_version = getattr(processor, 'index_version', None)
+        if not filters:
+            return (normalize_query(query), k, index_version)
+        filter_key = tuple(sorted((name, value if isinstance(value, str) else tuple(sorted(value))
+                                   if isinstance(value, (list, tuple, set)) else str(value))
+                                  for name, value in filters.items()))
+        return (normalize_query(query), k, index_version, filter_key)
+    
     def _create_dynamic_response(self, query: str, relevant_content: List[Dict]) -> str:
         """Create a dynamic, contextual response based on query and relevant content"""
+        return self._compose_response(query, self._extract_content_parts(relevant_content))
+    
+    def _extract_content_parts(self, relevant_content: List[Dict]) -> List[str]:
+        """Select the distinct sentences of the retrieved content used in a response"""
+        
+        # Extract key information from relevant content
+        content_parts = []
+        for item in relevant_content:
+            content = item['content']
+            if 'sentence_spans' in item:
+                # Sentences were segmented and keyed at ingest time
+                for (start, end), key in zip(item['sentence_spans'], item['sentence_keys']):
+                    content_parts.append((content[start:end], key))
+                continue
+            
+            # Extract sentences that might be relevant
+            sentences = re.split(r'(?<=[.!?])\s+', content)
+            for sentence in sentences:
+                if sentence and len(sentence) > 30:  # Skip very short fragments
+                    content_parts.append((sentence, sentence.lower()))
+        
+        # Remove duplicates while preserving order
+        unique_parts = []
+        seen = set()
+        for part, key in content_parts:
+            if key not in seen:
+                seen.add(key)
+                unique_parts.append(part)
+                if len(unique_parts) == 3:
+                    break
+        
+        # Only the first three parts are used in a response
+        return unique_parts[:3]
+    
+    def _compose_response(self, query: str, unique_parts: List[str]) -> str:
+        """Wrap content parts in a randomly chosen introduction and connectors"""
         
         # Introduction templates
         introductions = [
@@ -64,28 +243,10 @@ class FinancialAdvisorRAG:
                 "For a sound investment strategy, ",
                 "When developing your financial approach, "
             ])
-            
+        
         # Select a random introduction
         introduction = random.choice(introductions)
         
-        # Extract key information from relevant content
-        content_parts = []
-        for item in relevant_content:
-            # Extract sentences that might be relevant
-            content = item['content']
-            sentences = re.split(r'(?<=[.!?])\s+', content)
-            for sentence in sentences:
-                if sentence and len(sentence) > 30:  # Skip very short fragments
-                    content_parts.append(sentence)
-        
-        # Remove duplicates while preserving order
-        unique_parts = []
-        seen = set()
-        for part in content_parts:
-            if part.lower() not in seen:
-                seen.add(part.lower())
-                unique_parts.append(part)
-        
         # Construct the response
         if unique_parts:
             response = introduction + unique_parts[0]
@@ -97,5 +258,5 @@ class FinancialAdvisorRAG:
                     response += " " + random.choice(connectors) + part
         else:
             response = introduction + "I would recommend consulting with a financial advisor for personalized advice on this topic."
-            
+        
         return response
\ No newline at end of file
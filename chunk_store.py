@@ -0,0 +1,289 @@
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Page and character span recorded for chunks added without provenance
+UNKNOWN_PAGE = -1
+UNKNOWN_SPAN = (-1, -1)
+
+def _reserve(array: np.ndarray, size: int) -> np.ndarray:
+    """Return array with room for size rows, doubling its capacity when it must grow"""
+    if len(array) >= size:
+        return array
+    grown = np.empty((max(size, 2 * len(array)),) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def encode_strings(strings: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one UTF-8 buffer and an offsets array with a trailing end offset"""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.fromiter((len(string) for string in encoded), dtype=np.int64, count=len(encoded)))
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def decode_strings(buffer: np.ndarray, offsets: np.ndarray, indexes: Optional[Sequence[int]] = None) -> List[str]:
+    """Unpack all strings of a buffer, or only those at the given indexes"""
+    if indexes is not None:
+        return [buffer[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8') for i in indexes]
+    text = buffer.tobytes().decode('utf-8')
+    if len(text) != len(buffer):
+        # Turn byte offsets into character offsets by counting the lead bytes before them
+        lead_bytes = np.concatenate([[0], np.cumsum((np.asarray(buffer) & 0xC0) != 0x80)])
+        offsets = lead_bytes[offsets]
+    offsets = np.asarray(offsets).tolist()
+    return [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+class ChunkStore:
+    """Columnar store of chunk texts and their provenance
+    
+    Texts live in one contiguous UTF-8 buffer addressed by an offsets array,
+    and each chunk's document, page and character span are kept in parallel
+    NumPy columns. A chunk is decoded only when it is read, so storing
+    millions of chunks costs their bytes plus a few integers each instead of
+    one Python object per chunk. Columns grow by doubling; memory-mapped
+    columns from a snapshot are copied on the first append.
+    
+    Pages are 0-based page indexes and character spans are offsets into the
+    document's extracted text, with its pages separated by blank lines.
+    
+    A row can also reference near-duplicate copies of its chunk found in other
+    places; those references are kept per row and follow it through keep().
+    References read from a snapshot stay in columns sorted by row, and only
+    those added afterwards are kept as Python tuples.
+    """
+    
+    def __init__(self):
+        self.doc_ids = []
+        self._doc_codes = {}
+        self._count = 0
+        self._num_bytes = 0
+        self._buffer = np.zeros(0, dtype=np.uint8)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._sources = np.zeros(0, dtype=np.int32)
+        self._pages = np.zeros(0, dtype=np.int32)
+        self._spans = np.zeros((0, 2), dtype=np.int64)
+        # Row -> [(source code, page, start, end)] of collapsed duplicates added since loading
+        self._duplicates = {}
+        # Snapshot references, sorted by row, which come before a row's later ones
+        self._loaded_rows = np.zeros(0, dtype=np.int64)
+        self._loaded_sources = np.zeros(0, dtype=np.int32)
+        self._loaded_pages = np.zeros(0, dtype=np.int32)
+        self._loaded_spans = np.zeros((0, 2), dtype=np.int64)
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("chunk index out of range")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._buffer[start:end].tobytes().decode('utf-8')
+    
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self[i]
+    
+    def __eq__(self, other):
+        if isinstance(other, (ChunkStore, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the text buffer and metadata columns"""
+        count = self._count
+        return (self._num_bytes + self._offsets[:count + 1].nbytes + self._sources[:count].nbytes
+                + self._pages[:count].nbytes + self._spans[:count].nbytes)
+    
+    def source(self, index: int) -> str:
+        """Return the id of the document a chunk came from"""
+        return self.doc_ids[self._sources[index]]
+    
+    def sources(self) -> List[str]:
+        """Return the document id of every chunk"""
+        return [self.doc_ids[code] for code in self._sources[:self._count]]
+    
+    def provenance(self, index: int) -> Dict:
+        """Return the document, page and character span a chunk came from"""
+        start, end = self._spans[index]
+        return {
+            'source': self.doc_ids[self._sources[index]],
+            'page': int(self._pages[index]),
+            'char_span': (int(start), int(end))
+        }
+    
+    def references(self, index: int) -> List[Dict]:
+        """Return the provenance of the duplicates collapsed into a chunk"""
+        start, stop = np.searchsorted(self._loaded_rows, [index, index + 1])
+        loaded = zip(self._loaded_sources[start:stop].tolist(), self._loaded_pages[start:stop].tolist(),
+                     self._loaded_spans[start:stop].tolist())
+        return [{'source': self.doc_ids[code], 'page': page, 'char_span': (span_start, span_end)}
+                for code, page, (span_start, span_end) in loaded] + \
+               [{'source': self.doc_ids[code], 'page': page, 'char_span': (span_start, span_end)}
+                for code, page, span_start, span_end in self._duplicates.get(index, ())]
+    
+    @property
+    def num_references(self) -> int:
+        """Number of duplicate references across all rows"""
+        return len(self._loaded_rows) + sum(len(references) for references in self._duplicates.values())
+    
+    def add_reference(self, index: int, doc_id: str, page: int = UNKNOWN_PAGE,
+                      span: Tuple[int, int] = UNKNOWN_SPAN):
+        """Record that a chunk also occurs, as a near-duplicate, at another place"""
+        if not 0 <= index < self._count:
+            raise IndexError("chunk index out of range")
+        code = self._code(doc_id)
+        self._duplicates.setdefault(index, []).append((code, int(page), int(span[0]), int(span[1])))
+    
+    def drop_references(self, doc_id: str):
+        """Forget every duplicate reference to a document"""
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            return
+        self._keep_loaded(self._loaded_sources != code)
+        for index in list(self._duplicates):
+            references = [reference for reference in self._duplicates[index] if reference[0] != code]
+            if references:
+                self._duplicates[index] = references
+            else:
+                del self._duplicates[index]
+    
+    def rows_of(self, doc_id: str) -> np.ndarray:
+        """Return the row indexes of a document's chunks"""
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(self._sources[:self._count] == code)
+    
+    def rows_by_source(self) -> Dict[str, np.ndarray]:
+        """Return the sorted rows of every document, including rows that only reference it"""
+        sources = self._sources[:self._count]
+        order = np.argsort(sources, kind='stable')
+        bounds = np.searchsorted(sources[order], np.arange(len(self.doc_ids) + 1))
+        rows = {doc_id: order[bounds[code]:bounds[code + 1]] for code, doc_id in enumerate(self.doc_ids)}
+        
+        referenced = {}
+        order = np.argsort(self._loaded_sources, kind='stable')
+        codes, starts = np.unique(self._loaded_sources[order], return_index=True)
+        for code, group in zip(codes.tolist(), np.split(self._loaded_rows[order], starts[1:])):
+            referenced[code] = set(group.tolist())
+        for index, references in self._duplicates.items():
+            for code, _, _, _ in references:
+                referenced.setdefault(code, set()).add(index)
+        for code, indexes in referenced.items():
+            doc_id = self.doc_ids[code]
+            rows[doc_id] = np.union1d(rows[doc_id], np.fromiter(indexes, dtype=np.int64, count=len(indexes)))
+        return {doc_id: doc_rows for doc_id, doc_rows in rows.items() if len(doc_rows)}
+    
+    def extend(self, doc_id: str, chunks: Sequence[str], pages: Optional[Sequence[int]] = None,
+               spans: Optional[Sequence[Tuple[int, int]]] = None):
+        """Append a document's chunks with their pages and character spans"""
+        if not chunks:
+            return
+        code = self._code(doc_id)
+        
+        encoded = [chunk.encode('utf-8') for chunk in chunks]
+        lengths = np.fromiter((len(chunk) for chunk in encoded), dtype=np.int64, count=len(encoded))
+        data = b''.join(encoded)
+        
+        count, new_count = self._count, self._count + len(chunks)
+        self._buffer = _reserve(self._buffer, self._num_bytes + len(data))
+        self._buffer[self._num_bytes:self._num_bytes + len(data)] = np.frombuffer(data, dtype=np.uint8)
+        self._offsets = _reserve(self._offsets, new_count + 1)
+        self._offsets[count + 1:new_count + 1] = self._num_bytes + np.cumsum(lengths)
+        
+        self._sources = _reserve(self._sources, new_count)
+        self._pages = _reserve(self._pages, new_count)
+        self._spans = _reserve(self._spans, new_count)
+        self._sources[count:new_count] = code
+        self._pages[count:new_count] = UNKNOWN_PAGE if pages is None else pages
+        self._spans[count:new_count] = UNKNOWN_SPAN if spans is None else np.asarray(spans).reshape(-1, 2)
+        
+        self._count = new_count
+        self._num_bytes += len(data)
+    
+    def keep(self, mask: np.ndarray):
+        """Compact the store down to the rows where mask is true"""
+        count = self._count
+        lengths = np.diff(self._offsets[:count + 1])
+        buffer = self._buffer[:self._num_bytes][np.repeat(mask, lengths)]
+        
+        self._buffer = buffer
+        self._offsets = np.concatenate([[0], np.cumsum(lengths[mask])]).astype(np.int64)
+        self._sources = self._sources[:count][mask]
+        self._pages = self._pages[:count][mask]
+        self._spans = self._spans[:count][mask]
+        self._count = len(self._sources)
+        self._num_bytes = len(buffer)
+        
+        new_rows = np.cumsum(mask) - 1
+        self._duplicates = {int(new_rows[index]): references
+                            for index, references in self._duplicates.items() if mask[index]}
+        self._keep_loaded(mask[self._loaded_rows])
+        self._loaded_rows = new_rows[self._loaded_rows]
+    
+    def _keep_loaded(self, keep: np.ndarray):
+        """Drop the snapshot references where keep is false"""
+        self._loaded_rows = self._loaded_rows[keep]
+        self._loaded_sources = self._loaded_sources[keep]
+        self._loaded_pages = self._loaded_pages[keep]
+        self._loaded_spans = self._loaded_spans[keep]
+    
+    def _code(self, doc_id: str) -> int:
+        """Return a document's source code, assigning the next one to new documents"""
+        code = self._doc_codes.get(doc_id)
+        if code is None:
+            code = self._doc_codes[doc_id] = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+        return code
+    
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Return the used part of every column, for writing a snapshot"""
+        count = self._count
+        rows = sorted(self._duplicates)
+        references = [reference for index in rows for reference in self._duplicates[index]]
+        references = np.array(references, dtype=np.int64).reshape(-1, 4)
+        added_rows = np.repeat(np.array(rows, dtype=np.int64), [len(self._duplicates[index]) for index in rows])
+        # A stable sort keeps each row's snapshot references ahead of its later ones
+        order = np.argsort(np.concatenate([self._loaded_rows, added_rows]), kind='stable')
+        return {
+            'texts': self._buffer[:self._num_bytes],
+            'text_offsets': self._offsets[:count + 1],
+            'chunk_sources': self._sources[:count],
+            'chunk_pages': self._pages[:count],
+            'chunk_spans': self._spans[:count],
+            'duplicate_rows': np.concatenate([self._loaded_rows, added_rows])[order],
+            'duplicate_sources': np.concatenate([self._loaded_sources, references[:, 0]]).astype(np.int32)[order],
+            'duplicate_pages': np.concatenate([self._loaded_pages, references[:, 1]]).astype(np.int32)[order],
+            'duplicate_spans': np.concatenate([self._loaded_spans, references[:, 2:]])[order]
+        }
+    
+    @classmethod
+    def from_arrays(cls, doc_ids: List[str], texts: np.ndarray, text_offsets: np.ndarray,
+                    chunk_sources: np.ndarray, chunk_pages: Optional[np.ndarray] = None,
+                    chunk_spans: Optional[np.ndarray] = None, duplicate_rows: Optional[np.ndarray] = None,
+                    duplicate_sources: Optional[np.ndarray] = None, duplicate_pages: Optional[np.ndarray] = None,
+                    duplicate_spans: Optional[np.ndarray] = None) -> 'ChunkStore':
+        """Wrap snapshot columns, which may be memory-mapped, without copying them"""
+        store = cls()
+        store.doc_ids = list(doc_ids)
+        store._doc_codes = {doc_id: code for code, doc_id in enumerate(store.doc_ids)}
+        store._count = len(chunk_sources)
+        store._num_bytes = len(texts)
+        store._buffer = texts
+        store._offsets = text_offsets
+        store._sources = chunk_sources
+        # Snapshots written before provenance was recorded lack these columns
+        store._pages = chunk_pages if chunk_pages is not None \
+            else np.full(store._count, UNKNOWN_PAGE, dtype=np.int32)
+        store._spans = chunk_spans if chunk_spans is not None \
+            else np.full((store._count, 2), UNKNOWN_SPAN[0], dtype=np.int64)
+        if duplicate_rows is not None:
+            store._loaded_rows = duplicate_rows
+            store._loaded_sources = duplicate_sources
+            store._loaded_pages = duplicate_pages
+            store._loaded_spans = duplicate_spans
+        return store
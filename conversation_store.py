@@ -0,0 +1,125 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+class _Session:
+    """Ring buffer of conversation turns with a running byte count"""
+    
+    __slots__ = ('turns', 'bytes', 'last_access')
+    
+    def __init__(self, now: float):
+        self.turns = deque()
+        self.bytes = 0
+        self.last_access = now
+
+class ConversationStore:
+    """Bounded, thread-safe conversation history for many concurrent sessions
+    
+    Each session keeps at most max_turns turns and max_session_bytes of text,
+    dropping its oldest turns first. Sessions idle for longer than idle_timeout
+    are evicted, and least recently used sessions are evicted whenever the
+    store exceeds max_sessions or max_total_bytes. Sessions are kept in
+    access order, so appends, lookups and evictions are all O(1).
+    """
+    
+    def __init__(self, max_turns: int = 50, max_session_bytes: int = 64 * 1024,
+                 max_sessions: int = 10000, max_total_bytes: int = 64 * 1024 * 1024,
+                 idle_timeout: Optional[float] = 1800.0, clock=time.monotonic):
+        self.max_turns = max_turns
+        self.max_session_bytes = max_session_bytes
+        self.max_sessions = max_sessions
+        self.max_total_bytes = max_total_bytes
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.evicted_sessions = 0
+        self.dropped_turns = 0
+    
+    def append(self, session_id: str, role: str, content: str):
+        """Record a turn, trimming the session and evicting sessions as needed"""
+        size = len(content.encode('utf-8'))
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(now)
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = now
+            
+            session.turns.append({"role": role, "content": content})
+            session.bytes += size
+            self.total_bytes += size
+            while len(session.turns) > 1 and (len(session.turns) > self.max_turns
+                                              or session.bytes > self.max_session_bytes):
+                self._drop_oldest_turn(session)
+            
+            # Enforce the global limits by evicting least recently used sessions
+            while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions
+                                               or self.total_bytes > self.max_total_bytes):
+                self._evict_oldest_session()
+    
+    def get_history(self, session_id: str) -> List[Dict]:
+        """Return a copy of a session's turns, oldest first"""
+        with self._lock:
+            now = self._clock()
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return list(session.turns)
+    
+    def clear(self, session_id: str):
+        """Forget a session"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.total_bytes -= session.bytes
+    
+    def __len__(self):
+        return len(self._sessions)
+    
+    def __contains__(self, session_id: str):
+        return session_id in self._sessions
+    
+    def stats(self) -> Dict:
+        """Return session, memory and eviction counters"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'total_bytes': self.total_bytes,
+                'evicted_sessions': self.evicted_sessions,
+                'dropped_turns': self.dropped_turns
+            }
+    
+    def _drop_oldest_turn(self, session: _Session):
+        """Remove a session's oldest turn"""
+        turn = session.turns.popleft()
+        size = len(turn["content"].encode('utf-8'))
+        session.bytes -= size
+        self.total_bytes -= size
+        self.dropped_turns += 1
+    
+    def _evict_oldest_session(self):
+        """Remove the least recently used session"""
+        _, session = self._sessions.popitem(last=False)
+        self.total_bytes -= session.bytes
+        self.evicted_sessions += 1
+    
+    def _evict_idle(self, now: float):
+        """Evict sessions from the least recently used end while they are idle"""
+        if self.idle_timeout is None:
+            return
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access <= self.idle_timeout:
+                break
+            self._evict_oldest_session()
@@ -0,0 +1,157 @@
+import re
+import zlib
+import numpy as np
+from typing import Optional, Tuple
+
+# Modulus of the MinHash permutations (a Mersenne prime above every shingle hash)
+_PRIME = (1 << 31) - 1
+
+_WORD = re.compile(r'\w+')
+
+# Odd multiplier that folds a band's MinHash values into one 64-bit bucket key
+_BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+# Signature rows hashed per step when the buckets are built, small enough to stay in cache
+KEY_BLOCK_ROWS = 4096
+
+def choose_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """Pick (bands, rows) so that the LSH candidate curve rises near threshold
+    
+    Pairs with Jaccard similarity s become candidates with probability
+    1 - (1 - s^rows)^bands, which is steepest around (1 / bands)^(1 / rows).
+    The band split whose midpoint is closest to (and preferably just below)
+    the threshold is used.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        # Missing true duplicates costs more than checking a few extra candidates
+        distance = abs(threshold - midpoint) + (0.05 if midpoint > threshold else 0.0)
+        if best is None or distance < best[0]:
+            best = (distance, bands, rows)
+    return best[1], best[2]
+
+class MinHashDeduplicator:
+    """Finds near-duplicate texts with MinHash signatures and LSH banding
+    
+    Texts are compared as sets of word shingles. A text is a duplicate of an
+    earlier one when their estimated Jaccard similarity reaches threshold;
+    LSH buckets keep the comparisons to a handful of candidates. Keys are
+    the caller's row numbers and can be renumbered with keep().
+    
+    Signatures loaded from a snapshot are used in place, which may be
+    memory-mapped, and the buckets are built on the first find() or add() as
+    per-band sorted arrays of bucket keys; rows added later go into small
+    per-band dicts. Bucket keys are hashes of the bands, so a collision only
+    adds a candidate that the signature comparison then rejects.
+    """
+    
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Similarity threshold must be in (0, 1]: {threshold}")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows_per_band = choose_bands(num_perm, threshold)
+        
+        # Rows of a loaded snapshot or a keep(), then rows added since, grown by doubling
+        self._base = np.zeros((0, num_perm), dtype=np.uint32)
+        self._added = np.zeros((0, num_perm), dtype=np.uint32)
+        self._num_added = 0
+        # Per band, (sorted bucket keys, their rows) and {key: rows} of rows added after building them
+        self._tables = None
+        self._recent = None
+    
+    def __len__(self):
+        return len(self._base) + self._num_added
+    
+    @property
+    def signatures(self) -> np.ndarray:
+        """Signatures of every row, in row order"""
+        if not self._num_added:
+            return self._base
+        return np.concatenate([self._base, self._added[:self._num_added]])
+    
+    def row_signature(self, row: int) -> np.ndarray:
+        """Signature of one indexed row"""
+        num_base = len(self._base)
+        return self._base[row] if row < num_base else self._added[row - num_base]
+    
+    def load(self, signatures: np.ndarray):
+        """Replace the index with snapshot signatures, without copying them"""
+        self._base = signatures
+        self._added = np.zeros((0, self.num_perm), dtype=np.uint32)
+        self._num_added = 0
+        self._tables = None
+        self._recent = None
+    
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text's word shingles"""
+        words = _WORD.findall(text.lower())
+        size = self.shingle_size
+        shingles = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) % _PRIME for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    def find(self, signature: np.ndarray) -> Optional[int]:
+        """Return the row of an indexed near-duplicate of a signature, if there is one"""
+        self._build_tables()
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature[None, :])[:, 0]):
+            keys, rows = self._tables[band]
+            start, stop = np.searchsorted(keys, key, 'left'), np.searchsorted(keys, key, 'right')
+            candidates.update(rows[start:stop].tolist())
+            candidates.update(self._recent[band].get(int(key), ()))
+        best_row, best_similarity = None, self.threshold
+        for row in sorted(candidates):
+            similarity = np.count_nonzero(self.row_signature(row) == signature) / self.num_perm
+            if similarity >= best_similarity and (best_row is None or similarity > best_similarity):
+                best_row, best_similarity = row, similarity
+        return best_row
+    
+    def add(self, signature: np.ndarray) -> int:
+        """Index a signature as the next row and return that row"""
+        self._build_tables()
+        row = len(self)
+        if self._num_added >= len(self._added):
+            grown = np.zeros((max(2 * len(self._added), 64), self.num_perm), dtype=np.uint32)
+            grown[:self._num_added] = self._added[:self._num_added]
+            self._added = grown
+        self._added[self._num_added] = signature
+        self._num_added += 1
+        for band, key in enumerate(self._band_keys(signature[None, :])[:, 0]):
+            self._recent[band].setdefault(int(key), []).append(row)
+        return row
+    
+    def keep(self, mask: np.ndarray):
+        """Drop the rows where mask is false and renumber the rest"""
+        self.load(self.signatures[mask])
+    
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """Bucket keys of every band of a (rows, num_perm) signature array, as a (bands, rows) array"""
+        keys = np.zeros((self.bands, len(signatures)), dtype=np.uint64)
+        for band in range(self.bands):
+            for column in range(band * self.rows_per_band, (band + 1) * self.rows_per_band):
+                keys[band] = keys[band] * _BAND_MULTIPLIER + signatures[:, column]
+        return keys
+    
+    def _build_tables(self):
+        """Sort the bucket keys of every indexed row, if that has not been done yet"""
+        if self._tables is not None:
+            return
+        signatures = self.signatures
+        keys = np.zeros((self.bands, len(signatures)), dtype=np.uint64)
+        for start in range(0, len(signatures), KEY_BLOCK_ROWS):
+            keys[:, start:start + KEY_BLOCK_ROWS] = self._band_keys(signatures[start:start + KEY_BLOCK_ROWS])
+        order = np.argsort(keys, axis=1, kind='stable')
+        self._tables = [(keys[band][order[band]], order[band].astype(np.int32)) for band in range(self.bands)]
+        self._recent = [{} for _ in range(self.bands)]
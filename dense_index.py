@@ -0,0 +1,176 @@
+import time
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from retrieval import ExactSearcher, top_k_indices, ranking_agreement
+from metrics import REGISTRY
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows in place, leaving all-zero rows untouched"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+def spherical_kmeans(embeddings: np.ndarray, num_clusters: int, iterations: int = 10,
+                     seed: int = 0, block_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """Cluster unit vectors by cosine similarity, returning centroids and assignments"""
+    rng = np.random.default_rng(seed)
+    centroids = embeddings[rng.choice(len(embeddings), size=num_clusters, replace=False)].copy()
+    assignments = np.zeros(len(embeddings), dtype=np.int64)
+    for _ in range(iterations):
+        for start in range(0, len(embeddings), block_size):
+            block = embeddings[start:start + block_size]
+            assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+        
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, embeddings)
+        empty = np.flatnonzero(~sums.any(axis=1))
+        if len(empty):
+            # Restart empty clusters from random points
+            sums[empty] = embeddings[rng.choice(len(embeddings), size=len(empty), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids, assignments
+
+# Options that can be changed on a built LSAIndex
+QUERY_KNOBS = ('num_probes', 'rerank_depth')
+
+class LSAIndex:
+    """Dense retrieval over a TruncatedSVD (LSA) projection with an IVF approximate index
+    
+    Chunks are embedded in a few hundred latent dimensions and clustered
+    with spherical k-means; a query is compared with the cluster centroids
+    and only the rows of the num_probes closest clusters are scored. The
+    best rerank_depth candidates are then re-scored exactly against the
+    TF-IDF matrix, so returned scores are comparable with the sparse
+    backends (rerank_depth=0 returns LSA cosine scores instead).
+    
+    Recall and latency are traded off with dimensions, num_lists and
+    num_probes; see recall_report. Building runs an SVD and k-means over the
+    whole matrix, so this backend suits large, mostly static indexes.
+    """
+    
+    def __init__(self, vectors, dimensions: int = 256, num_lists: Optional[int] = None,
+                 num_probes: int = 8, rerank_depth: int = 100, kmeans_iterations: int = 10,
+                 seed: int = 0):
+        self.vectors = vectors
+        self.num_probes = num_probes
+        self.rerank_depth = rerank_depth
+        num_rows, num_features = vectors.shape
+        
+        # Project terms into the latent space; tiny matrices keep their own dimensions
+        dimensions = min(dimensions, num_features - 1, num_rows)
+        if dimensions >= 1:
+            from sklearn.decomposition import TruncatedSVD
+            svd = TruncatedSVD(n_components=dimensions, algorithm='randomized', random_state=seed)
+            embeddings = svd.fit_transform(vectors)
+            self.term_vectors = svd.components_.T.astype(np.float32)
+        else:
+            embeddings = vectors.toarray()
+            self.term_vectors = np.eye(num_features, dtype=np.float32)
+        self.dimensions = self.term_vectors.shape[1]
+        embeddings = _normalize_rows(embeddings.astype(np.float32))
+        
+        # Inverted file: rows grouped by their nearest centroid, stored contiguously
+        num_lists = num_lists or max(int(np.sqrt(num_rows)), 1)
+        num_lists = max(min(num_lists, num_rows), 1)
+        if num_rows:
+            self.centroids, assignments = spherical_kmeans(embeddings, num_lists, kmeans_iterations, seed)
+        else:
+            self.centroids, assignments = np.zeros((1, self.dimensions), dtype=np.float32), np.zeros(0, dtype=np.int64)
+        order = np.argsort(assignments, kind='stable')
+        self.list_rows = order
+        self.list_vectors = embeddings[order]
+        self.list_ptr = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))])
+    
+    @property
+    def num_lists(self) -> int:
+        return len(self.centroids)
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the projection, centroids and embeddings"""
+        return (self.term_vectors.nbytes + self.centroids.nbytes + self.list_vectors.nbytes
+                + self.list_rows.nbytes + self.list_ptr.nbytes)
+    
+    def embed(self, query_vector) -> np.ndarray:
+        """Project a sparse query vector into the normalized latent space"""
+        embedding = np.asarray(query_vector.data, dtype=np.float32) @ self.term_vectors[query_vector.indices]
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return approximately the top k rows for a normalized query vector"""
+        num_rows = self.vectors.shape[0]
+        with REGISTRY.timer('scoring'):
+            embedding = self.embed(query_vector)
+            if not embedding.any():
+                # Nothing to rank by: fall back to the exact path's order for all-zero scores
+                top_indices = top_k_indices(np.zeros(num_rows), k)
+                return top_indices, np.zeros(len(top_indices))
+            
+            probes = top_k_indices(self.centroids @ embedding, self.num_probes)
+            spans = [(self.list_ptr[probe], self.list_ptr[probe + 1]) for probe in probes]
+            rows = np.concatenate([self.list_rows[start:end] for start, end in spans])
+            scores = np.concatenate([self.list_vectors[start:end] @ embedding for start, end in spans])
+            
+            if self.rerank_depth:
+                # Re-score the best candidates exactly against the sparse TF-IDF rows
+                keep = top_k_indices(scores, max(self.rerank_depth, k))
+                rows = rows[keep]
+                dense_query = np.zeros(self.vectors.shape[1], dtype=self.vectors.dtype)
+                dense_query[query_vector.indices] = query_vector.data
+                scores = self.vectors[rows].dot(dense_query)
+        
+        with REGISTRY.timer('top_k'):
+            # Order by score, then row, like the exact path
+            order = np.lexsort((rows, -scores))[:k]
+        return rows[order], scores[order]
+
+def recall_report(vectors, query_vectors, k: int = 10, configs: Sequence[Dict] = ({},),
+                  index_options: Optional[Dict] = None) -> List[Dict]:
+    """Measure recall@k and latency of LSAIndex settings against exact sparse search
+    
+    Each config overrides index_options; indexes are built once per distinct
+    set of build-time options (dimensions, num_lists, ...) and shared by
+    configs that only change the query-time knobs.
+    """
+    exact = ExactSearcher(vectors)
+    start_time = time.perf_counter()
+    for i in range(query_vectors.shape[0]):
+        exact.search(query_vectors[i], k)
+    exact_ms = (time.perf_counter() - start_time) * 1000 / max(query_vectors.shape[0], 1)
+    
+    indexes = {}
+    results = []
+    for config in configs:
+        options = {**(index_options or {}), **config}
+        build_options = {key: value for key, value in options.items() if key not in QUERY_KNOBS}
+        key = tuple(sorted(build_options.items()))
+        if key not in indexes:
+            start_time = time.perf_counter()
+            index = LSAIndex(vectors, **build_options)
+            indexes[key] = (index, index.num_probes, index.rerank_depth, time.perf_counter() - start_time)
+        index, num_probes, rerank_depth, build_seconds = indexes[key]
+        index.num_probes = options.get('num_probes', num_probes)
+        index.rerank_depth = options.get('rerank_depth', rerank_depth)
+        
+        start_time = time.perf_counter()
+        for i in range(query_vectors.shape[0]):
+            index.search(query_vectors[i], k)
+        latency_ms = (time.perf_counter() - start_time) * 1000 / max(query_vectors.shape[0], 1)
+        
+        agreement = ranking_agreement(exact, index, query_vectors, k)
+        results.append({
+            'config': dict(config),
+            'dimensions': index.dimensions,
+            'num_lists': index.num_lists,
+            'num_probes': index.num_probes,
+            'rerank_depth': index.rerank_depth,
+            'recall': agreement['mean_overlap'],
+            'top1_agreement': agreement['top1_agreement'],
+            'latency_ms': latency_ms,
+            'exact_latency_ms': exact_ms,
+            'build_seconds': build_seconds,
+            'bytes': index.nbytes
+        })
+    return results
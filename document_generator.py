@@ -1,17 +1,12 @@
 import os
-from fpdf import FPDF
+import json
+import random
+import hashlib
+from typing import List, Optional
 
-def create_comprehensive_financial_documents():
-    """Create a diverse set of financial documents for testing"""
-    if not os.path.exists('data'):
-        os.makedirs('data')
-        
-    # 1. Investment Strategies Document
-    investment_pdf = FPDF()
-    investment_pdf.add_page()
-    investment_pdf.set_font("Arial", size=12)
-    
-    investment_content = [
+# Section headings and paragraphs of the demo documents, by file name
+FINANCIAL_DOCUMENTS = {
+    'investment_strategies.pdf': [
         "Investment Strategies for Modern Portfolios",
         "\nDiversification Principles",
         "A well-diversified portfolio requires strategic allocation across multiple asset classes. Modern portfolio theory suggests including a mix of stocks (40-60%), bonds (20-40%), and alternative investments (10-20%). Geographic diversification across developed and emerging markets provides further risk reduction benefits.",
@@ -19,19 +14,8 @@ def create_comprehensive_financial_documents():
         "Effective risk management involves regular portfolio rebalancing, position sizing, and monitoring market conditions. Setting clear stop-loss levels and implementing hedging strategies during volatile market periods helps preserve capital while allowing for optimal growth opportunities.",
         "\nLong-term Investment Approach",
         "Successful investors focus on long-term wealth creation rather than short-term market fluctuations. This approach involves dollar-cost averaging, dividend reinvestment, and tax-efficient investment strategies that compound returns over extended periods."
-    ]
-    
-    for content in investment_content:
-        investment_pdf.multi_cell(0, 10, txt=content)
-        
-    investment_pdf.output("data/investment_strategies.pdf")
-    
-    # 2. Retirement Planning Guide
-    retirement_pdf = FPDF()
-    retirement_pdf.add_page()
-    retirement_pdf.set_font("Arial", size=12)
-    
-    retirement_content = [
+    ],
+    'retirement_planning.pdf': [
         "Comprehensive Retirement Planning Guide",
         "\nRetirement Income Strategies",
         "A successful retirement plan should aim to replace 70-80% of pre-retirement income. This typically comes from multiple sources: Social Security benefits, employer-sponsored retirement plans (401(k), 403(b), pension), and personal savings including IRAs and taxable investment accounts.",
@@ -39,19 +23,8 @@ def create_comprehensive_financial_documents():
         "Strategic withdrawals from retirement accounts can significantly impact tax liability. Generally, it's advisable to withdraw from taxable accounts first, then tax-deferred accounts like traditional IRAs and 401(k)s, and finally tax-free accounts like Roth IRAs. This strategy often maximizes after-tax retirement income.",
         "\nLong-term Care Planning",
         "Approximately 70% of retirees will require some form of long-term care. Options for funding include long-term care insurance, health savings accounts (HSAs), self-funding through investments, and Medicaid planning. The ideal strategy depends on individual health factors and financial resources."
-    ]
-    
-    for content in retirement_content:
-        retirement_pdf.multi_cell(0, 10, txt=content)
-        
-    retirement_pdf.output("data/retirement_planning.pdf")
-    
-    # 3. Tax Optimization Strategies
-    tax_pdf = FPDF()
-    tax_pdf.add_page()
-    tax_pdf.set_font("Arial", size=12)
-    
-    tax_content = [
+    ],
+    'tax_optimization.pdf': [
         "Tax Optimization Strategies for Investors",
         "\nTax-Loss Harvesting",
         "Tax-loss harvesting involves selling investments that have experienced losses to offset capital gains tax liability. This strategy can reduce taxable income by up to $3,000 per year, with additional losses carried forward to future tax years. It's particularly effective when rebalancing portfolios in tax-inefficient accounts.",
@@ -59,23 +32,121 @@ def create_comprehensive_financial_documents():
         "Maximizing contributions to tax-advantaged accounts like 401(k)s, IRAs, and HSAs can significantly reduce current and future tax liability. For 2023, contribution limits are $22,500 for 401(k)s, $6,500 for IRAs, and $3,850 for individual HSAs. Catch-up contributions are available for those over 50.",
         "\nAsset Location Strategy",
         "Strategic placement of investments across taxable and tax-advantaged accounts can enhance after-tax returns. Generally, tax-inefficient investments (bonds, REITs) should be held in tax-advantaged accounts, while tax-efficient investments (index funds, growth stocks) are better suited for taxable accounts."
-    ]
-    
-    for content in tax_content:
-        tax_pdf.multi_cell(0, 10, txt=content)
-        
-    tax_pdf.output("data/tax_optimization.pdf")
-    
-    # 4. Market Analysis and Economic Outlook
-    market_pdf = FPDF()
-    market_pdf.add_page()
-    market_pdf.set_font("Arial", size=12)
-    
-    market_content = [
+    ],
+    'market_analysis.pdf': [
         "Current Market Analysis and Economic Outlook",
         "\nEconomic Indicators and Market Performance",
         "Key economic indicators including GDP growth, inflation rates, unemployment figures, and central bank policies provide essential context for investment decisions. These macroeconomic factors influence sector performance and should inform strategic asset allocation decisions.",
         "\nSector Rotation Strategies",
         "Different market sectors perform optimally at various points in the economic cycle. During economic expansion, cyclical sectors like technology and consumer discretionary typically outperform. In contrast, defensive sectors like utilities and consumer staples often excel during economic contractions.",
         "\nValuation Metrics",
-        "Fundamental analysis relies on valuation metrics such as P/E ratios, price-to-book ratios, and dividend yields to identify potential investment opp
\ No newline at end of file
+        "Fundamental analysis relies on valuation metrics such as P/E ratios, price-to-book ratios, and dividend yields to identify potential investment opportunities. Comparing these metrics against historical averages and sector peers helps investors judge whether a security is undervalued or overvalued."
+    ]
+}
+
+# Topic tags of the demo documents, for filtered searches
+DOCUMENT_TOPICS = {
+    'investment_strategies.pdf': ['investing', 'risk'],
+    'retirement_planning.pdf': ['retirement', 'tax'],
+    'tax_optimization.pdf': ['tax'],
+    'market_analysis.pdf': ['markets', 'investing']
+}
+
+# Records what create_comprehensive_financial_documents last wrote, per file name
+GENERATION_MANIFEST = '.generated.json'
+
+def _write_pdf(path: str, pages: List[List[str]]):
+    """Write pages of paragraphs to a PDF"""
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    for page in pages:
+        pdf.add_page()
+        for content in page:
+            pdf.multi_cell(0, 10, txt=content)
+    pdf.output(path)
+
+def _content_hash(pages: List[List[str]]) -> str:
+    """Hash of the text a PDF is generated from"""
+    return hashlib.sha256(json.dumps(pages).encode('utf-8')).hexdigest()
+
+def _file_state(path: str) -> Optional[List[int]]:
+    """Modification time and size of a file, or None if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+def create_comprehensive_financial_documents(output_dir: str = 'data', force: bool = False) -> List[str]:
+    """Create a diverse set of financial documents for testing
+    
+    A manifest in output_dir records the content hash, modification time and
+    size of every file written; files whose content and file state both
+    still match are not regenerated unless force is set. Returns the paths
+    that were written.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    
+    manifest_path = os.path.join(output_dir, GENERATION_MANIFEST)
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    written = []
+    for name, content in FINANCIAL_DOCUMENTS.items():
+        path = os.path.join(output_dir, name)
+        content_hash = _content_hash([content])
+        entry = manifest.get(name, {})
+        if not force and entry.get('content') == content_hash and entry.get('file') == _file_state(path):
+            continue
+        _write_pdf(path, [content])
+        manifest[name] = {'content': content_hash, 'file': _file_state(path)}
+        written.append(path)
+    
+    if written:
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return written
+
+def create_synthetic_corpus(output_dir: str, num_documents: int = 1000, pages_per_document: int = 3,
+                            paragraphs_per_page: int = 4, sentences_per_paragraph: int = 4,
+                            seed: int = 0) -> List[str]:
+    """Create a large corpus of financial PDFs for benchmarking
+    
+    Pages are assembled from shuffled sentences of the demo documents, with
+    random figures mixed in so the vocabulary keeps growing with the corpus
+    like it would for real filings. The same seed always produces the same
+    corpus. Returns the paths of the generated files.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    
+    rng = random.Random(seed)
+    headings = [line.strip() for content in FINANCIAL_DOCUMENTS.values() for line in content[1::2]]
+    sentences = [sentence.strip().rstrip('.') + '.'
+                 for content in FINANCIAL_DOCUMENTS.values()
+                 for paragraph in content[2::2]
+                 for sentence in paragraph.split('. ') if sentence.strip()]
+    
+    paths = []
+    for doc_index in range(num_documents):
+        pages = []
+        for _ in range(pages_per_document):
+            page = [rng.choice(headings)]
+            for _ in range(paragraphs_per_page):
+                paragraph = [rng.choice(sentences) for _ in range(sentences_per_paragraph)]
+                paragraph.append(f"Fund {rng.randrange(100000)} returned {rng.uniform(-20, 40):.1f}% "
+                                 f"in {rng.randrange(1990, 2025)}.")
+                page.append(' '.join(paragraph))
+            pages.append(page)
+        
+        path = os.path.join(output_dir, f"synthetic_{doc_index:06d}.pdf")
+        _write_pdf(path, pages)
+        paths.append(path)
+    
+    return paths
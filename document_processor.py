@@ -1,104 +1,1335 @@
 import os
+import json
+import math
+import time
+import hashlib
+import itertools
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+import shutil
 import logging
+import tempfile
+import weakref
 import numpy as np
-from typing import List, Dict
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
+from scipy.sparse import csr_matrix, vstack
 import re
-from pypdf import PdfReader
+from retrieval import (QUANTIZED_DTYPES, AppendedRowsSearcher, ExactSearcher, InvertedIndex, QuantizedIndex,
+                       QueryVector, ShardedSearcher, quantize_rows, search_rows, top_k_rows)
+from dense_index import LSAIndex
+from metrics import REGISTRY, SCORE_BUCKETS
+from chunk_store import ChunkStore, UNKNOWN_PAGE, UNKNOWN_SPAN, decode_strings, encode_strings
+from dedup import MinHashDeduplicator
+from metadata_index import MetadataIndex, as_date
+
+# Retrieval backends selectable with search_backend; 'exact' is the reference
+SEARCH_BACKENDS = {
+    'exact': ExactSearcher,
+    'inverted': InvertedIndex,
+    'lsa': LSAIndex,
+    'sharded': ShardedSearcher
+}
+
+# Index versions are unique across processors so caches can tell indexes apart
+_index_versions = itertools.count(1)
+
+# Version of the on-disk index snapshot written by SimpleDocumentProcessor.save
+INDEX_FORMAT_VERSION = 3
+
+# Older snapshot versions load() still reads; version 2 kept the vocabulary in the manifest
+READABLE_FORMAT_VERSIONS = (2, 3)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Upper bound on the dense scores (queries x chunks) materialized per batch-search block
+MAX_BLOCK_SCORES = 1 << 24
+
+# Rows weighted at a time when a reduced-precision index is re-weighted, so only
+# one block is ever held as float64
+WEIGHT_BLOCK_ROWS = 65536
+
+# Sentences this short are never used when composing responses
+MIN_SENTENCE_LENGTH = 30
+
+# Tokens of two or more word characters, scikit-learn's default token_pattern
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+def english_stop_words() -> frozenset:
+    """scikit-learn's English stop word list, importing scikit-learn only when called"""
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return ENGLISH_STOP_WORDS
+
+def build_analyzer(stop_words: Iterable[str], ngram_range: Tuple[int, int] = (1, 2)):
+    """Return a word analyzer that produces the same terms as TfidfVectorizer's
+    
+    Lowercases the text, extracts TOKEN_PATTERN tokens, drops stop words and
+    appends the space-joined n-grams in scikit-learn's order, without
+    importing scikit-learn.
+    """
+    stop_words = frozenset(stop_words)
+    findall = TOKEN_PATTERN.findall
+    min_n, max_n = ngram_range
+    
+    def analyze(text: str) -> List[str]:
+        tokens = [token for token in findall(text.lower()) if token not in stop_words]
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+    
+    return analyze
+
+def sentence_spans(text: str) -> List[tuple]:
+    """Return (start, end) offsets of the sentences of a chunk long enough to quote"""
+    spans = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        if match.start() - start > MIN_SENTENCE_LENGTH:
+            spans.append((start, match.start()))
+        start = match.end()
+    if len(text) - start > MIN_SENTENCE_LENGTH:
+        spans.append((start, len(text)))
+    return spans
+
+def sentence_key(sentence: str) -> int:
+    """Stable 64-bit key used to deduplicate sentences case-insensitively"""
+    digest = hashlib.blake2b(sentence.lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+def iter_pdf_pages(file_path: str) -> Iterator[str]:
+    """Yield the text of each PDF page as it is extracted"""
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    for page in reader.pages:
+        with REGISTRY.timer('extraction'):
+            text = page.extract_text()
+        REGISTRY.inc('pages_extracted')
+        yield text
+
+def iter_located_sentences(pages: Iterable[str]) -> Iterator[Tuple[str, int, int, int]]:
+    """Split a stream of pages into sentences with the page and character span of each
+    
+    Yields (sentence, page, start, end), where page is the 0-based page the
+    sentence starts on and offsets index the document text formed by joining
+    the pages with blank lines. Partial sentences are carried across pages.
+    """
+    page_starts = []
+    text_length = 0
+    buffer = ""
+    buffer_start = 0
+    
+    def located(start, end):
+        return buffer[start:end], bisect_right(page_starts, buffer_start + start) - 1, \
+            buffer_start + start, buffer_start + end
+    
+    for page in pages:
+        page_starts.append(text_length)
+        text_length += len(page) + 2
+        buffer += page + "\n\n"
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(buffer):
+            if match.end() == len(buffer):
+                # The separator may continue on the next page
+                break
+            yield located(start, match.start())
+            start = match.end()
+        buffer = buffer[start:]
+        buffer_start += start
+    
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(buffer):
+        yield located(start, match.start())
+        start = match.end()
+    yield located(start, len(buffer))
+
+def iter_sentences(pages: Iterable[str]) -> Iterator[str]:
+    """Split a stream of pages into sentences, carrying partial sentences across pages"""
+    for sentence, _, _, _ in iter_located_sentences(pages):
+        yield sentence
+
+def iter_located_chunks(sentences: Iterable[Tuple[str, int, int, int]], chunk_size: int = 200,
+                        overlap: int = 0, unit: str = 'chars') -> Iterator[Tuple[str, int, int, int]]:
+    """Group located sentences into chunks like iter_chunks
+    
+    Yields (chunk, page, start, end) with the page of the chunk's first
+    sentence and the span from its first sentence to its last.
+    """
+    if unit == 'chars':
+        # Each sentence is counted with the space that joins it to the next one
+        separator = 1
+        def measure(sentence):
+            return len(sentence) + 1
+    elif unit == 'tokens':
+        separator = 0
+        def measure(sentence):
+            return len(sentence.split())
+    else:
+        raise ValueError(f"Unknown chunk unit: {unit}")
+    
+    def located_chunk(current):
+        return " ".join(item[0] for item in current).strip(), current[0][1], current[0][2], current[-1][3]
+    
+    current = []
+    sizes = []
+    current_size = 0
+    for item in sentences:
+        size = measure(item[0])
+        if current and current_size + size - separator > chunk_size:
+            chunk = located_chunk(current)
+            if chunk[0]:
+                yield chunk
+            
+            # Keep trailing sentences as overlap, as long as the new sentence still fits
+            kept = 0
+            kept_size = 0
+            for previous_size in reversed(sizes):
+                if kept_size + previous_size > overlap or kept_size + previous_size + size - separator > chunk_size:
+                    break
+                kept += 1
+                kept_size += previous_size
+            current = current[len(current) - kept:]
+            sizes = sizes[len(sizes) - kept:]
+            current_size = kept_size
+        
+        current.append(item)
+        sizes.append(size)
+        current_size += size
+    
+    if current:
+        chunk = located_chunk(current)
+        if chunk[0]:
+            yield chunk
+
+def iter_chunks(sentences: Iterable[str], chunk_size: int = 200, overlap: int = 0,
+                unit: str = 'chars') -> Iterator[str]:
+    """Group sentences into chunks of at most chunk_size characters or tokens
+    
+    Each chunk after the first starts with trailing sentences of the previous
+    chunk totalling at most overlap units.
+    """
+    located = ((sentence, UNKNOWN_PAGE, -1, -1) for sentence in sentences)
+    for chunk, _, _, _ in iter_located_chunks(located, chunk_size, overlap, unit):
+        yield chunk
+
+class _ReadWriteLock:
+    """Lets many searches read the index at once while updates get exclusive access"""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+    
+    @contextmanager
+    def read(self):
+        with self._condition:
+            # Waiting writers go first so a steady stream of searches cannot starve them
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+class _MappedCounts:
+    """Raw term counts kept in append-only files and memory-mapped instead of held in RAM
+    
+    Each CSR array has its own file in a temporary directory that is removed
+    with the object. New rows are appended to the files; removing rows writes
+    a compacted copy a block of rows at a time.
+    """
+    
+    # Rows copied per step when the files are rewritten
+    COPY_ROWS = 65536
+    
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix='tfidf-counts-')
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        self._generation = 0
+        self._reset()
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f'{name}.{self._generation}')
+    
+    def _reset(self):
+        """Start empty files for the current generation"""
+        self.num_rows = 0
+        self.num_entries = 0
+        with open(self._path('indptr'), 'wb') as f:
+            np.zeros(1, dtype=np.int64).tofile(f)
+        for name in ('indices', 'data'):
+            open(self._path(name), 'wb').close()
+    
+    def append(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray):
+        """Add rows given as CSR arrays"""
+        with open(self._path('indptr'), 'ab') as f:
+            (indptr[1:].astype(np.int64) - indptr[0] + self.num_entries).tofile(f)
+        with open(self._path('indices'), 'ab') as f:
+            np.asarray(indices, dtype=np.int32).tofile(f)
+        with open(self._path('data'), 'ab') as f:
+            np.asarray(data, dtype=np.int32).tofile(f)
+        self.num_rows += len(indptr) - 1
+        self.num_entries += len(indices)
+    
+    def rewrite(self, counts, keep: Optional[np.ndarray] = None):
+        """Replace the files with the rows of a count matrix, only those where keep is True if given"""
+        previous = [self._path(name) for name in ('indptr', 'indices', 'data')]
+        self._generation += 1
+        self._reset()
+        for start in range(0, counts.shape[0], self.COPY_ROWS):
+            block = counts[start:start + self.COPY_ROWS]
+            if keep is not None:
+                block = block[keep[start:start + self.COPY_ROWS]]
+            self.append(block.indptr, block.indices, block.data)
+        # Matrices still mapping the old files keep them alive until they are dropped
+        for path in previous:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def matrix(self, num_cols: int) -> csr_matrix:
+        """Map the files as a read-only CSR matrix"""
+        def mapped(name, dtype, length):
+            if not length:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(self._path(name), dtype=dtype, mode='r', shape=(length,))
+        return csr_matrix((mapped('data', np.int32, self.num_entries), mapped('indices', np.int32, self.num_entries),
+                           mapped('indptr', np.int64, self.num_rows + 1)),
+                          shape=(self.num_rows, num_cols), copy=False)
 
 class SimpleDocumentProcessor:
     """Document processing pipeline for financial documents using TF-IDF"""
     
-    def __init__(self):
+    def __init__(self, max_features: Optional[int] = 10000, idf_refresh_ratio: float = 0.1,
+                 search_backend: str = 'exact', search_options: Optional[Dict] = None,
+                 weight_dtype: str = 'float64', dedup_threshold: Optional[float] = None):
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
         self.logger = logging.getLogger(__name__)
         
-        # Initialize vectorizer
-        self.vectorizer = TfidfVectorizer(
-            stop_words='english',
-            ngram_range=(1, 2),
-            max_features=10000
-        )
-        
-        # Storage for documents and vectors
-        self.document_chunks = []
-        self.chunk_texts = []
-        self.vectors = None
-            
-    def process_document(self, file_path: str, chunk_size: int = 200):
+        # Terms are English words and bigrams without stop words, as TfidfVectorizer(stop_words='english',
+        # ngram_range=(1, 2)) extracts them; the analyzer is built on first use and snapshots
+        # carry its stop words, so loading an index and answering queries never imports scikit-learn
+        self._stop_words = None
+        self._analyzer = None
+        self._vectorizer = None
+        self.max_features = max_features
+        
+        # Re-weight the whole index only once the rows added and removed since the
+        # IDF weights were last computed exceed this fraction of the chunk count
+        self.idf_refresh_ratio = idf_refresh_ratio
+        
+        # float32 halves the searchable matrix; 'uint16' and 'uint8' replace it with
+        # per-row-scaled codes in term postings (QuantizedIndex), searched term at a
+        # time. IDF and query weights stay float64. Reduced-precision indexes also
+        # keep their raw counts memory-mapped rather than in RAM.
+        if weight_dtype not in ('float64', 'float32') and weight_dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported weight dtype: {weight_dtype}")
+        self.weight_dtype = np.dtype(weight_dtype)
+        
+        if search_backend not in SEARCH_BACKENDS:
+            raise ValueError(f"Unknown search backend: {search_backend}")
+        if weight_dtype in QUANTIZED_DTYPES and search_backend != 'exact':
+            raise ValueError(f"Search backend {search_backend!r} needs float weights, not {weight_dtype}")
+        self.search_backend = search_backend
+        # Extra constructor arguments for the backend, e.g. {'num_shards': 8} for 'sharded'
+        self.search_options = search_options or {}
+        # Backends other than 'exact' can take seconds to build, so a replacement is
+        # built on a background thread while queries use the previous one; the
+        # generation ties a backend to the matrix it was built from, and the epoch
+        # changes on close() so builds still running are discarded
+        self._searcher = None
+        self._searcher_generation = -1
+        self._searcher_building = False
+        self._searcher_epoch = 0
+        self._searcher_lock = threading.Lock()
+        
+        # Guards the index so searches can run concurrently with each other
+        self._lock = _ReadWriteLock()
+        
+        # Chunk texts with their source document, page and character span
+        self.chunks = ChunkStore()
+        self.documents = {}
+        
+        # Chunks whose estimated Jaccard similarity to an indexed chunk reaches
+        # dedup_threshold are recorded as references to that row instead of
+        # being indexed again; None indexes every chunk
+        self.dedup_threshold = dedup_threshold
+        self._deduplicator = MinHashDeduplicator(dedup_threshold) if dedup_threshold else None
+        self.chunks_checked = 0
+        self.duplicates_collapsed = 0
+        
+        # Topic tags and date of each document, for filtered searches, and the
+        # row sets built from them for the current index version
+        self.document_metadata = {}
+        self._metadata_index = None
+        
+        # Incremental TF-IDF state: a live vocabulary, document frequencies and raw
+        # term counts per chunk, so new chunks never require re-tokenizing the corpus
+        self._vocabulary = {}
+        # A loaded snapshot keeps its terms memory-mapped, as a UTF-8 buffer and
+        # offsets, until the vocabulary is needed; queries meanwhile only look up
+        # the active terms
+        self._terms = None
+        self._term_offsets = None
+        self._active_vocabulary = None
+        self._df = np.zeros(0, dtype=np.int64)
+        self._term_totals = np.zeros(0, dtype=np.int64)
+        self._pending_counts = []
+        self._counts = None
+        self._count_files = None
+        self._vectors = None
+        # Bumped whenever the searchable matrix is replaced; rows of matrices since
+        # _appended_since only grew by appended rows, with earlier rows unchanged
+        self._vectors_generation = 0
+        self._appended_since = 0
+        self._idf = np.zeros(0, dtype=np.float64)
+        self._active_terms = np.zeros(0, dtype=bool)
+        self._idf_docs = 0
+        # Rows added plus rows removed since the IDF weights were last computed
+        self._rows_changed = 0
+        self._stale = False
+        
+        # Quotable sentences per chunk, segmented once at ingest: offsets into
+        # _sentence_spans/_sentence_keys for each chunk, as in a CSR matrix
+        self._sentence_ptr = np.zeros(1, dtype=np.int64)
+        self._sentence_spans = np.zeros((0, 2), dtype=np.int32)
+        self._sentence_keys = np.zeros(0, dtype=np.int64)
+        self._pending_sentences = []
+        
+        # Changes whenever the searchable index changes
+        self.index_version = next(_index_versions)
+    
+    @property
+    def vocabulary(self) -> Dict[str, int]:
+        """Column of every term seen so far, decoded from the snapshot on first access after load()"""
+        if self._vocabulary is None:
+            terms = decode_strings(self._terms, self._term_offsets)
+            self._vocabulary = {term: column for column, term in enumerate(terms)}
+        return self._vocabulary
+    
+    @vocabulary.setter
+    def vocabulary(self, vocabulary: Dict[str, int]):
+        self._vocabulary = vocabulary
+        self._active_vocabulary = None
+    
+    def _vocabulary_size(self) -> int:
+        """Number of terms, without decoding a snapshot's vocabulary"""
+        if self._vocabulary is None:
+            return len(self._term_offsets) - 1
+        return len(self._vocabulary)
+    
+    def _query_vocabulary(self) -> Dict[str, int]:
+        """Term lookup for queries: the live vocabulary, or just a snapshot's active terms
+        
+        Inactive terms have zero IDF, so leaving them out never changes a score.
+        """
+        if self._vocabulary is not None:
+            return self._vocabulary
+        lookup = self._active_vocabulary
+        if lookup is None:
+            columns = np.flatnonzero(self._active_terms)
+            lookup = dict(zip(decode_strings(self._terms, self._term_offsets, columns), columns.tolist()))
+            self._active_vocabulary = lookup
+        return lookup
+    
+    @property
+    def vectorizer(self):
+        """Unfitted TfidfVectorizer with the same terms as the index, created on first access"""
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2),
+                                               max_features=self.max_features)
+        return self._vectorizer
+    
+    @property
+    def document_chunks(self) -> ChunkStore:
+        """Texts of all indexed chunks, decoded on access"""
+        return self.chunks
+    
+    @property
+    def chunk_texts(self) -> ChunkStore:
+        """Alias of document_chunks"""
+        return self.chunks
+    
+    @property
+    def chunk_sources(self) -> List[str]:
+        """Document id of every chunk"""
+        return self.chunks.sources()
+    
+    @property
+    def vectors(self):
+        """TF-IDF matrix of all indexed chunks, re-weighted lazily after updates"""
+        if self._stale:
+            with self._lock.write():
+                if self._stale:
+                    with REGISTRY.timer('vectorization'):
+                        self._update_vectors()
+        return self._vectors
+    
+    def close(self):
+        """Release resources held by the retrieval backend, such as shard worker processes"""
+        with self._searcher_lock:
+            if hasattr(self._searcher, 'close'):
+                self._searcher.close()
+            self._searcher = None
+            self._searcher_generation = -1
+            self._searcher_epoch += 1
+    
+    def prepare(self):
+        """Build the searchable matrix and retrieval backend ahead of the first query"""
+        if self.vectors is not None:
+            with self._lock.read():
+                vectors, generation = self._vectors, self._vectors_generation
+            with self._searcher_lock:
+                epoch = self._searcher_epoch
+            self._build_searcher(vectors, generation, epoch)
+        return self
+    
+    def process_document(self, file_path: str, chunk_size: int = 200, doc_id: Optional[str] = None,
+                         overlap: int = 0, unit: str = 'chars', batch_size: int = 256):
         """Load and process a document into chunks"""
+        doc_id = doc_id or file_path
         try:
             if not os.path.exists(file_path):
                 self.logger.error(f"Document not found: {file_path}")
                 return False
-                
-            # Read PDF text content
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n\n"
-                
-            # Split into chunks
-            chunks = self._split_into_chunks(text, chunk_size)
-            self.document_chunks = chunks
-            self.chunk_texts = chunks  # In this simple version, they're the same
             
-            # Create TF-IDF vectors
-            self.vectors = self.vectorizer.fit_transform(chunks)
+            if doc_id in self.documents:
+                self.remove_document(doc_id)
             
-            self.logger.info(f"Processed document into {len(chunks)} chunks")
-            return True
+            # Stream chunks into the live index in batches as pages are extracted
+            num_chunks = 0
+            batch = []
+            located = iter_located_chunks(iter_located_sentences(iter_pdf_pages(file_path)), chunk_size, overlap, unit)
+            for chunk in located:
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    with self._lock.write():
+                        self._index_located_chunks(doc_id, batch)
+                    num_chunks += len(batch)
+                    batch = []
+            with self._lock.write():
+                self._index_located_chunks(doc_id, batch)
+            num_chunks += len(batch)
             
+            self.logger.info(f"Processed document into {num_chunks} chunks")
+            return True
+        
         except Exception as e:
             self.logger.error(f"Error processing document: {str(e)}")
+            if doc_id in self.documents:
+                self.remove_document(doc_id)
             return False
+    
+    def stream_document(self, file_path: str, chunk_size: int = 200, overlap: int = 0,
+                        unit: str = 'chars') -> Iterator[str]:
+        """Yield chunks of a PDF while it is still being parsed"""
+        return iter_chunks(iter_sentences(iter_pdf_pages(file_path)), chunk_size, overlap, unit)
+    
+    def add_documents(self, documents: Dict[str, List[str]],
+                      provenance: Optional[Dict[str, List[Tuple[int, int, int]]]] = None,
+                      metadata: Optional[Dict[str, Dict]] = None) -> int:
+        """Add chunked documents to the index, replacing any with the same id
+        
+        provenance optionally gives the (page, start, end) of every chunk of a
+        document, as produced by iter_located_chunks, and metadata its
+        {'topics': [...], 'date': ...} for filtered searches.
+        """
+        added = 0
+        provenance = provenance or {}
+        metadata = metadata or {}
+        with self._lock.write():
+            for doc_id, chunks in documents.items():
+                if doc_id in self.documents:
+                    self._remove_document(doc_id)
+                if doc_id in metadata:
+                    self.document_metadata[doc_id] = self._normalize_metadata(metadata[doc_id])
+                locations = provenance.get(doc_id)
+                if locations is None:
+                    self._index_chunks(doc_id, list(chunks))
+                else:
+                    locations = np.asarray(locations, dtype=np.int64).reshape(-1, 3)
+                    self._index_chunks(doc_id, list(chunks), locations[:, 0], locations[:, 1:])
+                added += len(chunks)
+        
+        self.logger.info(f"Indexed {added} chunks from {len(documents)} documents")
+        return added
+    
+    def set_document_metadata(self, doc_id: str, topics: Optional[Iterable[str]] = None, date=None) -> bool:
+        """Replace the topic tags and date of an indexed document"""
+        with self._lock.write():
+            if doc_id not in self.documents:
+                self.logger.error(f"Document not indexed: {doc_id}")
+                return False
+            self.document_metadata[doc_id] = self._normalize_metadata({'topics': topics, 'date': date})
+            self.index_version = next(_index_versions)
+        return True
+    
+    @staticmethod
+    def _normalize_metadata(entry: Dict) -> Dict:
+        """Keep a document's topic tags as a sorted list and its date as YYYY-MM-DD"""
+        topics = entry.get('topics') or []
+        date = entry.get('date')
+        return {
+            'topics': sorted({topics} if isinstance(topics, str) else set(topics)),
+            'date': as_date(date) if date is not None else None
+        }
+    
+    def remove_document(self, doc_id: str) -> bool:
+        """Remove all chunks of a document from the index"""
+        with self._lock.write():
+            if doc_id not in self.documents:
+                self.logger.error(f"Document not indexed: {doc_id}")
+                return False
+            self._remove_document(doc_id)
+        return True
+    
+    def _remove_document(self, doc_id: str):
+        """Drop a document's rows and their term statistics from the index"""
+        self._merge_pending_counts()
+        self.chunks.drop_references(doc_id)
+        rows = self.chunks.rows_of(doc_id)
+        keep = np.ones(len(self.chunks), dtype=bool)
+        keep[rows] = False
+        
+        # Rows that other documents' duplicates point at are re-indexed under their first duplicate
+        promoted = [(self.chunks[row], self.chunks.references(row), self._deduplicator.row_signature(row))
+                    for row in rows if self.chunks.references(row)]
+        
+        # Documents without rows of their own (empty, or only duplicates) leave the term statistics alone
+        if self._counts is not None and len(rows):
+            # Take the removed rows out of the document frequencies and term totals
+            removed = self._counts[~keep]
+            vocabulary_size = self._vocabulary_size()
+            self._df -= np.bincount(removed.indices, minlength=vocabulary_size)
+            self._term_totals -= np.bincount(
+                removed.indices, weights=removed.data, minlength=vocabulary_size
+            ).astype(np.int64)
+            
+            if self.weight_dtype != np.float64:
+                self._map_counts(keep)
+            else:
+                self._counts = self._counts[keep]
+            self._merge_pending_sentences()
+            sentence_counts = np.diff(self._sentence_ptr)
+            keep_sentences = np.repeat(keep, sentence_counts)
+            self._sentence_ptr = np.concatenate([[0], np.cumsum(sentence_counts[keep])])
+            self._sentence_spans = self._sentence_spans[keep_sentences]
+            self._sentence_keys = self._sentence_keys[keep_sentences]
+            if self._vectors is not None:
+                keep_vectors = keep[:self._vectors.shape[0]]
+                if isinstance(self._vectors, QuantizedIndex):
+                    self._replace_vectors(self._vectors.keep_rows(keep_vectors))
+                else:
+                    self._replace_vectors(self._vectors[keep_vectors])
             
+            self._stale = True
+            self._rows_changed += len(rows)
+            self.chunks.keep(keep)
+            if self._deduplicator is not None:
+                self._deduplicator.keep(keep)
+        
+        self.index_version = next(_index_versions)
+        del self.documents[doc_id]
+        self.document_metadata.pop(doc_id, None)
+        
+        if not len(self.chunks):
+            self._counts = None
+            self._count_files = None
+            self._vectors = None
+            self._idf_docs = 0
+            self._stale = False
+        
+        for chunk, references, signature in promoted:
+            first = references[0]
+            self._append_chunks(first['source'], [chunk], [first['page']], [first['char_span']])
+            row = self._deduplicator.add(signature)
+            for reference in references[1:]:
+                self.chunks.add_reference(row, reference['source'], reference['page'], reference['char_span'])
+    
+    def save(self, path: str):
+        """Write a versioned index snapshot to a directory"""
+        with self._lock.write():
+            if self._stale:
+                self._update_vectors()
+            self._save(path)
+    
+    def _save(self, path: str):
+        """Write the snapshot files of an up-to-date index"""
+        vectors = self._vectors
+        tmp_path = path.rstrip(os.sep) + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        doc_ids = list(self.documents)
+        doc_codes = {doc_id: code for code, doc_id in enumerate(doc_ids)}
+        
+        # Renumber chunk sources to the order of the documents in the manifest
+        arrays = self.chunks.arrays()
+        codes = np.array([doc_codes.get(doc_id, -1) for doc_id in self.chunks.doc_ids], dtype=np.int32)
+        arrays['chunk_sources'] = codes[arrays['chunk_sources']]
+        arrays.update({
+            'df': self._df,
+            'term_totals': self._term_totals,
+            'idf': self._idf,
+            'active_terms': self._active_terms,
+            'sentence_ptr': self._sentence_ptr,
+            'sentence_spans': self._sentence_spans,
+            'sentence_keys': self._sentence_keys
+        })
+        arrays['duplicate_sources'] = codes[arrays['duplicate_sources']]
+        if self._deduplicator is not None:
+            arrays['dedup_signatures'] = self._deduplicator.signatures
+        if vectors is not None:
+            arrays.update({
+                'indptr': self._counts.indptr,
+                'indices': self._counts.indices,
+                'counts': self._counts.data
+            })
+            if isinstance(vectors, QuantizedIndex):
+                arrays.update({
+                    'postings_terms': vectors.terms,
+                    'postings_indptr': vectors.indptr,
+                    'postings_rows': vectors.rows,
+                    'postings_weights': vectors.weights,
+                    'row_scales': vectors.row_scales
+                })
+            else:
+                arrays.update({
+                    'vector_indptr': vectors.indptr,
+                    'vector_indices': vectors.indices,
+                    'data': vectors.data
+                })
+        # Columns are assigned in insertion order, so the dict lists terms by column
+        if self._vocabulary is None:
+            arrays['terms'], arrays['term_offsets'] = self._terms, self._term_offsets
+        else:
+            arrays['terms'], arrays['term_offsets'] = encode_strings(list(self._vocabulary))
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), array)
+        
+        manifest = {
+            'format_version': INDEX_FORMAT_VERSION,
+            'num_chunks': len(self.chunks),
+            'num_terms': self._vocabulary_size(),
+            'documents': [[doc_id, self.documents[doc_id]] for doc_id in doc_ids],
+            'max_features': self.max_features,
+            'idf_refresh_ratio': self.idf_refresh_ratio,
+            'idf_docs': self._idf_docs,
+            'rows_changed': self._rows_changed,
+            'weight_dtype': self.weight_dtype.name,
+            'dedup_threshold': self.dedup_threshold,
+            'document_metadata': self.document_metadata,
+            'stop_words': sorted(self._stop_words if self._stop_words is not None else english_stop_words())
+        }
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        
+        # Replace any previous snapshot only once the new one is complete
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        self.logger.info(f"Saved index with {len(self.chunks)} chunks to {path}")
+    
+    @classmethod
+    def load(cls, path: str, search_backend: str = 'exact',
+             search_options: Optional[Dict] = None) -> 'SimpleDocumentProcessor':
+        """Load an index snapshot, memory-mapping its arrays"""
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') not in READABLE_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported index format version: {manifest.get('format_version')}")
+        
+        def mapped(name):
+            return np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+        
+        processor = cls(max_features=manifest['max_features'], idf_refresh_ratio=manifest['idf_refresh_ratio'],
+                        search_backend=search_backend, search_options=search_options,
+                        weight_dtype=manifest.get('weight_dtype', 'float64'),
+                        dedup_threshold=manifest.get('dedup_threshold'))
+        if 'vocabulary' in manifest:
+            processor.vocabulary = {term: column for column, term in enumerate(manifest['vocabulary'])}
+        else:
+            processor._vocabulary = None
+            processor._terms, processor._term_offsets = mapped('terms'), mapped('term_offsets')
+        processor.documents = {doc_id: count for doc_id, count in manifest['documents']}
+        processor.document_metadata = manifest.get('document_metadata', {})
+        if 'stop_words' in manifest:
+            processor._stop_words = frozenset(manifest['stop_words'])
+        
+        # Per-term arrays are small and updated in place, so they are copied
+        processor._df = np.array(mapped('df'))
+        processor._term_totals = np.array(mapped('term_totals'))
+        processor._idf = np.array(mapped('idf'))
+        processor._active_terms = np.array(mapped('active_terms'))
+        processor._idf_docs = manifest['idf_docs']
+        processor._rows_changed = manifest.get('rows_changed', 0)
+        processor._sentence_ptr = mapped('sentence_ptr')
+        processor._sentence_spans = mapped('sentence_spans')
+        processor._sentence_keys = mapped('sentence_keys')
+        
+        def optional(name):
+            return mapped(name) if os.path.exists(os.path.join(path, name + '.npy')) else None
+        
+        doc_ids = [doc_id for doc_id, _ in manifest['documents']]
+        processor.chunks = ChunkStore.from_arrays(doc_ids, mapped('texts'), mapped('text_offsets'),
+                                                  mapped('chunk_sources'), optional('chunk_pages'),
+                                                  optional('chunk_spans'), optional('duplicate_rows'),
+                                                  optional('duplicate_sources'), optional('duplicate_pages'),
+                                                  optional('duplicate_spans'))
+        if processor._deduplicator is not None:
+            processor._deduplicator.load(mapped('dedup_signatures'))
+        
+        if manifest['num_chunks']:
+            shape = (manifest['num_chunks'], processor._vocabulary_size())
+            indptr, indices = mapped('indptr'), mapped('indices')
+            processor._counts = csr_matrix((mapped('counts'), indices, indptr), shape=shape, copy=False)
+            if processor.weight_dtype.name in QUANTIZED_DTYPES:
+                processor._vectors = QuantizedIndex(mapped('postings_terms'), mapped('postings_indptr'),
+                                                    mapped('postings_rows'), mapped('postings_weights'),
+                                                    mapped('row_scales'), shape[1])
+            else:
+                # Snapshots written before inactive terms were dropped share the count structure
+                if os.path.exists(os.path.join(path, 'vector_indices.npy')):
+                    indptr, indices = mapped('vector_indptr'), mapped('vector_indices')
+                processor._vectors = csr_matrix((mapped('data'), indices, indptr), shape=shape, copy=False)
+        
+        processor.logger.info(f"Loaded index with {manifest['num_chunks']} chunks from {path}")
+        return processor
+    
+    def refresh(self):
+        """Recompute IDF weights over the whole index"""
+        with self._lock.write():
+            self._merge_pending_counts()
+            self._vectors = None
+            self._idf_docs = 0
+            self._stale = self._counts is not None
+            self.index_version = next(_index_versions)
+        return self.vectors
+    
+    def _index_located_chunks(self, doc_id: str, located_chunks: List[Tuple[str, int, int, int]]):
+        """Append (chunk, page, start, end) tuples to the index"""
+        if not located_chunks:
+            self._index_chunks(doc_id, [])
+            return
+        chunks, pages, starts, ends = zip(*located_chunks)
+        self._index_chunks(doc_id, list(chunks), pages, list(zip(starts, ends)))
+    
+    def _index_chunks(self, doc_id: str, chunks: List[str], pages=None, spans=None):
+        """Append a document's new chunks to the index, collapsing near-duplicates"""
+        self.documents[doc_id] = self.documents.get(doc_id, 0) + len(chunks)
+        if not chunks:
+            return
+        if self._deduplicator is None:
+            self._append_chunks(doc_id, chunks, pages, spans)
+            return
+        
+        with REGISTRY.timer('deduplication'):
+            unique = []
+            references = []
+            for i, chunk in enumerate(chunks):
+                page = UNKNOWN_PAGE if pages is None else pages[i]
+                span = UNKNOWN_SPAN if spans is None else tuple(spans[i])
+                signature = self._deduplicator.signature(chunk)
+                row = self._deduplicator.find(signature)
+                if row is None:
+                    self._deduplicator.add(signature)
+                    unique.append((chunk, page, span))
+                else:
+                    references.append((row, page, span))
+        self.chunks_checked += len(chunks)
+        self.duplicates_collapsed += len(references)
+        REGISTRY.inc('duplicate_chunks', len(references))
+        
+        if unique:
+            unique_chunks, unique_pages, unique_spans = zip(*unique)
+            self._append_chunks(doc_id, list(unique_chunks), unique_pages, list(unique_spans))
+        for row, page, span in references:
+            self.chunks.add_reference(row, doc_id, page, span)
+        if references:
+            self.index_version = next(_index_versions)
+    
+    def _append_chunks(self, doc_id: str, chunks: List[str], pages=None, spans=None):
+        """Count terms for new chunks and append them to the index as new rows"""
+        with REGISTRY.timer('vectorization'):
+            indptr, indices, data = self._count_terms(chunks, grow_vocabulary=True)
+        REGISTRY.inc('chunks_indexed', len(chunks))
+        self._rows_changed += len(chunks)
+        vocabulary_size = len(self.vocabulary)
+        self._df = self._grow(self._df, vocabulary_size)
+        self._term_totals = self._grow(self._term_totals, vocabulary_size)
+        self._df += np.bincount(indices, minlength=vocabulary_size)
+        self._term_totals += np.bincount(indices, weights=data, minlength=vocabulary_size).astype(np.int64)
+        
+        self._pending_counts.append((indptr, indices, data))
+        self._pending_sentences.append(self._segment_sentences(chunks))
+        self._stale = True
+        self.index_version = next(_index_versions)
+        self.chunks.extend(doc_id, chunks, pages, spans)
+    
+    def _segment_sentences(self, chunks: List[str]):
+        """Find quotable sentence spans and their dedup keys for new chunks"""
+        counts = []
+        spans = []
+        keys = []
+        for chunk in chunks:
+            chunk_spans = sentence_spans(chunk)
+            counts.append(len(chunk_spans))
+            spans.extend(chunk_spans)
+            keys.extend(sentence_key(chunk[start:end]) for start, end in chunk_spans)
+        
+        return (np.asarray(counts, dtype=np.int64),
+                np.asarray(spans, dtype=np.int32).reshape(-1, 2),
+                np.asarray(keys, dtype=np.int64))
+    
+    def _merge_pending_sentences(self):
+        """Append pending sentence blocks to the consolidated sentence arrays"""
+        if not self._pending_sentences:
+            return
+        
+        counts = np.concatenate([block[0] for block in self._pending_sentences])
+        self._sentence_ptr = np.concatenate([self._sentence_ptr, self._sentence_ptr[-1] + np.cumsum(counts)])
+        self._sentence_spans = np.concatenate([self._sentence_spans] + [block[1] for block in self._pending_sentences])
+        self._sentence_keys = np.concatenate([self._sentence_keys] + [block[2] for block in self._pending_sentences])
+        self._pending_sentences = []
+    
+    def _get_analyzer(self):
+        """Return the term analyzer, building it on first use"""
+        if self._analyzer is None:
+            if self._stop_words is None:
+                self._stop_words = english_stop_words()
+            self._analyzer = build_analyzer(self._stop_words)
+        return self._analyzer
+    
+    def _count_terms(self, texts: List[str], grow_vocabulary: bool = False):
+        """Build raw term-count CSR arrays for texts, growing the vocabulary or only looking terms up"""
+        vocabulary = self.vocabulary if grow_vocabulary else self._query_vocabulary()
+        analyzer = self._get_analyzer()
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            counts = {}
+            for term in analyzer(text):
+                column = vocabulary.get(term)
+                if column is None:
+                    if not grow_vocabulary:
+                        continue
+                    column = len(vocabulary)
+                    vocabulary[term] = column
+                counts[column] = counts.get(column, 0) + 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        
+        return (np.asarray(indptr, dtype=np.int64),
+                np.asarray(indices, dtype=np.int32),
+                np.asarray(data, dtype=np.int32))
+    
+    def _merge_pending_counts(self):
+        """Append pending count blocks to the consolidated count matrix"""
+        if not self._pending_counts:
+            return
+        
+        blocks = self._pending_counts
+        if self.weight_dtype != np.float64:
+            self._map_counts()
+            for block_indptr, block_indices, block_data in blocks:
+                self._count_files.append(block_indptr, block_indices, block_data)
+            self._counts = self._count_files.matrix(self._vocabulary_size())
+            self._pending_counts = []
+            return
+        if self._counts is not None:
+            blocks = [(self._counts.indptr, self._counts.indices, self._counts.data)] + blocks
+        
+        indptr_parts = [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        for block_indptr, block_indices, _ in blocks:
+            indptr_parts.append(block_indptr[1:].astype(np.int64) + offset)
+            offset += len(block_indices)
+        
+        indptr = np.concatenate(indptr_parts)
+        indices = np.concatenate([block[1] for block in blocks]).astype(np.int32, copy=False)
+        data = np.concatenate([block[2] for block in blocks]).astype(np.int32, copy=False)
+        self._counts = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, self._vocabulary_size()))
+        self._pending_counts = []
+    
+    def _map_counts(self, keep: Optional[np.ndarray] = None):
+        """Move the count matrix into memory-mapped files, keeping only the rows where keep is True"""
+        if self._count_files is None:
+            # Counts of a loaded snapshot are mapped from it, but its files are never modified
+            self._count_files = _MappedCounts()
+            if self._counts is not None:
+                self._count_files.rewrite(self._counts, keep)
+        elif keep is not None:
+            self._count_files.rewrite(self._counts, keep)
+        self._counts = self._count_files.matrix(self._vocabulary_size())
+    
+    def _update_vectors(self):
+        """Weight new rows, re-weighting everything when the IDF has drifted"""
+        self._merge_pending_counts()
+        self._merge_pending_sentences()
+        counts = self._counts
+        num_chunks = counts.shape[0]
+        vocabulary_size = self._vocabulary_size()
+        counts.resize((num_chunks, vocabulary_size))
+        
+        # Replacing documents drifts the IDF even when the chunk count stays the same
+        drift = self._rows_changed
+        appended = not (self._vectors is None or self._idf_docs == 0 or drift > self.idf_refresh_ratio * self._idf_docs)
+        if not appended:
+            self._compute_idf(num_chunks)
+            weighted = self._weight_rows(counts)
+        else:
+            # Keep the current IDF for existing terms and only weight the new rows; the
+            # matrix has its own structure, so the new rows are appended rather than
+            # re-using the count matrix's indices
+            self._extend_idf(num_chunks)
+            done = self._vectors.shape[0]
+            tail = self._weight_counts(counts[done:])
+            vectors = self._vectors
+            if isinstance(vectors, QuantizedIndex):
+                weighted = vectors.append(tail)
+            else:
+                data = np.concatenate([vectors.data, tail.data.astype(self.weight_dtype, copy=False)])
+                indices = np.concatenate([vectors.indices, tail.indices.astype(vectors.indices.dtype, copy=False)])
+                indptr = np.concatenate([vectors.indptr, vectors.indptr[-1] + tail.indptr[1:].astype(np.int64)])
+                weighted = csr_matrix((data, indices, indptr), shape=counts.shape)
+        
+        self._replace_vectors(weighted, appended)
+        self._stale = False
+    
+    def _replace_vectors(self, vectors, appended: bool = False):
+        """Install a new searchable matrix; appended means only rows were added to the old one"""
+        self._vectors = vectors
+        self._vectors_generation += 1
+        if not appended:
+            self._appended_since = self._vectors_generation
+    
+    def _compute_idf(self, num_chunks: int):
+        """Recompute smoothed IDF weights and the max_features vocabulary limit"""
+        vocabulary_size = self._vocabulary_size()
+        self._active_vocabulary = None
+        self._idf = np.log((1 + num_chunks) / (1 + self._df.astype(np.float64))) + 1
+        self._active_terms = np.ones(vocabulary_size, dtype=bool)
+        if self.max_features is not None and vocabulary_size > self.max_features:
+            # Same criterion as TfidfVectorizer: keep the most frequent terms
+            order = np.argsort(-self._term_totals, kind='stable')
+            self._active_terms[order[self.max_features:]] = False
+            self._idf[~self._active_terms] = 0.0
+        self._idf_docs = num_chunks
+        self._rows_changed = 0
+    
+    def _extend_idf(self, num_chunks: int):
+        """Assign IDF weights to terms first seen since the last refresh"""
+        known = len(self._idf)
+        vocabulary_size = self._vocabulary_size()
+        if known == vocabulary_size:
+            return
+        
+        new_idf = np.log((1 + num_chunks) / (1 + self._df[known:].astype(np.float64))) + 1
+        new_active = np.ones(vocabulary_size - known, dtype=bool)
+        if self.max_features is not None:
+            room = max(self.max_features - int(self._active_terms.sum()), 0)
+            new_active[room:] = False
+            new_idf[~new_active] = 0.0
+        self._idf = np.concatenate([self._idf, new_idf])
+        self._active_terms = np.concatenate([self._active_terms, new_active])
+    
+    def _weight_rows(self, counts):
+        """Weight a whole count matrix into the index's storage format
+        
+        Reduced-precision indexes are weighted a block of rows at a time, so the
+        float64 weights of only one block exist at once.
+        """
+        if self.weight_dtype == np.float64:
+            return self._weight_counts(counts)
+        
+        quantized = self.weight_dtype.name in QUANTIZED_DTYPES
+        blocks = []
+        row_scales = []
+        for start in range(0, counts.shape[0] or 1, WEIGHT_BLOCK_ROWS):
+            block = self._weight_counts(counts[start:start + WEIGHT_BLOCK_ROWS])
+            if quantized:
+                block, block_scales = quantize_rows(block, self.weight_dtype.name)
+                row_scales.append(block_scales)
+            else:
+                block.data = block.data.astype(self.weight_dtype)
+            blocks.append(block)
+        weighted = vstack(blocks, format='csr') if len(blocks) > 1 else blocks[0]
+        if quantized:
+            return QuantizedIndex.from_codes(weighted, np.concatenate(row_scales))
+        return weighted
+    
+    def _weight_counts(self, counts) -> csr_matrix:
+        """Apply IDF weights and L2 row normalization to a count matrix
+        
+        Terms beyond max_features have zero IDF and are left out of the result,
+        which gets its own indices and indptr instead of sharing the counts'.
+        """
+        indptr, indices = counts.indptr, counts.indices
+        idf = self._grow(self._idf, counts.shape[1])
+        weights = counts.data * idf[indices]
+        
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=counts.shape[0]))
+        norms[norms == 0] = 1.0
+        weights /= norms[rows]
+        
+        active = weights != 0
+        if not active.all():
+            weights, indices = weights[active], indices[active]
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(rows[active], minlength=counts.shape[0]))])
+        return csr_matrix((weights, indices, indptr), shape=counts.shape)
+    
+    def deduplication_stats(self) -> Dict:
+        """Return how many ingested chunks were checked and collapsed as near-duplicates"""
+        with self._lock.read():
+            return {
+                'threshold': self.dedup_threshold,
+                'checked': self.chunks_checked,
+                'duplicates': self.duplicates_collapsed,
+                'duplicate_ratio': self.duplicates_collapsed / self.chunks_checked if self.chunks_checked else 0.0,
+                'rows': len(self.chunks),
+                'references': self.chunks.num_references
+            }
+    
+    def _get_searcher(self, vectors):
+        """Return a retrieval backend for the current matrix without building one on the query path
+        
+        Called under the read lock. When the backend is out of date, a new one is
+        built on a background thread; meanwhile the previous backend serves the
+        rows it knows, with rows appended since scored exactly, or exact search
+        is used if rows were re-weighted or removed.
+        """
+        generation = self._vectors_generation
+        backend = SEARCH_BACKENDS[self.search_backend]
+        with self._searcher_lock:
+            searcher = self._searcher
+            if searcher is not None and self._searcher_generation == generation:
+                return searcher
+            if backend is ExactSearcher:
+                # Nothing to build: queries on the old matrix finished before it was replaced,
+                # and quantized postings are searched directly
+                if not isinstance(vectors, QuantizedIndex):
+                    vectors = ExactSearcher(vectors)
+                self._searcher, self._searcher_generation = vectors, generation
+                return self._searcher
+            if not self._searcher_building:
+                self._searcher_building = True
+                threading.Thread(target=self._build_searcher, args=(vectors, generation, self._searcher_epoch, True),
+                                 name='searcher-build', daemon=True).start()
+            if searcher is not None and self._searcher_generation >= self._appended_since:
+                return AppendedRowsSearcher(searcher, vectors)
+        return ExactSearcher(vectors)
+    
+    def _build_searcher(self, vectors, generation: int, epoch: int, background: bool = False):
+        """Build the backend for one matrix and install it unless a newer one already is"""
+        searcher = None
+        try:
+            with REGISTRY.timer('searcher_build'):
+                searcher = SEARCH_BACKENDS[self.search_backend](vectors, **self.search_options)
+        except Exception as e:
+            self.logger.error(f"Error building {self.search_backend} search backend: {str(e)}")
+        
+        # The write lock waits for queries still using the backend being replaced
+        with self._lock.write():
+            with self._searcher_lock:
+                if background:
+                    self._searcher_building = False
+                if searcher is not None and epoch == self._searcher_epoch and generation > self._searcher_generation:
+                    searcher, self._searcher = self._searcher, searcher
+                    self._searcher_generation = generation
+            if hasattr(searcher, 'close'):
+                searcher.close()
+    
+    def _encode_queries(self, queries: List[str], num_features: Optional[int] = None) -> csr_matrix:
+        """Vectorize queries against the current vocabulary and IDF weights
+        
+        num_features limits the vectors to the columns of the searchable matrix,
+        which lags the vocabulary while new chunks are pending.
+        """
+        indptr, indices, data = self._count_terms(queries)
+        counts = csr_matrix((data, indices, indptr), shape=(len(queries), self._vocabulary_size()))
+        if num_features is not None and num_features < counts.shape[1]:
+            counts = counts[:, :num_features]
+        return self._weight_counts(counts)
+    
+    def _encode_query(self, query: str, num_features: int) -> QueryVector:
+        """Vectorize one query exactly like _encode_queries without building sparse matrices
+        
+        Terms are counted with a direct vocabulary lookup and weighted in
+        the same order and arithmetic as _weight_counts, so the result is
+        bit-for-bit identical.
+        """
+        vocabulary = self._query_vocabulary()
+        counts = {}
+        for term in self._get_analyzer()(query):
+            column = vocabulary.get(term)
+            if column is not None and column < num_features:
+                counts[column] = counts.get(column, 0) + 1
+        
+        idf = self._idf
+        known = len(idf)
+        weights = [count * idf[column] if column < known else 0.0 for column, count in counts.items()]
+        norm = math.sqrt(sum(weight * weight for weight in weights)) or 1.0
+        return QueryVector(np.fromiter(counts, dtype=np.int32, count=len(counts)),
+                           np.array([weight / norm for weight in weights]), num_features)
+    
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        """Zero-pad a per-term array to the vocabulary size"""
+        if len(array) >= size:
+            return array
+        return np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)])
+    
     def _split_into_chunks(self, text: str, chunk_size: int) -> List[str]:
         """Split text into chunks of approximately equal size"""
-        chunks = []
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        current_chunk = ""
+        return list(iter_chunks(SENTENCE_BOUNDARY.split(text), chunk_size))
+    
+    def search_similar_content(self, query: str, k: int = 3, sources=None, topics=None,
+                               since=None, until=None) -> List[Dict]:
+        """Search for content similar to the query
         
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
+        sources (document ids) and topics restrict the search to documents with
+        any of the given values, and since/until to documents dated in that
+        inclusive range. Filtered searches score only the matching rows, exactly.
+        """
+        start_time = time.perf_counter()
+        try:
+            # Bring pending chunks into the searchable matrix, then score under the read lock
+            self.vectors
+            with self._lock.read():
+                vectors = self._vectors
+                if vectors is None:
+                    self.logger.error("No vectors available for search")
+                    return []
                 
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        return chunks
+                rows = self._filter_rows(vectors, sources, topics, since, until)
+                
+                # Create query vector
+                with REGISTRY.timer('query_transform'):
+                    query_vector = self._encode_query(query, vectors.shape[1])
+                
+                # Score chunks and select the top k
+                if rows is None:
+                    top_indices, top_scores = self._get_searcher(vectors).search(query_vector, k)
+                else:
+                    top_indices, top_scores = search_rows(vectors, query_vector, rows, k)
+                
+                results = self._format_results(top_indices, top_scores)
             
-    def search_similar_content(self, query: str, k: int = 3) -> List[Dict]:
-        """Search for content similar to the query"""
+            REGISTRY.inc('queries')
+            REGISTRY.observe('query_seconds', time.perf_counter() - start_time)
+            return results
+        
+        except Exception as e:
+            self.logger.error(f"Error searching similar content: {str(e)}")
+            return []
+    
+    def search_similar_content_batch(self, queries: List[str], k: int = 3, block_size: int = 256,
+                                     sources=None, topics=None, since=None, until=None) -> List[List[Dict]]:
+        """Search for content similar to many queries with sparse matrix products
+        
+        Queries are scored in blocks of at most block_size, fewer on large
+        corpora so a block never holds more than MAX_BLOCK_SCORES dense scores.
+        The filters work as in search_similar_content and apply to every query.
+        """
         try:
-            if self.vectors is None:
-                self.logger.error("No vectors available for search")
-                return []
+            # Bring pending chunks into the searchable matrix, then score under the read lock
+            self.vectors
+            with self._lock.read():
+                vectors = self._vectors
+                if vectors is None:
+                    self.logger.error("No vectors available for search")
+                    return [[] for _ in queries]
+                if not queries:
+                    return []
+                rows = self._filter_rows(vectors, sources, topics, since, until)
+                quantized = isinstance(vectors, QuantizedIndex)
+                num_candidates = vectors.shape[0] if rows is None else len(rows)
+                candidates = None if quantized else vectors if rows is None else vectors[rows]
                 
-            # Create query vector
-            query_vector = self.vectorizer.transform([query])
-            
-            # Calculate similarity scores
-            similarity_scores = cosine_similarity(query_vector, self.vectors)[0]
-            
-            # Get top k results
-            top_indices = similarity_scores.argsort()[-k:][::-1]
-            
-            # Format results
-            results = []
-            for idx in top_indices:
-                results.append({
-                    'content': self.chunk_texts[idx],
-                    'score': float(similarity_scores[idx])
-                })
+                # Vectorize every query at once, then score one block of queries at a time
+                with REGISTRY.timer('query_transform'):
+                    query_vectors = self._encode_queries(list(queries), vectors.shape[1])
+                    if not quantized:
+                        query_vectors = query_vectors.astype(vectors.dtype)
+                block_size = max(1, min(block_size, MAX_BLOCK_SCORES // max(num_candidates, 1)))
                 
-            return results
+                results = []
+                for start in range(0, len(queries), block_size):
+                    with REGISTRY.timer('scoring'):
+                        if quantized:
+                            # Only the postings of the block's query terms are dequantized
+                            block = vectors.score_block(query_vectors[start:start + block_size], rows)
+                        else:
+                            # Chunks x queries keeps the large matrix in its own CSR layout
+                            block = (candidates @ query_vectors[start:start + block_size].T).T.toarray()
+                    with REGISTRY.timer('top_k'):
+                        top_rows = top_k_rows(block, k)
+                    for top_indices, top_scores in zip(*top_rows):
+                        if rows is not None:
+                            top_indices = rows[top_indices]
+                        results.append(self._format_results(top_indices, top_scores))
             
+            REGISTRY.inc('queries', len(queries))
+            return results
+        
         except Exception as e:
             self.logger.error(f"Error searching similar content: {str(e)}")
-            return []
\ No newline at end of file
+            return [[] for _ in queries]
+    
+    def _filter_rows(self, vectors, sources=None, topics=None, since=None, until=None) -> Optional[np.ndarray]:
+        """Rows of the searchable matrix that pass the filters, or None when unfiltered"""
+        if sources is None and topics is None and since is None and until is None:
+            return None
+        cached = self._metadata_index
+        if cached is None or cached[0] != self.index_version:
+            cached = (self.index_version, MetadataIndex(self.chunks.rows_by_source(), self.document_metadata))
+            self._metadata_index = cached
+        rows = cached[1].rows(sources, topics, since, until)
+        # Chunks added since the matrix was last re-weighted are not searchable yet
+        return rows[rows < vectors.shape[0]]
+    
+    def _format_results(self, top_indices, top_scores) -> List[Dict]:
+        """Turn selected rows into result dictionaries"""
+        results = []
+        for idx, score in zip(top_indices, top_scores):
+            REGISTRY.observe('result_score', float(score), SCORE_BUCKETS)
+            start, end = self._sentence_ptr[idx], self._sentence_ptr[idx + 1]
+            provenance = self.chunks.provenance(idx)
+            results.append({
+                'content': self.chunks[idx],
+                'score': float(score),
+                'source': provenance['source'],
+                'page': provenance['page'],
+                'char_span': provenance['char_span'],
+                'duplicates': self.chunks.references(idx),
+                'sentence_spans': self._sentence_spans[start:end].tolist(),
+                'sentence_keys': self._sentence_keys[start:end].tolist()
+            })
+        
+        return results
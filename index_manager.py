@@ -0,0 +1,166 @@
+import os
+import glob
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, Optional
+from document_processor import SimpleDocumentProcessor
+from ingestion import ingest_files
+
+# File in an index snapshot listing the state of the documents it was built from
+SOURCES_FILE = 'sources.json'
+
+# Processor settings that change what gets indexed; a snapshot built with
+# other values must be rebuilt rather than loaded
+BUILD_OPTION_KEYS = ('max_features', 'dedup_threshold')
+
+def scan_documents(directory: str, pattern: str = '*.pdf') -> Dict[str, tuple]:
+    """Return the modification time and size of every matching document"""
+    manifest = {}
+    for path in glob.glob(os.path.join(directory, pattern)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        manifest[path] = (stat.st_mtime_ns, stat.st_size)
+    return manifest
+
+def build_options(processor: SimpleDocumentProcessor) -> Dict:
+    """Return the settings of a processor that determine its index contents"""
+    return {key: getattr(processor, key) for key in BUILD_OPTION_KEYS}
+
+def save_sources(snapshot_path: str, manifest: Dict[str, tuple], options: Optional[Dict] = None):
+    """Record the documents and build options a saved snapshot was built from"""
+    with open(os.path.join(snapshot_path, SOURCES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'documents': manifest, 'build_options': options or {}}, f)
+
+def _read_sources(snapshot_path: str) -> Optional[Dict]:
+    """Return the parsed sources file of a snapshot, or None if missing or unreadable"""
+    try:
+        with open(os.path.join(snapshot_path, SOURCES_FILE), encoding='utf-8') as f:
+            sources = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # Files written before build options were recorded are treated as unknown
+    return sources if isinstance(sources, dict) and 'documents' in sources else None
+
+def load_sources(snapshot_path: str) -> Optional[Dict[str, tuple]]:
+    """Return the documents a snapshot was built from, or None if unknown"""
+    sources = _read_sources(snapshot_path)
+    if sources is None:
+        return None
+    return {path: tuple(state) for path, state in sources['documents'].items()}
+
+def load_build_options(snapshot_path: str) -> Optional[Dict]:
+    """Return the build options a snapshot was built with, or None if unknown"""
+    sources = _read_sources(snapshot_path)
+    return sources['build_options'] if sources is not None else None
+
+class IndexReloader:
+    """Rebuilds the knowledge base in the background and swaps it into a running advisor
+    
+    The document directory is polled for added, removed or modified files
+    (or a rebuild is requested with trigger()). A new processor is built off
+    the request path and swapped in with one attribute assignment, so
+    queries already running finish on the old index.
+    """
+    
+    def __init__(self, advisor, directory: str, pattern: str = '*.pdf', poll_interval: float = 5.0,
+                 processor_factory: Callable[[], SimpleDocumentProcessor] = SimpleDocumentProcessor,
+                 snapshot_path: Optional[str] = None, ingest_options: Optional[Dict] = None):
+        self.advisor = advisor
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_interval = poll_interval
+        self.processor_factory = processor_factory
+        self.snapshot_path = snapshot_path
+        self.ingest_options = ingest_options or {}
+        self.logger = logging.getLogger(__name__)
+        
+        self._manifest = self.scan()
+        self._rebuild_lock = threading.Lock()
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.rebuilds = 0
+        self.last_report = None
+    
+    def scan(self) -> Dict[str, tuple]:
+        """Return the modification time and size of every matching document"""
+        return scan_documents(self.directory, self.pattern)
+    
+    def check_for_changes(self) -> bool:
+        """Rebuild and swap the index if the document directory has changed"""
+        manifest = self.scan()
+        if manifest == self._manifest:
+            return False
+        self.rebuild(manifest)
+        return True
+    
+    def rebuild(self, manifest: Optional[Dict[str, tuple]] = None) -> Dict:
+        """Build a new index from the directory and swap it into the advisor"""
+        with self._rebuild_lock:
+            manifest = manifest if manifest is not None else self.scan()
+            start_time = time.perf_counter()
+            
+            processor = self.processor_factory()
+            ingest_report = ingest_files(processor, list(manifest), **self.ingest_options)
+            processor.prepare()
+            if self.snapshot_path:
+                processor.save(self.snapshot_path)
+                save_sources(self.snapshot_path, manifest, build_options(processor))
+            build_seconds = time.perf_counter() - start_time
+            
+            swap_start = time.perf_counter()
+            self.advisor.swap_processor(processor)
+            swap_seconds = time.perf_counter() - swap_start
+            
+            self._manifest = manifest
+            self.rebuilds += 1
+            self.last_report = {
+                'documents': len(processor.documents),
+                'chunks': len(processor.document_chunks),
+                'failed': ingest_report['failed'],
+                'build_seconds': build_seconds,
+                'swap_seconds': swap_seconds
+            }
+            self.logger.info(f"Rebuilt index with {self.last_report['chunks']} chunks in {build_seconds:.2f}s "
+                             f"(swap took {swap_seconds * 1e6:.0f}us)")
+            return self.last_report
+    
+    def trigger(self):
+        """Ask the background thread to rebuild now"""
+        self._trigger.set()
+    
+    def start(self):
+        """Start watching the directory in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name='index-reloader', daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background thread"""
+        self._stop.set()
+        self._trigger.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def _watch(self):
+        """Poll for changes until stopped, rebuilding on change or trigger"""
+        while not self._stop.is_set():
+            triggered = self._trigger.wait(self.poll_interval)
+            self._trigger.clear()
+            if self._stop.is_set():
+                break
+            try:
+                if triggered:
+                    self.rebuild()
+                else:
+                    self.check_for_changes()
+            except Exception as e:
+                # Keep serving from the current index if a rebuild fails
+                self.logger.error(f"Error rebuilding index: {str(e)}")
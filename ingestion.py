@@ -0,0 +1,149 @@
+import os
+import glob
+import time
+import logging
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Dict, Optional, Tuple
+from document_processor import iter_located_chunks, iter_located_sentences
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) from a PDF"""
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
+
+def _extract_task(file_path: str, start: int, stop: int) -> Tuple[List[str], float]:
+    """Extract a page range and report how long it took, for workers that cannot record metrics"""
+    start_time = time.perf_counter()
+    pages = extract_page_range(file_path, start, stop)
+    return pages, time.perf_counter() - start_time
+
+def _count_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF without extracting any text"""
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+def _iter_file_pages(tasks_by_file: Dict[str, List[Tuple[str, int, int]]], max_workers: int,
+                     failures: Dict[str, str]) -> Iterator[Tuple[str, List[str]]]:
+    """Yield (file path, pages) for each file in order, recording files that fail to extract
+    
+    Page ranges are extracted across a process pool, with at most
+    2 * max_workers of them submitted ahead of the file being yielded, so
+    only the pages of the next few files are held at once.
+    """
+    num_tasks = sum(len(file_tasks) for file_tasks in tasks_by_file.values())
+    if max_workers == 1 or num_tasks <= 1:
+        for file_path, file_tasks in tasks_by_file.items():
+            pages = []
+            try:
+                for task in file_tasks:
+                    task_pages, seconds = _extract_task(*task)
+                    REGISTRY.observe('stage_seconds', seconds, stage='extraction')
+                    pages.extend(task_pages)
+            except Exception as e:
+                failures[file_path] = str(e)
+                continue
+            yield file_path, pages
+        return
+    
+    queued = (task for file_tasks in tasks_by_file.values() for task in file_tasks)
+    window = 2 * max_workers
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for file_path, file_tasks in tasks_by_file.items():
+            pages = []
+            error = None
+            for task in file_tasks:
+                # Tasks are queued in file order, so this task is reached before the queue runs out
+                while task not in futures or len(futures) < window:
+                    next_task = next(queued, None)
+                    if next_task is None:
+                        break
+                    futures[next_task] = executor.submit(_extract_task, *next_task)
+                try:
+                    task_pages, seconds = futures.pop(task).result()
+                    REGISTRY.observe('stage_seconds', seconds, stage='extraction')
+                    pages.extend(task_pages)
+                except Exception as e:
+                    error = error or str(e)
+            if error is not None:
+                failures[file_path] = error
+                continue
+            yield file_path, pages
+
+def ingest_directory(processor, directory: str, pattern: str = '*.pdf', **kwargs) -> Dict:
+    """Ingest every PDF in a directory into the processor's index"""
+    file_paths = glob.glob(os.path.join(directory, pattern))
+    return ingest_files(processor, file_paths, **kwargs)
+
+def ingest_files(processor, file_paths: List[str], max_workers: Optional[int] = None,
+                 pages_per_task: int = 50, chunk_size: int = 200, overlap: int = 0,
+                 unit: str = 'chars', metadata: Optional[Dict[str, Dict]] = None) -> Dict:
+    """Extract PDFs across a process pool and add them to the index in a deterministic order
+    
+    Files are added one at a time in sorted order as soon as all their pages
+    are extracted, so neither every file's pages nor all chunks are held at once.
+    metadata optionally gives {'topics': [...], 'date': ...} per file path;
+    files without a date are dated by their modification time.
+    """
+    start_time = time.perf_counter()
+    file_paths = sorted(file_paths)
+    metadata = metadata or {}
+    failures = {}
+    
+    # Split large files into page ranges so one file can use several workers
+    tasks_by_file = {}
+    for file_path in file_paths:
+        try:
+            num_pages = _count_pages(file_path)
+        except Exception as e:
+            failures[file_path] = str(e)
+            continue
+        tasks_by_file[file_path] = [(file_path, start, min(start + pages_per_task, num_pages))
+                                    for start in range(0, num_pages, pages_per_task)]
+    
+    num_files = 0
+    num_chunks = 0
+    total_pages = 0
+    total_bytes = 0
+    max_workers = max_workers or os.cpu_count() or 1
+    for file_path, pages in _iter_file_pages(tasks_by_file, max_workers, failures):
+        with REGISTRY.timer('chunking'):
+            located = list(iter_located_chunks(iter_located_sentences(pages), chunk_size, overlap, unit))
+        document_metadata = {
+            'date': datetime.date.fromtimestamp(os.path.getmtime(file_path)),
+            **metadata.get(file_path, {})
+        }
+        num_chunks += processor.add_documents({file_path: [chunk for chunk, _, _, _ in located]},
+                                              {file_path: [(page, start, end) for _, page, start, end in located]},
+                                              {file_path: document_metadata})
+        num_files += 1
+        total_pages += len(pages)
+        total_bytes += os.path.getsize(file_path)
+        # Drop this file's pages and chunks before waiting on the next file
+        del pages, located
+    
+    for file_path in sorted(failures):
+        logger.error(f"Error processing document {file_path}: {failures[file_path]}")
+    REGISTRY.inc('pages_extracted', total_pages)
+    
+    elapsed = time.perf_counter() - start_time
+    report = {
+        'files': num_files,
+        'failed': failures,
+        'pages': total_pages,
+        'bytes': total_bytes,
+        'chunks': num_chunks,
+        'seconds': elapsed,
+        'pages_per_second': total_pages / elapsed if elapsed > 0 else 0.0,
+        'mb_per_second': total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+    }
+    if getattr(processor, 'dedup_threshold', None):
+        report['deduplication'] = processor.deduplication_stats()
+    logger.info(f"Ingested {report['files']} files ({total_pages} pages, {len(failures)} failed) "
+                f"at {report['pages_per_second']:.1f} pages/s, {report['mb_per_second']:.2f} MB/s")
+    return report
@@ -1,44 +1,102 @@
+import time
+
+# Taken before the remaining imports so startup reports include them
+START_TIME = time.perf_counter()
+
+import os
+import argparse
+import functools
 import logging
-from document_processor import SimpleDocumentProcessor
+from metrics import REGISTRY
+from document_processor import SEARCH_BACKENDS, SimpleDocumentProcessor
 from chatbot import FinancialAdvisorRAG
-from document_generator import create_comprehensive_financial_documents
+from ingestion import ingest_files
+from server import run_server
+from index_manager import IndexReloader, build_options, load_build_options, load_sources, save_sources, scan_documents
+from document_generator import DOCUMENT_TOPICS, create_comprehensive_financial_documents
+
+# Location of the saved index snapshot reused across runs
+INDEX_PATH = 'data/index'
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Financial Advisory Chatbot")
+    parser.add_argument('--serve', action='store_true', help="Serve an HTTP/JSON API instead of the terminal demo")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to bind in server mode")
+    parser.add_argument('--port', type=int, default=8000, help="Port to bind in server mode")
+    parser.add_argument('--workers', type=int, default=None, help="Retrieval worker threads in server mode")
+    parser.add_argument('--shards', type=int, default=None, help="Split the index across this many worker processes")
+    parser.add_argument('--backend', choices=sorted(SEARCH_BACKENDS), default='exact', help="Retrieval backend")
+    parser.add_argument('--max-features', type=int, default=10000,
+                        help="Vocabulary size limit for new indexes (0 for no limit)")
+    parser.add_argument('--dedup-threshold', type=float, default=0.9,
+                        help="Similarity at which new chunks are collapsed into an indexed one (0 to disable)")
+    return parser.parse_args(argv)
 
-def main():
+def main(argv=None):
     """Main entry point for Financial Advisory Chatbot demo"""
+    args = parse_args(argv)
+    
     # Setup logging
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logger = logging.getLogger(__name__)
     
     try:
-        # Create financial documents (for demo purposes)
+        main_start = time.perf_counter()
+        
+        # Create financial documents (for demo purposes); unchanged files are not rewritten
         create_comprehensive_financial_documents()
+        documents_done = time.perf_counter()
         
-        # Initialize document processor
-        processor = SimpleDocumentProcessor()
-        
-        # Process all documents
-        document_paths = [
-            'data/investment_strategies.pdf',
-            'data/retirement_planning.pdf',
-            'data/tax_optimization.pdf',
-            'data/market_analysis.pdf'
-        ]
-        
-        # Process each document
-        all_chunks = []
-        for doc_path in document_paths:
-            success = processor.process_document(doc_path)
-            if success:
-                all_chunks.extend(processor.document_chunks)
-                
-        # Re-initialize with combined knowledge
-        processor = SimpleDocumentProcessor()
-        processor.document_chunks = all_chunks
-        processor.chunk_texts = all_chunks
-        processor.vectors = processor.vectorizer.fit_transform(all_chunks)
+        # Fan queries out over index shards in worker processes when requested
+        search_options = {'search_backend': 'sharded', 'search_options': {'num_shards': args.shards}} \
+            if args.shards else {'search_backend': args.backend}
+        index_options = {'max_features': args.max_features or None, 'dedup_threshold': args.dedup_threshold or None}
+        processor_options = {**index_options, **search_options}
+        
+        # Tag the demo documents with topics so searches can be scoped to them
+        ingest_options = {'metadata': {os.path.join('data', name): {'topics': topics}
+                                       for name, topics in DOCUMENT_TOPICS.items()}}
+        
+        manifest = scan_documents('data')
+        if (os.path.exists(INDEX_PATH) and load_sources(INDEX_PATH) == manifest
+                and load_build_options(INDEX_PATH) == index_options):
+            # Reuse the saved index instead of re-parsing PDFs that have not changed
+            processor = SimpleDocumentProcessor.load(INDEX_PATH, **search_options)
+            index_action = 'loaded'
+        else:
+            # Initialize document processor
+            processor = SimpleDocumentProcessor(**processor_options)
+            
+            # Extract the documents in parallel into one live index
+            ingest_files(processor, list(manifest), **ingest_options)
+            
+            processor.save(INDEX_PATH)
+            save_sources(INDEX_PATH, manifest, build_options(processor))
+            index_action = 'built'
+        
+        ready = time.perf_counter()
+        REGISTRY.observe('startup_seconds', ready - START_TIME)
+        logger.info(f"Started in {ready - START_TIME:.2f}s (imports {main_start - START_TIME:.2f}s, "
+                    f"documents {documents_done - main_start:.2f}s, index {index_action} in {ready - documents_done:.2f}s)")
         
         # Initialize financial advisor chatbot
         advisor = FinancialAdvisorRAG(processor)
+        # The advisor owns the index from here, so a swapped-out one can be closed
+        del processor
+        
+        if args.serve:
+            # Rebuild and swap in a fresh index whenever the documents change
+            reloader = IndexReloader(advisor, 'data', snapshot_path=INDEX_PATH,
+                                     processor_factory=functools.partial(SimpleDocumentProcessor, **processor_options),
+                                     ingest_options=ingest_options)
+            reloader.start()
+            try:
+                run_server(advisor, args.host, args.port, max_workers=args.workers)
+            finally:
+                reloader.stop()
+                advisor.document_processor.close()
+            return
         
         # Interactive demo
         print("\n=== Financial Advisory Chatbot ===")
@@ -49,10 +107,10 @@ def main():
             if query.lower() in ['exit', 'quit', 'bye']:
                 print("Thank you for using the Financial Advisory Chatbot!")
                 break
-                
+            
             response = advisor.generate_response(query)
             print(f"\nResponse: {response}\n")
-            
+    
     except Exception as e:
         logger.error(f"Error in main application: {str(e)}")
         print(f"An error occurred: {str(e)}")
@@ -0,0 +1,76 @@
+import numpy as np
+from datetime import date, datetime
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Union
+
+def as_date(value) -> str:
+    """Normalize a date, datetime or ISO string to a YYYY-MM-DD string, raising ValueError if it is not one"""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        value = datetime.fromisoformat(str(value)).date()
+    return value.isoformat()
+
+def _as_set(values: Union[str, Iterable[str]]) -> set:
+    return {values} if isinstance(values, str) else set(values)
+
+def _union(row_arrays: List[np.ndarray]) -> np.ndarray:
+    if not row_arrays:
+        return np.zeros(0, dtype=np.int64)
+    if len(row_arrays) == 1:
+        return row_arrays[0]
+    return np.unique(np.concatenate(row_arrays))
+
+class MetadataIndex:
+    """Row sets for filtering searches by document, topic tag and date
+    
+    The rows of every document are grouped once, from a stable sort of the
+    chunk sources, and merged into per-topic row sets, while documents are
+    kept sorted by date so date ranges resolve with two bisections. A filter
+    then costs a few set operations on sorted row arrays, independent of
+    how many chunks fall outside it. The index is a snapshot; build a new one
+    whenever the chunks or the document metadata change.
+    """
+    
+    def __init__(self, rows_by_source: Dict[str, np.ndarray], metadata: Dict[str, Dict]):
+        self.rows_by_source = rows_by_source
+        
+        topic_rows = {}
+        for doc_id, rows in rows_by_source.items():
+            for topic in metadata.get(doc_id, {}).get('topics', ()):
+                topic_rows.setdefault(topic, []).append(rows)
+        self.rows_by_topic = {topic: _union(arrays) for topic, arrays in topic_rows.items()}
+        
+        dated = sorted((entry['date'], doc_id) for doc_id, entry in metadata.items()
+                       if entry.get('date') is not None and doc_id in rows_by_source)
+        self._dates = [date for date, _ in dated]
+        self._dated_sources = [doc_id for _, doc_id in dated]
+    
+    def rows(self, sources: Optional[Union[str, Iterable[str]]] = None,
+             topics: Optional[Union[str, Iterable[str]]] = None,
+             since=None, until=None) -> Optional[np.ndarray]:
+        """Return the sorted rows matching every given filter, or None if none is given
+        
+        sources and topics match any of their values; since and until bound
+        the document date inclusively, and undated documents never match them.
+        """
+        selections = []
+        if sources is not None:
+            selections.append(_union([self.rows_by_source[doc_id] for doc_id in _as_set(sources)
+                                      if doc_id in self.rows_by_source]))
+        if topics is not None:
+            selections.append(_union([self.rows_by_topic[topic] for topic in _as_set(topics)
+                                      if topic in self.rows_by_topic]))
+        if since is not None or until is not None:
+            start = 0 if since is None else bisect_left(self._dates, as_date(since))
+            stop = len(self._dates) if until is None else bisect_right(self._dates, as_date(until))
+            selections.append(_union([self.rows_by_source[doc_id] for doc_id in self._dated_sources[start:stop]]))
+        if not selections:
+            return None
+        
+        # Intersect the smallest selections first
+        selections.sort(key=len)
+        rows = selections[0]
+        for selection in selections[1:]:
+            rows = np.intersect1d(rows, selection, assume_unique=True)
+        return rows
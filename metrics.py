@@ -0,0 +1,190 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds of the result score histogram buckets (cosine similarity)
+SCORE_BUCKETS = (0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+class Histogram:
+    """Fixed-bucket histogram with a running count and sum"""
+    
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        """Record a value in the first bucket whose upper bound is at least value"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating within its bucket"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    # Overflow bucket: the largest bound is the best estimate available
+                    return lower
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.bounds[-1]
+    
+    def snapshot(self) -> Dict:
+        """Return cumulative bucket counts and quantile estimates"""
+        buckets = {}
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': buckets,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
+
+class _Timer:
+    """Context manager that records its duration in a stage histogram"""
+    
+    __slots__ = ('registry', 'key', 'start')
+    
+    def __init__(self, registry: 'MetricsRegistry', key: tuple):
+        self.registry = registry
+        self.key = key
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.registry._observe(self.key, time.perf_counter() - self.start, LATENCY_BUCKETS)
+        return False
+
+class _NullTimer:
+    """Timer used while metrics are disabled"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms for the RAG pipeline
+    
+    Series are keyed by name and label values. Recording takes one short
+    critical section and no allocation beyond the first observation of a
+    series, so instrumentation can stay on in production. Per-stage timings
+    go to the stage_seconds histogram, labelled by stage.
+    """
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._stage_keys = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+    
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        """Record a value in a histogram"""
+        if not self.enabled:
+            return
+        self._observe((name, tuple(sorted(labels.items()))), value, buckets)
+    
+    def _observe(self, key: tuple, value: float, buckets: Tuple[float, ...]):
+        """Record a value in the histogram of a series key"""
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+    
+    def timer(self, stage: str):
+        """Time a block of code as a pipeline stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        key = self._stage_keys.get(stage)
+        if key is None:
+            key = self._stage_keys[stage] = ('stage_seconds', (('stage', stage),))
+        return _Timer(self, key)
+    
+    def reset(self):
+        """Drop all recorded series"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+    
+    def snapshot(self) -> Dict:
+        """Return all counters and histogram summaries keyed by series name"""
+        with self._lock:
+            return {
+                'counters': {self._series_name(name, labels): value
+                             for (name, labels), value in sorted(self._counters.items())},
+                'histograms': {self._series_name(name, labels): histogram.snapshot()
+                               for (name, labels), histogram in sorted(self._histograms.items())}
+            }
+    
+    def to_prometheus(self, prefix: str = 'rag_') -> str:
+        """Render all series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = prefix + name
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{self._series_name(metric, labels)} {value}")
+            
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                metric = prefix + name
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} histogram")
+                    typed.add(metric)
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self._series_name(metric + '_bucket', labels + (('le', repr(float(bound))),))} "
+                                 f"{cumulative}")
+                lines.append(f"{self._series_name(metric + '_bucket', labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{self._series_name(metric + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{self._series_name(metric + '_count', labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+    
+    @staticmethod
+    def _series_name(name: str, labels: tuple) -> str:
+        """Format a series as name{label="value",...}"""
+        if not labels:
+            return name
+        return name + '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+# Process-wide registry shared by the pipeline components
+REGISTRY = MetricsRegistry()
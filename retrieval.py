@@ -0,0 +1,574 @@
+import os
+import queue
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from scipy.sparse import csr_matrix
+from metrics import REGISTRY
+
+class QueryVector:
+    """One sparse query vector with just the attributes the searchers read
+    
+    Building a scipy matrix costs more than encoding a short query, so the
+    single-query path hands searchers this instead.
+    """
+    
+    __slots__ = ('indices', 'data', 'shape')
+    
+    def __init__(self, indices: np.ndarray, data: np.ndarray, num_features: int):
+        self.indices = indices
+        self.data = data
+        self.shape = (1, num_features)
+    
+    def tocsr(self) -> csr_matrix:
+        return csr_matrix((self.data, self.indices, [0, len(self.indices)]), shape=self.shape)
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, ordered by score then index
+    
+    Uses partial selection instead of sorting every score; rows tied with the
+    k-th score are resolved by lowest index so results are deterministic.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        partition = np.argpartition(-scores, k - 1)[:k]
+        kth_score = scores[partition].min()
+        candidates = np.flatnonzero(scores >= kth_score)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+def top_k_rows(scores: np.ndarray, k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Select the top k columns of every row, ordered by score then index"""
+    num_rows, num_cols = scores.shape
+    k = min(k, num_cols)
+    if k <= 0:
+        return [np.zeros(0, dtype=np.int64)] * num_rows, [np.zeros(0)] * num_rows
+    
+    # Threshold each row at its k-th best score, keeping ties for a stable order
+    kth_scores = -np.partition(-scores, k - 1, axis=1)[:, k - 1]
+    rows, cols = np.nonzero(scores >= kth_scores[:, None])
+    values = scores[rows, cols]
+    order = np.lexsort((cols, -values, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+    
+    # Rank of each candidate within its row; keep the first k
+    row_starts = np.searchsorted(rows, np.arange(num_rows))
+    keep = np.arange(len(rows)) - row_starts[rows] < k
+    rows, cols, values = rows[keep], cols[keep], values[keep]
+    
+    splits = np.arange(1, num_rows) * k
+    return np.split(cols, splits), np.split(values, splits)
+
+class ExactSearcher:
+    """Reference retrieval backend that scores every chunk"""
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score all chunks against a normalized query vector and select the top k"""
+        dense_query = np.zeros(self.vectors.shape[1], dtype=self.vectors.dtype)
+        dense_query[query_vector.indices] = query_vector.data
+        with REGISTRY.timer('scoring'):
+            scores = self.vectors.dot(dense_query)
+        with REGISTRY.timer('top_k'):
+            top_indices = top_k_indices(scores, k)
+        return top_indices, scores[top_indices]
+
+def search_rows(vectors, query_vector, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Score only the given sorted rows against a query and select the top k of them
+    
+    Used for filtered searches: the cost grows with the candidate rows, not
+    the whole matrix. A contiguous run of rows is sliced without copying, and
+    when most rows are candidates scoring everything beats gathering them.
+    """
+    if isinstance(vectors, QuantizedIndex):
+        with REGISTRY.timer('scoring'):
+            scores = vectors.score(query_vector, rows)
+        with REGISTRY.timer('top_k'):
+            top_indices = top_k_indices(scores, k)
+        return rows[top_indices], scores[top_indices]
+    if not len(rows):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=vectors.dtype)
+    dense_query = np.zeros(vectors.shape[1], dtype=vectors.dtype)
+    dense_query[query_vector.indices] = query_vector.data
+    with REGISTRY.timer('scoring'):
+        if rows[-1] - rows[0] + 1 == len(rows):
+            scores = vectors[int(rows[0]):int(rows[-1]) + 1].dot(dense_query)
+        elif 4 * len(rows) >= vectors.shape[0]:
+            scores = vectors.dot(dense_query)[rows]
+        else:
+            scores = vectors[rows].dot(dense_query)
+    with REGISTRY.timer('top_k'):
+        top_indices = top_k_indices(scores, k)
+    return rows[top_indices], scores[top_indices]
+
+class AppendedRowsSearcher:
+    """Serves a grown matrix with a backend built on its leading rows
+    
+    Used while the backend for the current matrix is being built: rows
+    appended since the base backend was built are scored exactly, the
+    unchanged leading rows are ranked by the base backend, and the two top
+    k lists are merged by score then row.
+    """
+    
+    def __init__(self, base, vectors):
+        self.base = base
+        self.vectors = vectors
+        self.base_rows, self.base_features = base.vectors.shape
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top k rows of the base backend and the appended rows together"""
+        # Terms first seen in the appended rows never occur in the leading ones
+        known = np.asarray(query_vector.indices) < self.base_features
+        base_query = QueryVector(np.asarray(query_vector.indices)[known], np.asarray(query_vector.data)[known],
+                                 self.base_features)
+        base_indices, base_scores = self.base.search(base_query, k)
+        new_indices, new_scores = search_rows(self.vectors, query_vector,
+                                              np.arange(self.base_rows, self.vectors.shape[0]), k)
+        
+        with REGISTRY.timer('top_k'):
+            indices = np.concatenate([base_indices, new_indices])
+            scores = np.concatenate([base_scores, new_scores])
+            order = np.lexsort((indices, -scores))[:k]
+        return indices[order], scores[order]
+
+class InvertedIndex:
+    """Term-at-a-time retrieval over TF-IDF postings with MaxScore-style pruning
+    
+    Query terms are processed in decreasing order of their score upper bound.
+    Once the bounds of the remaining terms cannot lift an unseen chunk above
+    the current k-th best partial score, new chunks stop being admitted and
+    only the surviving candidates are scored for the remaining terms.
+    """
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+        postings = vectors.tocsc(copy=True)
+        postings.eliminate_zeros()
+        postings.sort_indices()
+        self.num_rows = vectors.shape[0]
+        self.indptr = postings.indptr
+        self.rows = postings.indices
+        self.weights = postings.data
+        
+        # Largest weight of each term across all chunks
+        self.max_weights = np.zeros(vectors.shape[1])
+        non_empty = np.flatnonzero(np.diff(self.indptr))
+        if len(non_empty):
+            self.max_weights[non_empty] = np.maximum.reduceat(self.weights, self.indptr[non_empty])
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top k rows and scores for a normalized query vector"""
+        terms = query_vector.indices
+        query_weights = query_vector.data
+        bounds = query_weights * self.max_weights[terms]
+        keep = bounds > 0
+        terms, query_weights, bounds = terms[keep], query_weights[keep], bounds[keep]
+        
+        order = np.argsort(-bounds, kind='stable')
+        terms, query_weights, bounds = terms[order], query_weights[order], bounds[order]
+        remaining = np.concatenate([np.cumsum(bounds[::-1])[::-1][1:], [0.0]])
+        
+        with REGISTRY.timer('scoring'):
+            scores = np.zeros(self.num_rows)
+            in_play = np.zeros(self.num_rows, dtype=bool)
+            touched = np.zeros(0, dtype=np.int64)
+            candidates = None
+            for term, query_weight, rest in zip(terms, query_weights, remaining):
+                start, end = self.indptr[term], self.indptr[term + 1]
+                rows = self.rows[start:end]
+                weights = self.weights[start:end]
+                
+                if candidates is None:
+                    scores[rows] += query_weight * weights
+                    touched = np.concatenate([touched, rows[~in_play[rows]]])
+                    in_play[rows] = True
+                    if len(touched) < k:
+                        continue
+                    threshold = np.partition(scores[touched], len(touched) - k)[len(touched) - k]
+                    if rest < threshold:
+                        # No unseen chunk can reach the top k any more
+                        survives = scores[touched] + rest >= threshold
+                        in_play[touched[~survives]] = False
+                        candidates = np.sort(touched[survives])
+                    continue
+                
+                # Score only the surviving candidates, skipping through long postings
+                if len(candidates) * max(int(np.log2(len(rows) + 1)), 1) < len(rows):
+                    positions = np.searchsorted(rows, candidates)
+                    found = positions < len(rows)
+                    found[found] = rows[positions[found]] == candidates[found]
+                    scores[candidates[found]] += query_weight * weights[positions[found]]
+                else:
+                    hits = in_play[rows]
+                    scores[rows[hits]] += query_weight * weights[hits]
+                
+                if len(candidates) > k:
+                    threshold = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+                    survives = scores[candidates] + rest >= threshold
+                    in_play[candidates[~survives]] = False
+                    candidates = candidates[survives]
+        
+        with REGISTRY.timer('top_k'):
+            if candidates is None and len(touched) < k:
+                # Fewer matches than k: pad with zero-score rows like the exact path
+                top_indices = top_k_indices(scores, k)
+            else:
+                if candidates is None:
+                    candidates = np.sort(touched)
+                top_indices = candidates[top_k_indices(scores[candidates], k)]
+        return top_indices, scores[top_indices]
+
+# Unsigned integer types available for per-row quantized weights
+QUANTIZED_DTYPES = {'uint8': np.uint8, 'uint16': np.uint16}
+
+def quantize_rows(vectors, precision: str = 'uint8') -> Tuple[csr_matrix, np.ndarray]:
+    """Encode the weights of a CSR matrix as unsigned codes scaled by each row's largest weight
+    
+    Returns the matrix of codes and the per-row scales that turn codes back
+    into weights.
+    """
+    if precision not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unknown precision: {precision}")
+    dtype = QUANTIZED_DTYPES[precision]
+    rows = vectors.tocsr()
+    num_rows = rows.shape[0]
+    row_max = np.zeros(num_rows)
+    non_empty = np.flatnonzero(np.diff(rows.indptr))
+    if len(non_empty):
+        row_max[non_empty] = np.maximum.reduceat(np.abs(rows.data), rows.indptr[non_empty])
+    row_max[row_max == 0] = 1.0
+    row_scales = row_max / np.iinfo(dtype).max
+    row_of = np.repeat(np.arange(num_rows), np.diff(rows.indptr))
+    codes = np.rint(rows.data / row_scales[row_of]).astype(dtype)
+    return csr_matrix((codes, rows.indices, rows.indptr), shape=rows.shape), row_scales
+
+class QuantizedIndex:
+    """Quantized TF-IDF weights stored as term postings and scored term at a time
+    
+    Weights are uint8/uint16 codes scaled by each row's largest weight, kept
+    with int32 row numbers under the terms that have any. Only those terms
+    get an offset, since a vocabulary with bigrams is mostly terms pruned by
+    max_features or seen once, and offsets are int32 below 2**31 postings. This is the whole searchable index of a
+    SimpleDocumentProcessor with weight_dtype 'uint8' or 'uint16', not a copy
+    next to a float matrix: single, filtered and batch searches dequantize
+    only the postings of their query terms, and the row scales are applied
+    once to the accumulated scores.
+    """
+    
+    def __init__(self, terms: np.ndarray, indptr: np.ndarray, rows: np.ndarray, weights: np.ndarray,
+                 row_scales: np.ndarray, num_terms: int):
+        self.terms = terms.astype(np.int32, copy=False)
+        self.indptr = indptr.astype(np.int32 if indptr[-1] < 2 ** 31 else np.int64, copy=False)
+        self.rows = rows
+        self.weights = weights
+        self.row_scales = row_scales
+        self.num_terms = num_terms
+    
+    @classmethod
+    def from_term_postings(cls, indptr: np.ndarray, rows: np.ndarray, weights: np.ndarray,
+                           row_scales: np.ndarray) -> 'QuantizedIndex':
+        """Build from postings with an offset for every term, dropping the offsets of empty terms"""
+        terms = np.flatnonzero(np.diff(indptr))
+        return cls(terms, np.append(indptr[terms], indptr[-1]), rows, weights, row_scales, len(indptr) - 1)
+    
+    @classmethod
+    def from_vectors(cls, vectors, precision: str = 'uint8') -> 'QuantizedIndex':
+        """Quantize a TF-IDF matrix"""
+        codes, row_scales = quantize_rows(vectors, precision)
+        return cls.from_codes(codes, row_scales)
+    
+    @classmethod
+    def from_codes(cls, codes, row_scales: np.ndarray) -> 'QuantizedIndex':
+        """Build postings from a CSR matrix of codes"""
+        postings = codes.tocsc()
+        postings.eliminate_zeros()
+        postings.sort_indices()
+        return cls.from_term_postings(postings.indptr, postings.indices.astype(np.int32, copy=False),
+                                      postings.data, row_scales)
+    
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.row_scales), self.num_terms
+    
+    @property
+    def precision(self) -> str:
+        return self.weights.dtype.name
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the postings and row scales"""
+        return (self.terms.nbytes + self.indptr.nbytes + self.rows.nbytes + self.weights.nbytes
+                + self.row_scales.nbytes)
+    
+    def _term_indptr(self, num_terms: Optional[int] = None) -> np.ndarray:
+        """Expand the offsets to one per term, for rebuilding the postings"""
+        num_terms = self.num_terms if num_terms is None else num_terms
+        indptr = np.zeros(num_terms + 1, dtype=np.int64)
+        indptr[self.terms + 1] = np.diff(self.indptr)
+        return np.cumsum(indptr)
+    
+    def _find_terms(self, terms: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the positions of the given sorted terms that have postings, and which of them do"""
+        positions = np.searchsorted(self.terms, terms)
+        found = positions < len(self.terms)
+        found[found] = self.terms[positions[found]] == terms[found]
+        return positions[found], found
+    
+    def append(self, vectors) -> 'QuantizedIndex':
+        """Return a new index with the rows of a TF-IDF matrix quantized and added after the existing ones"""
+        num_rows, num_terms = self.shape
+        codes, row_scales = quantize_rows(vectors, self.precision)
+        tail = QuantizedIndex.from_codes(codes, row_scales)
+        total_terms = max(num_terms, tail.shape[1])
+        old_indptr = self._term_indptr(total_terms)
+        tail_indptr = tail._term_indptr(total_terms)
+        
+        # Each term keeps its existing postings followed by those of the new rows
+        indptr = old_indptr + tail_indptr
+        old_positions = np.arange(len(self.rows)) + np.repeat(tail_indptr[:-1], np.diff(old_indptr))
+        tail_positions = np.arange(len(tail.rows)) + np.repeat(old_indptr[1:], np.diff(tail_indptr))
+        rows = np.empty(indptr[-1], dtype=np.int32)
+        weights = np.empty(indptr[-1], dtype=self.weights.dtype)
+        rows[old_positions], rows[tail_positions] = self.rows, tail.rows + num_rows
+        weights[old_positions], weights[tail_positions] = self.weights, tail.weights
+        return QuantizedIndex.from_term_postings(indptr, rows, weights,
+                                                 np.concatenate([self.row_scales, tail.row_scales]))
+    
+    def keep_rows(self, keep: np.ndarray) -> 'QuantizedIndex':
+        """Return a new index with only the rows where keep is True, renumbered in order"""
+        kept = keep[self.rows]
+        indptr = np.concatenate([[0], np.cumsum(kept)])[self.indptr]
+        non_empty = np.diff(indptr) > 0
+        renumber = np.cumsum(keep) - 1
+        return QuantizedIndex(self.terms[non_empty], np.append(indptr[:-1][non_empty], indptr[-1]),
+                              renumber[self.rows[kept]].astype(np.int32), self.weights[kept],
+                              self.row_scales[keep], self.num_terms)
+    
+    def tocsr(self) -> csr_matrix:
+        """Dequantize into a float64 TF-IDF matrix"""
+        postings = csr_matrix((self.weights.astype(np.float64), self.rows, self._term_indptr()),
+                              shape=(self.shape[1], self.shape[0]))
+        vectors = postings.T.tocsr()
+        vectors.data *= np.repeat(self.row_scales, np.diff(vectors.indptr))
+        return vectors
+    
+    def score(self, query_vector, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the scores of every row, or of the given rows, for one query vector"""
+        scores = np.zeros(self.shape[0])
+        order = np.argsort(query_vector.indices)
+        positions, found = self._find_terms(query_vector.indices[order])
+        for position, query_weight in zip(positions, query_vector.data[order][found]):
+            start, end = self.indptr[position], self.indptr[position + 1]
+            scores[self.rows[start:end]] += query_weight * self.weights[start:end]
+        if rows is not None:
+            return scores[rows] * self.row_scales[rows]
+        scores *= self.row_scales
+        return scores
+    
+    def score_block(self, query_vectors, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return dense queries x rows scores for a CSR block of query vectors
+        
+        Only the postings of terms that occur in the block are dequantized.
+        """
+        postings = csr_matrix((self.weights, self.rows, self.indptr), shape=(len(self.terms), self.shape[0]))
+        terms = np.unique(query_vectors.indices)
+        positions, found = self._find_terms(terms)
+        terms = terms[found]
+        selected = postings[positions]
+        if rows is not None:
+            selected = selected[:, rows]
+        selected = csr_matrix((selected.data.astype(np.float64), selected.indices, selected.indptr),
+                              shape=selected.shape)
+        scores = (query_vectors[:, terms] @ selected).toarray()
+        scores *= self.row_scales if rows is None else self.row_scales[rows]
+        return scores
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the top k rows and approximate scores for a normalized query vector"""
+        with REGISTRY.timer('scoring'):
+            scores = self.score(query_vector)
+        
+        with REGISTRY.timer('top_k'):
+            top_indices = top_k_indices(scores, k)
+        return top_indices, scores[top_indices]
+
+def ranking_agreement(reference, candidate, query_vectors, k: int = 10) -> Dict:
+    """Measure how closely a searcher reproduces a reference searcher's rankings
+    
+    Reports the mean overlap of the top k sets, the fraction of queries with
+    an identical top 1 and identical top k order, and the largest score
+    error on the rows both returned.
+    """
+    overlaps = []
+    same_top1 = 0
+    same_order = 0
+    max_error = 0.0
+    for i in range(query_vectors.shape[0]):
+        query_vector = query_vectors[i]
+        expected_rows, expected_scores = reference.search(query_vector, k)
+        rows, scores = candidate.search(query_vector, k)
+        overlaps.append(len(np.intersect1d(rows, expected_rows)) / max(len(expected_rows), 1))
+        same_top1 += bool(len(rows)) and rows[0] == expected_rows[0]
+        same_order += np.array_equal(rows, expected_rows)
+        
+        expected_by_row = dict(zip(expected_rows.tolist(), expected_scores.tolist()))
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if row in expected_by_row:
+                max_error = max(max_error, abs(score - expected_by_row[row]))
+    
+    num_queries = max(query_vectors.shape[0], 1)
+    return {
+        'queries': query_vectors.shape[0],
+        'k': k,
+        'mean_overlap': float(np.mean(overlaps)) if overlaps else 1.0,
+        'top1_agreement': float(same_top1) / num_queries,
+        'order_agreement': float(same_order) / num_queries,
+        'max_score_error': max_error
+    }
+
+def _attach_array(name: str, dtype: str, length: int):
+    """Attach to a shared memory block created by the parent process as a 1-d array
+    
+    Workers share the parent's resource tracker, so the block is only unlinked
+    once, by the parent.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(length, dtype=dtype, buffer=block.buf)
+
+def _serve_shard(conns: list, arrays: dict, row_start: int, row_stop: int, num_cols: int):
+    """Answer top-k requests for rows [row_start, row_stop) of a matrix held in shared memory
+    
+    Each connection carries one request at a time; requests on different
+    connections are answered in the order they arrive.
+    """
+    blocks = []
+    views = {}
+    for key, (name, dtype, length) in arrays.items():
+        block, views[key] = _attach_array(name, dtype, length)
+        blocks.append(block)
+    
+    indptr = views['indptr'][row_start:row_stop + 1]
+    first, last = indptr[0], indptr[-1]
+    shard = csr_matrix((views['data'][first:last], views['indices'][first:last], indptr - first),
+                       shape=(row_stop - row_start, num_cols), copy=False)
+    searcher = ExactSearcher(shard)
+    
+    try:
+        open_conns = list(conns)
+        while open_conns:
+            for conn in wait(open_conns):
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    open_conns.remove(conn)
+                    continue
+                if request is None:
+                    return
+                terms, weights, k = request
+                query_vector = csr_matrix((weights, terms, [0, len(terms)]), shape=(1, num_cols))
+                top_indices, top_scores = searcher.search(query_vector, k)
+                conn.send((top_indices + row_start, top_scores))
+    finally:
+        del shard, searcher, views, indptr
+        for block in blocks:
+            block.close()
+
+class ShardedSearcher:
+    """Exact retrieval fanned out over worker processes, one per contiguous range of rows
+    
+    The matrix is copied once into shared memory and every worker scores its
+    own rows of it without another copy. Per-shard top k lists are merged by
+    score then row, so results are identical to ExactSearcher. Each worker
+    is connected by num_channels pipes; a request borrows one free pipe per
+    shard, so up to num_channels concurrent requests are in flight and a
+    shard that finishes early moves on to the next request.
+    """
+    
+    def __init__(self, vectors, num_shards: Optional[int] = None, num_channels: int = 4):
+        self.vectors = vectors
+        num_rows, num_cols = vectors.shape
+        num_shards = max(min(num_shards or os.cpu_count() or 1, num_rows), 1)
+        bounds = np.linspace(0, num_rows, num_shards + 1).astype(np.int64)
+        self.shard_bounds = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        
+        self._blocks = []
+        arrays = {}
+        for key, array in (('data', vectors.data), ('indices', vectors.indices), ('indptr', vectors.indptr)):
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(len(array), dtype=array.dtype, buffer=block.buf)[:] = array
+            self._blocks.append(block)
+            arrays[key] = (block.name, array.dtype.str, len(array))
+        
+        # _channels[channel][shard] is the parent end of one pipe to a worker
+        num_channels = max(num_channels, 1)
+        self._workers = []
+        self._channels = [[] for _ in range(num_channels)]
+        for row_start, row_stop in self.shard_bounds:
+            pipes = [multiprocessing.Pipe() for _ in range(num_channels)]
+            child_conns = [child_conn for _, child_conn in pipes]
+            worker = multiprocessing.Process(target=_serve_shard, daemon=True,
+                                             args=(child_conns, arrays, row_start, row_stop, num_cols))
+            worker.start()
+            for channel, (parent_conn, child_conn) in zip(self._channels, pipes):
+                child_conn.close()
+                channel.append(parent_conn)
+            self._workers.append(worker)
+        self._free_channels = queue.Queue()
+        for channel in self._channels:
+            self._free_channels.put(channel)
+        self._finalizer = weakref.finalize(self, ShardedSearcher._shutdown,
+                                           self._channels, self._workers, self._blocks)
+    
+    @property
+    def num_shards(self) -> int:
+        return len(self.shard_bounds)
+    
+    def search(self, query_vector, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score every shard in parallel and merge their top k rows"""
+        request = (np.asarray(query_vector.indices), np.asarray(query_vector.data), k)
+        channel = self._free_channels.get()
+        try:
+            with REGISTRY.timer('scoring'):
+                for conn in channel:
+                    conn.send(request)
+                replies = [conn.recv() for conn in channel]
+        finally:
+            self._free_channels.put(channel)
+        
+        with REGISTRY.timer('top_k'):
+            indices = np.concatenate([reply[0] for reply in replies])
+            scores = np.concatenate([reply[1] for reply in replies])
+            order = np.lexsort((indices, -scores))[:k]
+        return indices[order], scores[order]
+    
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        self._finalizer()
+    
+    @staticmethod
+    def _shutdown(channels, workers, blocks):
+        """Stop workers and unlink shared memory; also runs when the searcher is collected"""
+        for conn in channels[0]:
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for channel in channels:
+            for conn in channel:
+                conn.close()
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for block in blocks:
+            block.close()
+            block.unlink()
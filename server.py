@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+from metrics import REGISTRY
+from metadata_index import as_date
+
+# Keys accepted in the "filters" object of a chat request
+FILTER_KEYS = ('sources', 'topics', 'since', 'until')
+
+# Filters that take a name or a list of names, and those that take an ISO date
+LIST_FILTERS = ('sources', 'topics')
+DATE_FILTERS = ('since', 'until')
+
+# Reason phrases for the status codes the server produces
+HTTP_REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout'
+}
+
+class HTTPError(Exception):
+    """Error that is returned to the client as a JSON response"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _validate_filters(filters) -> Dict:
+    """Check the "filters" object of a chat request, raising a 400 HTTPError if it is malformed
+    
+    Date bounds are normalized to YYYY-MM-DD so they compare with the stored document dates.
+    """
+    if not isinstance(filters, dict) or not set(filters) <= set(FILTER_KEYS):
+        raise HTTPError(400, f'"filters" may only contain {", ".join(FILTER_KEYS)}')
+    for key in LIST_FILTERS:
+        value = filters.get(key)
+        if value is not None and not isinstance(value, str) and \
+                not (isinstance(value, list) and all(isinstance(item, str) for item in value)):
+            raise HTTPError(400, f'"{key}" must be a string or a list of strings')
+    for key in DATE_FILTERS:
+        value = filters.get(key)
+        if value is None:
+            continue
+        try:
+            if not isinstance(value, str):
+                raise ValueError(value)
+            filters[key] = as_date(value)
+        except ValueError:
+            raise HTTPError(400, f'"{key}" must be an ISO date such as 2024-01-31')
+    return filters
+
+class ChatServer:
+    """Asyncio HTTP/JSON front end for FinancialAdvisorRAG
+    
+    Connections are handled on the event loop while retrieval and response
+    composition run in a thread pool, where NumPy/SciPy scoring releases the
+    GIL. Requests beyond max_pending in flight are rejected with 503 and
+    requests taking longer than request_timeout get 504.
+    
+    Endpoints:
+        POST /chat    {"query": "...", "session_id": "...", "filters": {...}} -> {"response": "..."}
+        GET  /health  liveness check
+        GET  /stats   server, cache, session and pipeline counters
+        GET  /metrics pipeline metrics in the Prometheus text format
+    """
+    
+    def __init__(self, advisor, host: str = '127.0.0.1', port: int = 8000,
+                 max_workers: Optional[int] = None, max_pending: int = 64,
+                 request_timeout: float = 10.0, max_body_bytes: int = 64 * 1024):
+        self.advisor = advisor
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.max_body_bytes = max_body_bytes
+        self.logger = logging.getLogger(__name__)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1)
+        self._server = None
+        self.in_flight = 0
+        self.requests = 0
+        self.rejected = 0
+        self.timeouts = 0
+    
+    async def start(self):
+        """Start listening; port 0 picks a free port"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.logger.info(f"Chat server listening on http://{self.host}:{self.port}")
+    
+    async def serve_forever(self):
+        """Start the server if needed and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def close(self):
+        """Stop accepting connections and shut down the worker pool"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+    
+    def stats(self) -> Dict:
+        """Return request counters along with cache and session statistics"""
+        stats = {
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
+        if hasattr(self.advisor, 'cache'):
+            stats['cache'] = self.advisor.cache.stats()
+        if hasattr(self.advisor, 'conversations'):
+            stats['conversations'] = self.advisor.conversations.stats()
+        stats['pipeline'] = REGISTRY.snapshot()
+        return stats
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve a single request and close the connection"""
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(self._read_request(reader), self.request_timeout)
+                status, payload = await self._dispatch(method, path, body)
+            except HTTPError as e:
+                status, payload = e.status, {'error': e.message}
+            except asyncio.TimeoutError:
+                status, payload = 504, {'error': 'Request timed out'}
+            except Exception as e:
+                # Malformed requests raise HTTPError 400 while parsing, so anything else is our fault
+                self.logger.error(f"Error handling request: {str(e)}")
+                status, payload = 500, {'error': 'Internal server error'}
+            
+            if isinstance(payload, str):
+                body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+            else:
+                body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+            head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: close\r\n\r\n")
+            writer.write(head.encode('ascii') + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        """Parse the request line, headers and body"""
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise HTTPError(400, 'Malformed request line')
+        method, path = parts[0].upper(), parts[1]
+        
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, 'Invalid Content-Length')
+        if length < 0:
+            raise HTTPError(400, 'Invalid Content-Length')
+        if length > self.max_body_bytes:
+            raise HTTPError(413, 'Request body too large')
+        try:
+            body = await reader.readexactly(length) if length else b''
+        except asyncio.IncompleteReadError:
+            raise HTTPError(400, 'Request body shorter than Content-Length')
+        return method, path.split('?', 1)[0], body
+    
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Union[Dict, str]]:
+        """Route a request to its handler; text payloads are sent as plain text"""
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/metrics':
+            return 200, REGISTRY.to_prometheus()
+        if path != '/chat':
+            raise HTTPError(404, f'Unknown path: {path}')
+        if method != 'POST':
+            raise HTTPError(405, 'Use POST for /chat')
+        
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            raise HTTPError(400, 'Body must be JSON')
+        query = request.get('query') if isinstance(request, dict) else None
+        if not isinstance(query, str) or not query.strip():
+            raise HTTPError(400, 'Missing "query"')
+        session_id = str(request.get('session_id', 'default'))
+        filters = _validate_filters(request.get('filters') or {})
+        
+        # Backpressure: refuse work instead of queueing without bound
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, 'Server busy, retry later')
+        
+        self.in_flight += 1
+        self.requests += 1
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        arguments = (query, session_id, filters) if filters else (query, session_id)
+        future = self._executor.submit(self.advisor.generate_response, *arguments)
+        # A timed-out request keeps its worker busy, so its slot is only
+        # released when the work itself finishes
+        future.add_done_callback(lambda _: self._release(loop))
+        try:
+            response = await asyncio.wait_for(asyncio.wrap_future(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise HTTPError(504, 'Request timed out')
+        
+        return 200, {
+            'response': response,
+            'session_id': session_id,
+            'latency_ms': (time.perf_counter() - start_time) * 1000
+        }
+    
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        """Free an in-flight slot on the event loop once a worker finishes"""
+        def decrement():
+            self.in_flight -= 1
+        try:
+            loop.call_soon_threadsafe(decrement)
+        except RuntimeError:
+            # The loop has already shut down
+            pass
+
+def run_server(advisor, host: str = '127.0.0.1', port: int = 8000, **kwargs):
+    """Run a ChatServer until interrupted"""
+    server = ChatServer(advisor, host, port, **kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -8,6 +8,19 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Import test modules
 from test_document_processor import TestDocumentProcessor
 from test_chatbot import TestFinancialAdvisorRAG
+from test_ingestion import TestIngestion
+from test_retrieval import TestRetrieval
+from test_query_cache import TestQueryCache
+from test_conversation_store import TestConversationStore
+from test_server import TestChatServer
+from test_index_manager import TestIndexReloader
+from test_benchmark import TestBenchmark
+from test_metrics import TestMetrics
+from test_chunk_store import TestChunkStore
+from test_dense_index import TestDenseIndex
+from test_dedup import TestDedup
+from test_metadata_index import TestMetadataIndex
+from test_document_generator import TestDocumentGenerator
 
 if __name__ == '__main__':
     # Initialize the test suite
@@ -17,6 +30,19 @@ if __name__ == '__main__':
     # Add tests to the suite
     suite.addTests(loader.loadTestsFromTestCase(TestDocumentProcessor))
     suite.addTests(loader.loadTestsFromTestCase(TestFinancialAdvisorRAG))
+    suite.addTests(loader.loadTestsFromTestCase(TestIngestion))
+    suite.addTests(loader.loadTestsFromTestCase(TestRetrieval))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestConversationStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestChatServer))
+    suite.addTests(loader.loadTestsFromTestCase(TestIndexReloader))
+    suite.addTests(loader.loadTestsFromTestCase(TestBenchmark))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetrics))
+    suite.addTests(loader.loadTestsFromTestCase(TestChunkStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestDenseIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestDedup))
+    suite.addTests(loader.loadTestsFromTestCase(TestMetadataIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestDocumentGenerator))
     
     # Initialize a runner and run the tests
     runner = unittest.TextTestRunner(verbosity=2)
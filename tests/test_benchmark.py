@@ -0,0 +1,47 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+from benchmark import DEFAULT_QUERIES, run_benchmark
+from document_generator import create_synthetic_corpus
+
+class TestBenchmark(unittest.TestCase):
+    """Test cases for the synthetic corpus and benchmark harness"""
+    
+    def setUp(self):
+        """Create a scratch directory"""
+        self.test_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Clean up after each test"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_synthetic_corpus_is_deterministic(self):
+        """Test that the same seed produces the same corpus"""
+        first = create_synthetic_corpus(os.path.join(self.test_dir, 'a'), num_documents=3, seed=7)
+        second = create_synthetic_corpus(os.path.join(self.test_dir, 'b'), num_documents=3, seed=7)
+        
+        self.assertEqual(len(first), 3)
+        self.assertEqual(os.path.getsize(first[2]), os.path.getsize(second[2]))
+    
+    def test_results_written_as_json(self):
+        """Test that every corpus size gets ingest, build and latency figures"""
+        output_path = os.path.join(self.test_dir, 'results.json')
+        results = run_benchmark([4, 2], output_path, corpus_dir=self.test_dir, pages_per_document=1,
+                                repeats=2, max_workers=1)
+        
+        with open(output_path) as f:
+            self.assertEqual(json.load(f), results)
+        self.assertEqual([run['documents'] for run in results['runs']], [2, 4])
+        for run in results['runs']:
+            self.assertGreater(run['pages_per_second'], 0)
+            self.assertGreaterEqual(run['build_seconds'], 0)
+            for key in ('search_latency', 'response_latency'):
+                latency = run[key]
+                self.assertEqual(latency['count'], 2 * len(DEFAULT_QUERIES))
+                self.assertLessEqual(latency['p50_ms'], latency['p95_ms'])
+                self.assertLessEqual(latency['p95_ms'], latency['p99_ms'])
+
+if __name__ == '__main__':
+    unittest.main()
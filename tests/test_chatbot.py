@@ -82,6 +82,91 @@ class TestFinancialAdvisorRAG(unittest.TestCase):
         # Check if there is variation in responses
         # Note: There's a small chance this could fail randomly if the same intro is chosen multiple times
         self.assertGreater(len(responses), 1, "Response generation lacks variation")
+    
+    def test_generate_responses_batch(self):
+        """Test that batched generation retrieves once for all queries"""
+        self.mock_processor.search_similar_content_batch.return_value = [
+            [{'content': 'Rebalancing keeps your asset allocation aligned with your goals.', 'score': 0.8}],
+            []
+        ]
+        
+        queries = ["How often should I rebalance?", "What about crypto?"]
+        responses = self.chatbot.generate_responses(queries)
+        
+        self.mock_processor.search_similar_content_batch.assert_called_once_with(queries, k=3)
+        self.assertEqual(len(responses), 2)
+        self.assertIn("Rebalancing keeps your asset allocation", responses[0])
+        self.assertIn("don't have enough information", responses[1])
+        self.assertEqual(self.chatbot.conversation_history, [])
+    
+    def test_swapped_processor_closed_after_requests(self):
+        """Test that a swapped-out processor is closed once the requests using it finish"""
+        new_processor = MagicMock()
+        
+        def search_during_swap(query, k):
+            self.chatbot.swap_processor(new_processor)
+            self.mock_processor.close.assert_not_called()
+            return [{'content': 'Test content', 'score': 0.9}]
+        self.mock_processor.search_similar_content.side_effect = search_during_swap
+        
+        self.chatbot.generate_response("First question")
+        self.mock_processor.close.assert_called_once()
+        
+        # An idle processor is closed straight away
+        self.chatbot.swap_processor(MagicMock())
+        new_processor.close.assert_called_once()
+    
+    def test_repeated_queries_use_cache(self):
+        """Test that repeated queries skip retrieval until the index changes"""
+        self.mock_processor.index_version = 1
+        self.mock_processor.search_similar_content.return_value = [
+            {'content': 'Dollar-cost averaging spreads purchases over regular intervals.', 'score': 0.9}
+        ]
+        
+        self.chatbot.generate_response("What is dollar-cost averaging?")
+        self.chatbot.generate_response("what is dollar-cost averaging")
+        self.assertEqual(self.mock_processor.search_similar_content.call_count, 1)
+        self.assertEqual(self.chatbot.cache.stats()['hits'], 1)
+        
+        # A new index version invalidates cached results
+        self.mock_processor.index_version = 2
+        self.chatbot.generate_response("What is dollar-cost averaging?")
+        self.assertEqual(self.mock_processor.search_similar_content.call_count, 2)
+        
+        # Filtered queries are cached separately and passed on to the search
+        self.chatbot.generate_response("What is dollar-cost averaging?", filters={'topics': ['investing']})
+        self.assertEqual(self.mock_processor.search_similar_content.call_count, 3)
+        self.mock_processor.search_similar_content.assert_called_with(
+            "What is dollar-cost averaging?", k=3, topics=['investing'])
+    
+    def test_precomputed_sentences_match_regex_split(self):
+        """Test that ingest-time sentence spans give the same parts as splitting at query time"""
+        from document_processor import SimpleDocumentProcessor
+        processor = SimpleDocumentProcessor()
+        processor.add_documents({'guide': [
+            "Rebalance your portfolio at least once a year. Rebalance your PORTFOLIO at least once a year. Short one.",
+            "Index funds offer broad diversification at a low cost. Rebalance your portfolio at least once a year."
+        ]})
+        results = processor.search_similar_content("rebalance portfolio index funds", k=2)
+        self.assertIn('sentence_spans', results[0])
+        
+        plain_results = [{'content': r['content'], 'score': r['score']} for r in results]
+        parts = self.chatbot._extract_content_parts(results)
+        self.assertEqual(parts, self.chatbot._extract_content_parts(plain_results))
+        self.assertEqual(len(parts), 2)
+    
+    def test_sessions_have_separate_history(self):
+        """Test that conversation history is kept per session"""
+        self.mock_processor.search_similar_content.return_value = [{'content': 'Test content', 'score': 0.9}]
+        
+        self.chatbot.generate_response("First question", session_id="alice")
+        self.chatbot.generate_response("Second question", session_id="bob")
+        
+        alice_history = self.chatbot.conversations.get_history("alice")
+        self.assertEqual(len(alice_history), 2)
+        self.assertEqual(alice_history[0]['content'], "First question")
+        self.assertEqual(self.chatbot.conversations.get_history("bob")[0]['content'], "Second question")
+        self.assertEqual(self.chatbot.conversation_history, [])
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
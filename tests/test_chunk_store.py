@@ -0,0 +1,94 @@
+import unittest
+import numpy as np
+from chunk_store import ChunkStore, UNKNOWN_PAGE
+
+class TestChunkStore(unittest.TestCase):
+    """Test cases for the columnar chunk store"""
+    
+    def setUp(self):
+        """Fill a store with chunks from two documents"""
+        self.store = ChunkStore()
+        self.store.extend('investing', ["Diversify across asset classes.", "Rebalance yearly – or when drift exceeds 5%."],
+                          pages=[0, 1], spans=[(0, 31), (33, 78)])
+        self.store.extend('tax', ["Harvest losses to offset gains."])
+    
+    def test_lazy_decoding(self):
+        """Test that chunks round-trip through the UTF-8 buffer"""
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(self.store[1], "Rebalance yearly – or when drift exceeds 5%.")
+        self.assertEqual(self.store[-1], "Harvest losses to offset gains.")
+        self.assertEqual(self.store[:2], list(self.store)[:2])
+        self.assertEqual(self.store.sources(), ['investing', 'investing', 'tax'])
+        with self.assertRaises(IndexError):
+            self.store[3]
+    
+    def test_provenance(self):
+        """Test that pages and spans are recorded, or marked unknown"""
+        self.assertEqual(self.store.provenance(1), {'source': 'investing', 'page': 1, 'char_span': (33, 78)})
+        self.assertEqual(self.store.provenance(2)['page'], UNKNOWN_PAGE)
+    
+    def test_keep_compacts_columns(self):
+        """Test that removing rows keeps the remaining texts and metadata aligned"""
+        self.store.keep(np.array([True, False, True]))
+        self.assertEqual(list(self.store), ["Diversify across asset classes.", "Harvest losses to offset gains."])
+        self.assertEqual(self.store.sources(), ['investing', 'tax'])
+        np.testing.assert_array_equal(self.store.rows_of('tax'), [1])
+        
+        self.store.extend('retirement', ["Save early."], pages=[4], spans=[(10, 21)])
+        self.assertEqual(self.store.provenance(2)['page'], 4)
+        self.assertEqual(self.store[2], "Save early.")
+    
+    def test_duplicate_references(self):
+        """Test that duplicate references follow their row through compaction and snapshots"""
+        self.store.add_reference(2, 'estate', 3, (5, 36))
+        self.store.add_reference(2, 'retirement')
+        self.store.keep(np.array([False, True, True]))
+        self.assertEqual(self.store.references(0), [])
+        self.assertEqual([reference['source'] for reference in self.store.references(1)], ['estate', 'retirement'])
+        
+        restored = ChunkStore.from_arrays(self.store.doc_ids, **self.store.arrays())
+        self.assertEqual(restored.references(1), self.store.references(1))
+        
+        self.store.drop_references('estate')
+        self.assertEqual(self.store.num_references, 1)
+        with self.assertRaises(IndexError):
+            self.store.add_reference(5, 'estate')
+    
+    def test_loaded_references(self):
+        """Test that snapshot references stay columns and combine with later ones in order"""
+        self.store.add_reference(0, 'estate', 3, (5, 36))
+        self.store.add_reference(2, 'retirement')
+        restored = ChunkStore.from_arrays(self.store.doc_ids, **self.store.arrays())
+        self.assertEqual(restored._duplicates, {})
+        
+        restored.add_reference(2, 'estate')
+        restored.add_reference(1, 'tax')
+        self.assertEqual([reference['source'] for reference in restored.references(2)], ['retirement', 'estate'])
+        self.assertEqual(restored.num_references, 4)
+        np.testing.assert_array_equal(restored.rows_by_source()['estate'], [0, 2])
+        
+        restored.keep(np.array([False, True, True]))
+        restored.drop_references('retirement')
+        self.assertEqual([reference['source'] for reference in restored.references(1)], ['estate'])
+        again = ChunkStore.from_arrays(restored.doc_ids, **restored.arrays())
+        self.assertEqual([again.references(row) for row in range(2)], [restored.references(row) for row in range(2)])
+    
+    def test_snapshot_columns(self):
+        """Test that a store rebuilt from its arrays is equal and still appendable"""
+        arrays = self.store.arrays()
+        restored = ChunkStore.from_arrays(self.store.doc_ids, **arrays)
+        self.assertEqual(restored, self.store)
+        self.assertEqual(restored.provenance(0), self.store.provenance(0))
+        
+        restored.extend('tax', ["Use tax-advantaged accounts."])
+        self.assertEqual(restored.rows_of('tax').tolist(), [2, 3])
+        self.assertEqual(len(self.store), 3)
+    
+    def test_compact_footprint(self):
+        """Test that storage is the text bytes plus fixed-size metadata per chunk"""
+        store = ChunkStore()
+        store.extend('doc', ["x" * 100] * 1000)
+        self.assertLess(store.nbytes, 1000 * (100 + 8 + 4 + 4 + 16) + 8 + 1)
+
+if __name__ == '__main__':
+    unittest.main()
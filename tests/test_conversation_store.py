@@ -0,0 +1,68 @@
+import unittest
+from conversation_store import ConversationStore
+
+class FakeClock:
+    """Manually advanced clock for idle-eviction tests"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class TestConversationStore(unittest.TestCase):
+    """Test cases for the ConversationStore class"""
+    
+    def setUp(self):
+        """Set up a store with a controllable clock"""
+        self.clock = FakeClock()
+    
+    def test_sessions_are_isolated(self):
+        """Test that each session has its own history"""
+        store = ConversationStore(clock=self.clock)
+        store.append('alice', 'user', 'How do I open a Roth IRA?')
+        store.append('bob', 'user', 'What is an index fund?')
+        
+        self.assertEqual(len(store.get_history('alice')), 1)
+        self.assertEqual(store.get_history('bob')[0]['content'], 'What is an index fund?')
+        self.assertEqual(store.get_history('carol'), [])
+    
+    def test_turn_and_byte_caps(self):
+        """Test that a session drops its oldest turns past its caps"""
+        store = ConversationStore(max_turns=3, max_session_bytes=25, clock=self.clock)
+        for i in range(5):
+            store.append('alice', 'user', f'turn {i}')
+        self.assertEqual([turn['content'] for turn in store.get_history('alice')], ['turn 2', 'turn 3', 'turn 4'])
+        
+        store.append('alice', 'assistant', 'a much longer reply')
+        history = store.get_history('alice')
+        self.assertEqual(history[-1]['content'], 'a much longer reply')
+        self.assertLessEqual(sum(len(turn['content']) for turn in history), 25)
+        self.assertEqual(store.stats()['total_bytes'], sum(len(turn['content']) for turn in history))
+    
+    def test_idle_sessions_are_evicted(self):
+        """Test that sessions idle past the timeout are evicted"""
+        store = ConversationStore(idle_timeout=60, clock=self.clock)
+        store.append('alice', 'user', 'hello')
+        self.clock.now = 30
+        store.append('bob', 'user', 'hello')
+        self.clock.now = 75
+        
+        self.assertEqual(store.get_history('alice'), [])
+        self.assertIn('bob', store)
+        self.assertEqual(store.stats()['evicted_sessions'], 1)
+    
+    def test_global_budget_evicts_least_recently_used(self):
+        """Test that the memory budget evicts the least recently used sessions"""
+        store = ConversationStore(max_total_bytes=30, clock=self.clock)
+        store.append('alice', 'user', 'x' * 10)
+        store.append('bob', 'user', 'y' * 10)
+        store.get_history('alice')
+        store.append('carol', 'user', 'z' * 15)
+        
+        self.assertNotIn('bob', store)
+        self.assertIn('alice', store)
+        self.assertLessEqual(store.stats()['total_bytes'], 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import shutil
+import tempfile
+import numpy as np
+from dedup import MinHashDeduplicator, choose_bands
+from document_processor import SimpleDocumentProcessor
+
+DISCLAIMER = ("This material is provided for informational purposes only and does not constitute "
+              "investment advice. Past performance is no guarantee of future results and all "
+              "investments involve risk, including the possible loss of principal.")
+
+class TestDedup(unittest.TestCase):
+    """Test cases for near-duplicate chunk detection"""
+    
+    def setUp(self):
+        """Set up documents that repeat the same boilerplate"""
+        self.documents = {
+            'investing': ["Rebalancing restores the target allocation between stocks and bonds.", DISCLAIMER],
+            'tax': ["Tax-loss harvesting sells investments with losses to offset capital gains.",
+                    DISCLAIMER.replace("only", "solely")],
+            'retirement': [DISCLAIMER]
+        }
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Clean up the temporary directory"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_band_choice(self):
+        """Test that the LSH bands split the signature and rise near the threshold"""
+        for threshold in (0.5, 0.7, 0.9):
+            bands, rows = choose_bands(64, threshold)
+            self.assertEqual(bands * rows, 64)
+            self.assertLess(abs((1 / bands) ** (1 / rows) - threshold), 0.15)
+    
+    def test_finds_near_duplicates(self):
+        """Test that near-duplicates match their original and unrelated text does not"""
+        deduplicator = MinHashDeduplicator(threshold=0.7)
+        row = deduplicator.add(deduplicator.signature(DISCLAIMER))
+        self.assertEqual(deduplicator.find(deduplicator.signature(DISCLAIMER.upper())), row)
+        self.assertEqual(deduplicator.find(deduplicator.signature(DISCLAIMER.replace("only", "solely"))), row)
+        self.assertIsNone(deduplicator.find(deduplicator.signature(self.documents['tax'][0])))
+        
+        # Signatures loaded from a snapshot are bucketed on first use, and later rows follow them
+        loaded = MinHashDeduplicator(threshold=0.7)
+        loaded.load(deduplicator.signatures)
+        self.assertIsNone(loaded._tables)
+        self.assertEqual(loaded.find(deduplicator.signature(DISCLAIMER.upper())), row)
+        other = loaded.add(loaded.signature(self.documents['tax'][0]))
+        self.assertEqual(loaded.find(loaded.signature(self.documents['tax'][0])), other)
+        loaded.keep(np.array([False, True]))
+        self.assertEqual(loaded.find(loaded.signature(self.documents['tax'][0])), 0)
+        self.assertIsNone(loaded.find(loaded.signature(DISCLAIMER)))
+        
+        # Signatures use a stable hash, so they can be stored in snapshots
+        np.testing.assert_array_equal(deduplicator.signature(DISCLAIMER),
+                                      MinHashDeduplicator(threshold=0.7).signature(DISCLAIMER))
+        with self.assertRaises(ValueError):
+            MinHashDeduplicator(threshold=0)
+    
+    def test_collapses_duplicates_at_ingest(self):
+        """Test that duplicates become references on one row that all results report"""
+        processor = SimpleDocumentProcessor(dedup_threshold=0.7)
+        processor.add_documents(self.documents)
+        self.assertEqual(len(processor.chunks), 3)
+        self.assertEqual(processor.documents, {'investing': 2, 'tax': 2, 'retirement': 1})
+        
+        stats = processor.deduplication_stats()
+        self.assertEqual((stats['checked'], stats['duplicates'], stats['references']), (5, 2, 2))
+        
+        result = processor.search_similar_content("past performance guarantee of future results", k=1)[0]
+        self.assertEqual(result['source'], 'investing')
+        self.assertEqual(sorted(reference['source'] for reference in result['duplicates']), ['retirement', 'tax'])
+        
+        # Without a threshold every chunk is indexed
+        processor = SimpleDocumentProcessor()
+        processor.add_documents(self.documents)
+        self.assertEqual(len(processor.chunks), 5)
+    
+    def test_removal_promotes_duplicates(self):
+        """Test that removing the indexed copy keeps the content searchable for its duplicates"""
+        processor = SimpleDocumentProcessor(dedup_threshold=0.7)
+        processor.add_documents(self.documents)
+        processor.remove_document('investing')
+        
+        self.assertEqual(processor.chunk_sources.count('investing'), 0)
+        result = processor.search_similar_content("past performance guarantee of future results", k=1)[0]
+        self.assertIn(result['source'], ('tax', 'retirement'))
+        self.assertEqual(len(result['duplicates']), 1)
+        
+        processor.remove_document('tax')
+        processor.remove_document('retirement')
+        self.assertEqual(len(processor.chunks), 0)
+    
+    def test_snapshot_keeps_references(self):
+        """Test that references and signatures survive a save and load"""
+        processor = SimpleDocumentProcessor(dedup_threshold=0.7)
+        processor.add_documents(self.documents)
+        processor.save(self.temp_dir + '/index')
+        
+        loaded = SimpleDocumentProcessor.load(self.temp_dir + '/index')
+        self.assertEqual(loaded.dedup_threshold, 0.7)
+        query = "past performance guarantee of future results"
+        self.assertEqual(loaded.search_similar_content(query, k=1)[0]['duplicates'],
+                         processor.search_similar_content(query, k=1)[0]['duplicates'])
+        
+        # New copies are still recognized after loading
+        loaded.add_documents({'estate': [DISCLAIMER]})
+        self.assertEqual(len(loaded.chunks), 3)
+
+if __name__ == '__main__':
+    unittest.main()
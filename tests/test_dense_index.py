@@ -0,0 +1,105 @@
+import unittest
+import threading
+from unittest.mock import patch
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from document_processor import SEARCH_BACKENDS, SimpleDocumentProcessor
+from dense_index import LSAIndex, recall_report, spherical_kmeans
+from retrieval import AppendedRowsSearcher, ExactSearcher
+
+class TestDenseIndex(unittest.TestCase):
+    """Test cases for the LSA/IVF retrieval backend"""
+    
+    def setUp(self):
+        """Build a clustered TF-IDF-like matrix: rows share terms with their topic"""
+        rng = np.random.default_rng(7)
+        topics = rng.integers(0, 20, size=1000)
+        rows = np.repeat(np.arange(1000), 12)
+        cols = topics[rows] * 20 + rng.integers(0, 20, size=len(rows))
+        counts = sp.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(1000, 400))
+        self.vectors = normalize(counts)
+        self.queries = normalize(self.vectors[rng.choice(1000, size=40, replace=False)])
+    
+    def test_kmeans_assigns_every_row(self):
+        """Test that clustering produces unit centroids and valid assignments"""
+        embeddings = normalize(np.random.default_rng(0).random((200, 16))).astype(np.float32)
+        centroids, assignments = spherical_kmeans(embeddings, 8)
+        np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+        self.assertEqual(assignments.shape, (200,))
+        self.assertTrue(((assignments >= 0) & (assignments < 8)).all())
+    
+    def test_full_probe_recall(self):
+        """Test that probing every list with exact re-ranking recovers the exact top k"""
+        index = LSAIndex(self.vectors, dimensions=64, num_lists=10, num_probes=10, rerank_depth=200)
+        exact = ExactSearcher(self.vectors)
+        for i in range(self.queries.shape[0]):
+            _, scores = index.search(self.queries[i], 5)
+            _, expected_scores = exact.search(self.queries[i], 5)
+            np.testing.assert_allclose(scores, expected_scores)
+    
+    def test_recall_report_knobs(self):
+        """Test that probing more lists and re-ranking raise recall, and the report has every setting"""
+        report = recall_report(self.vectors, self.queries, k=10,
+                               configs=[{'num_probes': 1, 'rerank_depth': 0}, {'num_probes': 4, 'rerank_depth': 0},
+                                        {'num_probes': 32}],
+                               index_options={'dimensions': 32, 'num_lists': 32})
+        self.assertEqual([entry['num_probes'] for entry in report], [1, 4, 32])
+        self.assertLess(report[0]['recall'], report[2]['recall'])
+        self.assertLess(report[1]['recall'], report[2]['recall'])
+        self.assertGreaterEqual(report[2]['recall'], 0.9)
+        # Settings that only change query-time knobs share one build
+        self.assertEqual(len({entry['build_seconds'] for entry in report}), 1)
+    
+    def test_processor_backend(self):
+        """Test that the processor serves queries through the LSA backend"""
+        processor = SimpleDocumentProcessor(search_backend='lsa', search_options={'dimensions': 8})
+        processor.add_documents({
+            'investing': ["Diversify your portfolio across stocks and bonds.",
+                          "Rebalance the portfolio when allocations drift."],
+            'tax': ["Harvest tax losses to offset capital gains.",
+                    "Hold bonds in tax-advantaged accounts."]
+        })
+        processor.prepare()
+        self.assertIsInstance(processor._searcher, LSAIndex)
+        results = processor.search_similar_content("tax losses", k=2)
+        self.assertEqual(results[0]['content'], "Harvest tax losses to offset capital gains.")
+        self.assertEqual(len(processor.search_similar_content("zzz unknown", k=3)), 3)
+    
+    def test_rebuild_stays_off_the_query_path(self):
+        """Test that queries after an update are answered while the LSA index is rebuilt in the background"""
+        processor = SimpleDocumentProcessor(search_backend='lsa', search_options={'dimensions': 4}, idf_refresh_ratio=1.0)
+        processor.add_documents({'investing': ["Diversify your portfolio across stocks and bonds.",
+                                               "Rebalance the portfolio when allocations drift.",
+                                               "Index funds keep investment costs low."]})
+        processor.prepare()
+        previous = processor._searcher
+        
+        release = threading.Event()
+        built = threading.Event()
+        def slow_build(vectors, **options):
+            release.wait(5)
+            index = LSAIndex(vectors, **options)
+            built.set()
+            return index
+        
+        with patch.dict(SEARCH_BACKENDS, {'lsa': slow_build}):
+            processor.add_documents({'tax': ["Harvest tax losses to offset capital gains."]})
+            results = processor.search_similar_content("harvest tax losses", k=1)
+            self.assertEqual(results[0]['source'], 'tax')
+            self.assertIs(processor._searcher, previous)
+            self.assertIsInstance(processor._get_searcher(processor._vectors), AppendedRowsSearcher)
+            
+            release.set()
+            self.assertTrue(built.wait(5))
+            for _ in range(100):
+                if processor._searcher is not previous:
+                    break
+                threading.Event().wait(0.01)
+        self.assertIsInstance(processor._searcher, LSAIndex)
+        self.assertIsNot(processor._searcher, previous)
+        self.assertEqual(processor._searcher.vectors.shape[0], 4)
+        self.assertEqual(processor.search_similar_content("harvest tax losses", k=1)[0]['source'], 'tax')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import os
+import shutil
+import tempfile
+from document_generator import FINANCIAL_DOCUMENTS, create_comprehensive_financial_documents
+
+class TestDocumentGenerator(unittest.TestCase):
+    """Test cases for demo document generation"""
+    
+    def setUp(self):
+        """Create an empty output directory"""
+        self.test_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Clean up the output directory"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_unchanged_documents_are_not_rewritten(self):
+        """Test that only missing or modified documents are regenerated"""
+        written = create_comprehensive_financial_documents(self.test_dir)
+        self.assertEqual(len(written), len(FINANCIAL_DOCUMENTS))
+        self.assertEqual(create_comprehensive_financial_documents(self.test_dir), [])
+        
+        # A file changed or removed behind the generator's back is written again
+        path = os.path.join(self.test_dir, 'tax_optimization.pdf')
+        with open(path, 'ab') as f:
+            f.write(b'\n')
+        os.remove(os.path.join(self.test_dir, 'market_analysis.pdf'))
+        self.assertEqual(sorted(create_comprehensive_financial_documents(self.test_dir)),
+                         sorted([path, os.path.join(self.test_dir, 'market_analysis.pdf')]))
+        
+        self.assertEqual(len(create_comprehensive_financial_documents(self.test_dir, force=True)),
+                         len(FINANCIAL_DOCUMENTS))
+
+if __name__ == '__main__':
+    unittest.main()
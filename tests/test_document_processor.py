@@ -1,8 +1,34 @@
 import unittest
 import os
+import sys
+import json
+import mmap
+import shutil
+import subprocess
+from unittest.mock import patch
 import tempfile
+import threading
+import numpy as np
 from fpdf import FPDF
-from document_processor import SimpleDocumentProcessor
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+from document_processor import (SimpleDocumentProcessor, build_analyzer, iter_chunks, iter_sentences,
+                                iter_located_chunks, iter_located_sentences)
+
+SAMPLE_DOCUMENTS = {
+    'investing': [
+        "A well-diversified portfolio requires strategic allocation across multiple asset classes.",
+        "Modern portfolio theory suggests a mix of stocks, bonds and alternative investments."
+    ],
+    'retirement': [
+        "A retirement plan should aim to replace most of your pre-retirement income.",
+        "Withdraw from taxable accounts first, then tax-deferred accounts like traditional IRAs."
+    ],
+    'tax': [
+        "Tax-loss harvesting sells investments with losses to offset capital gains.",
+        "Contributions to tax-advantaged accounts reduce current and future tax liability."
+    ]
+}
 
 class TestDocumentProcessor(unittest.TestCase):
     """Test cases for the SimpleDocumentProcessor class"""
@@ -24,10 +50,8 @@ class TestDocumentProcessor(unittest.TestCase):
     
     def tearDown(self):
         """Clean up after each test"""
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
         if os.path.exists(self.test_dir):
-            os.rmdir(self.test_dir)
+            shutil.rmtree(self.test_dir)
     
     def test_document_loading(self):
         """Test that documents can be loaded correctly"""
@@ -75,6 +99,405 @@ class TestDocumentProcessor(unittest.TestCase):
         """Test handling of nonexistent files"""
         result = self.processor.process_document("nonexistent_file.pdf")
         self.assertFalse(result)
+    
+    def test_process_document_accumulates(self):
+        """Test that processing several documents builds one combined index"""
+        self.processor.process_document(self.test_file, doc_id='first')
+        first_count = len(self.processor.document_chunks)
+        self.processor.process_document(self.test_file, doc_id='second')
+        
+        self.assertEqual(len(self.processor.document_chunks), 2 * first_count)
+        self.assertEqual(set(self.processor.documents), {'first', 'second'})
+        self.assertEqual(self.processor.vectors.shape[0], 2 * first_count)
+    
+    def test_add_documents_matches_full_refit(self):
+        """Test that incremental indexing scores like a TfidfVectorizer refit"""
+        for doc_id, chunks in SAMPLE_DOCUMENTS.items():
+            self.processor.add_documents({doc_id: chunks})
+        self.processor.refresh()
+        
+        all_chunks = [chunk for chunks in SAMPLE_DOCUMENTS.values() for chunk in chunks]
+        reference = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+        reference_vectors = reference.fit_transform(all_chunks)
+        
+        query = "portfolio allocation across asset classes"
+        expected = cosine_similarity(reference.transform([query]), reference_vectors)[0]
+        actual = cosine_similarity(self.processor._encode_queries([query]), self.processor.vectors)[0]
+        np.testing.assert_allclose(actual, expected)
+    
+    def test_inactive_terms_are_not_stored(self):
+        """Test that terms beyond max_features leave no zero entries in the searchable matrix"""
+        processor = SimpleDocumentProcessor(max_features=10, idf_refresh_ratio=10.0)
+        processor.add_documents({'investing': SAMPLE_DOCUMENTS['investing']})
+        processor.vectors
+        processor.add_documents({'tax': SAMPLE_DOCUMENTS['tax']})
+        vectors = processor.vectors
+        
+        self.assertEqual(np.count_nonzero(vectors.data == 0), 0)
+        self.assertLess(vectors.nnz, processor._counts.nnz)
+        self.assertTrue(processor._active_terms[vectors.indices].all())
+        
+        # Incremental rows match weighting the whole count matrix at once
+        np.testing.assert_allclose(vectors.toarray(), processor._weight_counts(processor._counts).toarray())
+    
+    def test_query_encoder_matches_transform(self):
+        """Test that the single-query encoder reproduces TfidfVectorizer.transform and the batch encoder"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        all_chunks = [chunk for chunks in SAMPLE_DOCUMENTS.values() for chunk in chunks]
+        reference = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).fit(all_chunks)
+        terms = {column: term for term, column in self.processor.vocabulary.items()}
+        num_features = self.processor.vectors.shape[1]
+        
+        for query in ["portfolio allocation across asset classes", "Tax-loss harvesting? Tax-loss harvesting!",
+                      "the and of", "", "unknown words only"]:
+            encoded = self.processor._encode_query(query, num_features)
+            batch = self.processor._encode_queries([query], num_features)
+            np.testing.assert_array_equal(encoded.indices, batch.indices)
+            np.testing.assert_array_equal(encoded.data, batch.data)
+            
+            expected = reference.transform([query])
+            actual = {terms[column]: weight for column, weight in zip(encoded.indices, encoded.data)}
+            expected = {term: expected[0, column] for term, column in reference.vocabulary_.items()
+                        if expected[0, column]}
+            self.assertEqual(actual.keys(), expected.keys())
+            for term, weight in expected.items():
+                self.assertAlmostEqual(actual[term], weight, places=12)
+    
+    def test_index_version_changes_on_update(self):
+        """Test that every index change produces a new index version"""
+        versions = [self.processor.index_version]
+        self.processor.add_documents({'investing': SAMPLE_DOCUMENTS['investing']})
+        versions.append(self.processor.index_version)
+        self.processor.remove_document('investing')
+        versions.append(self.processor.index_version)
+        versions.append(SimpleDocumentProcessor().index_version)
+        
+        self.assertEqual(len(set(versions)), len(versions))
+    
+    def test_remove_document(self):
+        """Test that removing a document drops its chunks and provenance"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        self.assertTrue(self.processor.remove_document('retirement'))
+        
+        self.assertNotIn('retirement', self.processor.documents)
+        self.assertNotIn('retirement', self.processor.chunk_sources)
+        self.assertEqual(self.processor.vectors.shape[0], 4)
+        self.assertFalse(self.processor.remove_document('retirement'))
+        
+        results = self.processor.search_similar_content("tax-loss harvesting", k=1)
+        self.assertEqual(results[0]['source'], 'tax')
+        start, end = results[0]['sentence_spans'][0]
+        self.assertEqual(results[0]['content'][start:end], SAMPLE_DOCUMENTS['tax'][0])
+    
+    def test_remove_empty_document(self):
+        """Test that documents without chunks can be removed, with or without other documents"""
+        processor = SimpleDocumentProcessor()
+        processor.add_documents({'empty': []})
+        self.assertTrue(processor.remove_document('empty'))
+        
+        processor.add_documents({'empty': [], 'tax': SAMPLE_DOCUMENTS['tax']})
+        self.assertTrue(processor.remove_document('empty'))
+        self.assertEqual(processor.chunk_sources, ['tax', 'tax'])
+        self.assertEqual(processor.search_similar_content("tax-loss harvesting", k=1)[0]['source'], 'tax')
+    
+    def test_incremental_update_keeps_existing_weights(self):
+        """Test that small additions do not re-weight the existing rows"""
+        processor = SimpleDocumentProcessor(idf_refresh_ratio=1.0)
+        processor.add_documents({'investing': SAMPLE_DOCUMENTS['investing'] * 2})
+        before = processor.vectors.toarray()
+        
+        processor.add_documents({'tax': SAMPLE_DOCUMENTS['tax'][:1]})
+        after = processor.vectors
+        
+        self.assertEqual(after.shape[0], 5)
+        np.testing.assert_array_equal(after[:4].toarray()[:, :before.shape[1]], before)
+    
+    def test_replacing_documents_refreshes_idf(self):
+        """Test that replacing documents re-weights the index even when the chunk count is unchanged"""
+        processor = SimpleDocumentProcessor(idf_refresh_ratio=0.5)
+        processor.add_documents({f'doc{i}': [f"Filing {i} covers bond yields."] for i in range(4)})
+        processor.vectors
+        for i in range(4):
+            processor.add_documents({f'doc{i}': [f"Filing {i} covers delta hedging."]})
+            processor.vectors
+        
+        reference = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+        reference.fit([f"Filing {i} covers delta hedging." for i in range(4)])
+        column = processor.vocabulary['delta']
+        self.assertAlmostEqual(processor._idf[column], reference.idf_[reference.vocabulary_['delta']])
+    
+    def test_save_and_load_snapshot(self):
+        """Test that a saved index loads memory-mapped with identical results"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        index_path = os.path.join(self.test_dir, 'index')
+        self.processor.save(index_path)
+        
+        loaded = SimpleDocumentProcessor.load(index_path)
+        self.assertFalse(loaded.vectors.data.flags.owndata)
+        self.assertEqual(list(loaded.document_chunks), list(self.processor.document_chunks))
+        self.assertEqual(loaded.chunk_sources, self.processor.chunk_sources)
+        self.assertEqual(loaded.chunks.provenance(0), self.processor.chunks.provenance(0))
+        
+        query = "tax-advantaged retirement accounts"
+        self.assertEqual(loaded.search_similar_content(query), self.processor.search_similar_content(query))
+        
+        # Queries only decode the active terms; the full vocabulary stays on disk
+        with open(os.path.join(index_path, 'manifest.json')) as f:
+            self.assertNotIn('vocabulary', json.load(f))
+        self.assertIsNone(loaded._vocabulary)
+        
+        # A loaded index stays updatable
+        loaded.add_documents({'extra': ["Emergency funds should cover six months of expenses."]})
+        self.assertEqual(loaded.search_similar_content("emergency funds", k=1)[0]['source'], 'extra')
+    
+    def test_snapshot_vocabulary_round_trip(self):
+        """Test that non-ASCII terms keep their columns through a snapshot"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        self.processor.add_documents({'travel': ["Café résumé costs in Straße budgets"]})
+        index_path = os.path.join(self.test_dir, 'index')
+        self.processor.save(index_path)
+        
+        loaded = SimpleDocumentProcessor.load(index_path)
+        self.assertEqual(loaded.search_similar_content("café straße", k=1)[0]['source'], 'travel')
+        self.assertEqual(loaded.vocabulary, self.processor.vocabulary)
+    
+    def test_analyzer_matches_scikit_learn(self):
+        """Test that the built-in analyzer extracts the same terms as TfidfVectorizer"""
+        reference = TfidfVectorizer(stop_words='english', ngram_range=(1, 2)).build_analyzer()
+        analyzer = build_analyzer(ENGLISH_STOP_WORDS)
+        texts = [text for chunks in SAMPLE_DOCUMENTS.values() for text in chunks]
+        texts += ["", "a I of", "Roth IRA's 401(k) — café ÉTÉ _x_ 12", "The the TAX tax-loss  harvesting\n"]
+        for text in texts:
+            self.assertEqual(analyzer(text), reference(text))
+    
+    def test_loaded_index_skips_heavy_imports(self):
+        """Test that loading a snapshot and searching it never imports scikit-learn or pypdf"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        index_path = os.path.join(self.test_dir, 'index')
+        self.processor.save(index_path)
+        
+        script = (f"import sys\n"
+                  f"from document_processor import SimpleDocumentProcessor\n"
+                  f"processor = SimpleDocumentProcessor.load({index_path!r})\n"
+                  f"print(processor.search_similar_content('retirement income', k=1)[0]['source'])\n"
+                  f"print(sorted(m for m in ('sklearn', 'pypdf', 'fpdf') if m in sys.modules))\n")
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        output = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual(output.stdout.split('\n')[:2], ['retirement', '[]'])
+    
+    def test_float32_weights(self):
+        """Test that a float32 index ranks like float64 and keeps its dtype through save and load"""
+        single = SimpleDocumentProcessor(weight_dtype='float32')
+        single.add_documents(SAMPLE_DOCUMENTS)
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        self.assertEqual(single.vectors.dtype, np.float32)
+        
+        for query in ["tax-advantaged retirement accounts", "diversify stocks and bonds"]:
+            expected = self.processor.search_similar_content(query)
+            results = single.search_similar_content(query)
+            self.assertEqual([r['content'] for r in results], [r['content'] for r in expected])
+            np.testing.assert_allclose([r['score'] for r in results], [r['score'] for r in expected], rtol=1e-6)
+        
+        index_path = os.path.join(self.test_dir, 'index32')
+        single.save(index_path)
+        loaded = SimpleDocumentProcessor.load(index_path)
+        self.assertEqual(loaded.vectors.dtype, np.float32)
+        loaded.add_documents({'extra': ["Emergency funds should cover six months of expenses."]})
+        self.assertEqual(loaded.vectors.dtype, np.float32)
+    
+    def test_quantized_weights(self):
+        """Test that a uint8 index stores postings only, ranks like float64 and survives updates and reloads"""
+        quantized = SimpleDocumentProcessor(weight_dtype='uint8')
+        quantized.add_documents(SAMPLE_DOCUMENTS)
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        self.assertEqual(quantized.vectors.precision, 'uint8')
+        # scipy keeps a plain view of the mapped counts, so look through it for the file mapping
+        counts_buffer = quantized._counts.data
+        while isinstance(counts_buffer, np.ndarray):
+            counts_buffer = counts_buffer.base
+        self.assertIsInstance(counts_buffer, mmap.mmap)
+        
+        queries = ["tax-advantaged retirement accounts", "diversify stocks and bonds"]
+        expected = self.processor.search_similar_content_batch(queries, sources=['tax', 'investing'])
+        batch = quantized.search_similar_content_batch(queries, sources=['tax', 'investing'])
+        for query, results, reference in zip(queries, batch, expected):
+            self.assertEqual([r['content'] for r in results], [r['content'] for r in reference])
+            np.testing.assert_allclose([r['score'] for r in results], [r['score'] for r in reference], atol=0.01)
+            single = quantized.search_similar_content(query, sources=['tax', 'investing'])
+            self.assertEqual([r['content'] for r in single], [r['content'] for r in results])
+        
+        quantized.remove_document('investing')
+        quantized.add_documents({'extra': ["Emergency funds should cover six months of expenses."]})
+        self.assertEqual(quantized.search_similar_content("emergency funds", k=1)[0]['source'], 'extra')
+        
+        index_path = os.path.join(self.test_dir, 'index8')
+        quantized.save(index_path)
+        loaded = SimpleDocumentProcessor.load(index_path)
+        self.assertEqual(loaded.vectors.precision, 'uint8')
+        self.assertEqual(loaded.search_similar_content("emergency funds", k=1)[0]['source'], 'extra')
+        
+        with self.assertRaises(ValueError):
+            SimpleDocumentProcessor(weight_dtype='uint8', search_backend='lsa')
+    
+    def test_load_rejects_unknown_format_version(self):
+        """Test that snapshots from another format version are refused"""
+        index_path = os.path.join(self.test_dir, 'index')
+        self.processor.save(index_path)
+        manifest_path = os.path.join(index_path, 'manifest.json')
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 999
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        
+        with self.assertRaises(ValueError):
+            SimpleDocumentProcessor.load(index_path)
+    
+    def test_sentences_span_page_breaks(self):
+        """Test that a sentence continuing on the next page is kept whole"""
+        pages = ["Bonds reduce volatility. Stocks grow", "over the long term. Rebalance yearly."]
+        sentences = [s for s in iter_sentences(pages) if s]
+        self.assertEqual(sentences, [
+            "Bonds reduce volatility.",
+            "Stocks grow\n\nover the long term.",
+            "Rebalance yearly."
+        ])
+    
+    def test_chunk_overlap_and_token_units(self):
+        """Test chunk size limits and sentence overlap in characters and tokens"""
+        sentences = ["One two three.", "Four five.", "Six seven eight nine.", "Ten."]
+        
+        chunks = list(iter_chunks(sentences, chunk_size=6, overlap=3, unit='tokens'))
+        self.assertEqual(chunks, ["One two three. Four five.", "Four five. Six seven eight nine.", "Ten."])
+        
+        chunks = list(iter_chunks(sentences, chunk_size=35, overlap=12))
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 35)
+        self.assertTrue(chunks[1].startswith("Four five."))
+    
+    def test_chunks_stream_before_document_ends(self):
+        """Test that chunks are emitted before all pages have been read"""
+        pages_read = []
+        
+        def pages():
+            for i in range(100):
+                pages_read.append(i)
+                yield f"Page {i} discusses asset allocation in some detail."
+        
+        first_chunk = next(iter_chunks(iter_sentences(pages()), chunk_size=60))
+        self.assertIn("Page 0", first_chunk)
+        self.assertLess(len(pages_read), 100)
+    
+    def test_process_document_in_batches(self):
+        """Test that batched streaming indexes the same chunks as one batch"""
+        self.processor.process_document(self.test_file, chunk_size=40, batch_size=1)
+        single = SimpleDocumentProcessor()
+        single.process_document(self.test_file, chunk_size=40)
+        
+        self.assertGreater(len(self.processor.document_chunks), 1)
+        self.assertEqual(self.processor.document_chunks, single.document_chunks)
+        self.assertEqual(self.processor.documents, single.documents)
+    
+    def test_chunk_provenance(self):
+        """Test that chunks record the page and span of the text they came from"""
+        pages = ["Bonds reduce volatility. Stocks grow", "over the long term. Rebalance yearly."]
+        text = "\n\n".join(pages)
+        located = list(iter_located_chunks(iter_located_sentences(pages), chunk_size=30))
+        self.assertEqual([(chunk, page) for chunk, page, _, _ in located], [
+            ("Bonds reduce volatility.", 0),
+            ("Stocks grow\n\nover the long term.", 0),
+            ("Rebalance yearly.", 1)
+        ])
+        for chunk, _, start, end in located:
+            self.assertEqual(text[start:end], chunk)
+        
+        self.processor.process_document(self.test_file, chunk_size=40)
+        result = self.processor.search_similar_content("diversification", k=1)[0]
+        self.assertEqual(result['page'], 0)
+        self.assertEqual(result['source'], self.test_file)
+        self.assertLessEqual(len(result['content']), result['char_span'][1] - result['char_span'][0])
+    
+    def test_batch_search_matches_single_queries(self):
+        """Test that batched search returns the same results as per-query search"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        queries = ["portfolio allocation", "tax-loss harvesting", "retirement income", "nothing relevant"]
+        
+        batch_results = self.processor.search_similar_content_batch(queries, k=3, block_size=3)
+        self.assertEqual(len(batch_results), len(queries))
+        for query, results in zip(queries, batch_results):
+            expected = self.processor.search_similar_content(query, k=3)
+            self.assertEqual([r['content'] for r in results], [r['content'] for r in expected])
+            np.testing.assert_allclose([r['score'] for r in results], [r['score'] for r in expected])
+        
+        # Blocks shrink to bound the dense scores held at once on large corpora
+        with patch('document_processor.MAX_BLOCK_SCORES', 2 * len(self.processor.chunks)):
+            self.assertEqual(self.processor.search_similar_content_batch(queries, k=3), batch_results)
+    
+    def test_filtered_search(self):
+        """Test that filters return the best matches among the filtered documents only"""
+        metadata = {
+            'investing': {'topics': ['investing'], 'date': '2024-01-15'},
+            'retirement': {'topics': ['retirement', 'tax'], 'date': '2024-06-01'},
+            'tax': {'topics': 'tax', 'date': '2025-02-01'}
+        }
+        self.processor.add_documents(SAMPLE_DOCUMENTS, metadata=metadata)
+        query = "tax accounts for retirement investments"
+        everything = self.processor.search_similar_content(query, k=6)
+        
+        def expected(sources):
+            return [r['content'] for r in everything if r['source'] in sources][:2]
+        
+        def found(**filters):
+            return [r['content'] for r in self.processor.search_similar_content(query, k=2, **filters)]
+        
+        self.assertEqual(found(sources='tax'), expected({'tax'}))
+        self.assertEqual(found(topics=['tax']), expected({'retirement', 'tax'}))
+        self.assertEqual(found(since='2024-02-01', until='2024-12-31'), expected({'retirement'}))
+        self.assertEqual(found(topics='tax', until='2024-12-31'), expected({'retirement'}))
+        self.assertEqual(found(sources='unknown'), [])
+        
+        batch = self.processor.search_similar_content_batch([query, "portfolio"], k=2, topics='tax')
+        self.assertEqual([r['content'] for r in batch[0]], expected({'retirement', 'tax'}))
+        
+        # Metadata follows document updates and snapshots
+        self.processor.set_document_metadata('investing', topics=['tax'])
+        self.assertEqual(found(topics='tax'), expected({'investing', 'retirement', 'tax'}))
+        self.processor.remove_document('tax')
+        self.assertNotIn('tax', self.processor.document_metadata)
+        index_path = os.path.join(self.test_dir, 'index')
+        self.processor.save(index_path)
+        loaded = SimpleDocumentProcessor.load(index_path)
+        self.assertEqual(loaded.document_metadata, self.processor.document_metadata)
+        self.assertEqual([r['source'] for r in loaded.search_similar_content(query, k=3, topics='retirement')],
+                         ['retirement', 'retirement'])
+    
+    def test_concurrent_search_during_updates(self):
+        """Test that searches running alongside index updates stay consistent"""
+        self.processor.add_documents(SAMPLE_DOCUMENTS)
+        errors = []
+        stop = threading.Event()
+        
+        def search_loop():
+            while not stop.is_set():
+                for result in self.processor.search_similar_content("tax accounts portfolio", k=3):
+                    if result['source'] not in self.processor.documents and not result['source'].startswith('extra'):
+                        errors.append(result)
+        
+        # Searches swallow exceptions, so any failure would show up as an error log
+        with self.assertNoLogs('document_processor', level='ERROR'):
+            threads = [threading.Thread(target=search_loop) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for i in range(30):
+                self.processor.add_documents({f'extra-{i}': [f"Extra note {i} about tax accounts and portfolio rebalancing."]})
+                if i % 3 == 0:
+                    self.processor.remove_document(f'extra-{i}')
+            stop.set()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(self.processor.vectors.shape[0], len(self.processor.document_chunks))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
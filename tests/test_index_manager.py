@@ -0,0 +1,95 @@
+import unittest
+import os
+import time
+import shutil
+import tempfile
+from fpdf import FPDF
+from chatbot import FinancialAdvisorRAG
+from index_manager import IndexReloader, load_build_options, load_sources
+
+def write_pdf(path, text):
+    """Write a single page PDF"""
+    pdf = FPDF()
+    pdf.set_font("Arial", size=12)
+    pdf.add_page()
+    pdf.multi_cell(0, 10, txt=text)
+    pdf.output(path)
+
+class TestIndexReloader(unittest.TestCase):
+    """Test cases for background index rebuilds"""
+    
+    def setUp(self):
+        """Create a document directory and an advisor serving an index built from it"""
+        self.test_dir = tempfile.mkdtemp()
+        write_pdf(os.path.join(self.test_dir, 'investing.pdf'),
+                  "Diversification across asset classes reduces portfolio risk.")
+        self.advisor = FinancialAdvisorRAG(None)
+        self.reloader = IndexReloader(self.advisor, self.test_dir, poll_interval=0.05,
+                                      ingest_options={'max_workers': 1})
+        self.reloader.rebuild()
+    
+    def tearDown(self):
+        """Clean up after each test"""
+        self.reloader.stop()
+        shutil.rmtree(self.test_dir)
+    
+    def test_change_triggers_swap(self):
+        """Test that a new document is picked up while the old index keeps answering"""
+        old_processor = self.advisor.document_processor
+        self.assertFalse(self.reloader.check_for_changes())
+        
+        write_pdf(os.path.join(self.test_dir, 'tax.pdf'), "Tax-loss harvesting offsets capital gains.")
+        self.assertTrue(self.reloader.check_for_changes())
+        
+        new_processor = self.advisor.document_processor
+        self.assertIsNot(new_processor, old_processor)
+        self.assertEqual(len(new_processor.documents), 2)
+        self.assertEqual(len(old_processor.documents), 1)
+        
+        # A query that started on the old index still completes against it
+        results = old_processor.search_similar_content("portfolio risk", k=1)
+        self.assertIn("Diversification", results[0]['content'])
+        self.assertIn("harvesting", new_processor.search_similar_content("tax harvesting", k=1)[0]['content'])
+    
+    def test_report(self):
+        """Test that build and swap durations are reported"""
+        report = self.reloader.last_report
+        self.assertEqual(report['documents'], 1)
+        self.assertGreater(report['chunks'], 0)
+        self.assertGreater(report['build_seconds'], 0)
+        self.assertGreaterEqual(report['swap_seconds'], 0)
+        self.assertEqual(self.reloader.rebuilds, 1)
+    
+    def test_snapshot_records_sources(self):
+        """Test that a saved snapshot lists the documents it was built from"""
+        snapshot_path = os.path.join(self.test_dir, 'index')
+        self.reloader.snapshot_path = snapshot_path
+        self.assertIsNone(load_sources(snapshot_path))
+        self.reloader.rebuild()
+        self.assertEqual(load_sources(snapshot_path), self.reloader.scan())
+        self.assertEqual(load_build_options(snapshot_path), {'max_features': 10000, 'dedup_threshold': None})
+    
+    def test_background_trigger(self):
+        """Test that the watcher thread rebuilds on an explicit trigger"""
+        self.reloader.poll_interval = 60
+        self.reloader.start()
+        self.reloader.trigger()
+        
+        deadline = time.monotonic() + 10
+        while self.reloader.rebuilds < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.reloader.rebuilds, 2)
+    
+    def test_background_polling(self):
+        """Test that the watcher thread notices new documents on its own"""
+        self.reloader.start()
+        write_pdf(os.path.join(self.test_dir, 'retirement.pdf'),
+                  "Retirement income should replace most of your salary.")
+        
+        deadline = time.monotonic() + 10
+        while len(self.advisor.document_processor.documents) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.advisor.document_processor.documents), 2)
+
+if __name__ == '__main__':
+    unittest.main()
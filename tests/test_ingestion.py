@@ -0,0 +1,92 @@
+import unittest
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+from fpdf import FPDF
+from document_processor import SimpleDocumentProcessor
+from ingestion import ingest_directory, ingest_files
+
+class TestIngestion(unittest.TestCase):
+    """Test cases for parallel PDF ingestion"""
+    
+    def setUp(self):
+        """Create a directory of test PDFs, including a multi-page and a corrupt one"""
+        self.test_dir = tempfile.mkdtemp()
+        contents = {
+            'a_investing.pdf': ["Diversification across asset classes reduces portfolio risk."],
+            'b_retirement.pdf': ["Retirement income should replace most of your salary.",
+                                 "Required minimum distributions begin at a set age.",
+                                 "Annuities can provide guaranteed lifetime income."],
+            'c_tax.pdf': ["Tax-loss harvesting offsets capital gains."]
+        }
+        for name, pages in contents.items():
+            pdf = FPDF()
+            pdf.set_font("Arial", size=12)
+            for page in pages:
+                pdf.add_page()
+                pdf.multi_cell(0, 10, txt=page)
+            pdf.output(os.path.join(self.test_dir, name))
+        
+        with open(os.path.join(self.test_dir, 'broken.pdf'), 'w') as f:
+            f.write("not a pdf")
+    
+    def tearDown(self):
+        """Clean up after each test"""
+        shutil.rmtree(self.test_dir)
+    
+    def test_failures_do_not_abort_batch(self):
+        """Test that a corrupt file is reported while the others are indexed"""
+        processor = SimpleDocumentProcessor()
+        report = ingest_directory(processor, self.test_dir, max_workers=1)
+        
+        self.assertEqual(report['files'], 3)
+        self.assertEqual(list(report['failed']), [os.path.join(self.test_dir, 'broken.pdf')])
+        self.assertEqual(report['pages'], 5)
+        self.assertEqual(len(processor.documents), 3)
+    
+    def test_parallel_matches_serial_order(self):
+        """Test that page ranges spread over a pool merge in a deterministic order"""
+        serial = SimpleDocumentProcessor()
+        ingest_directory(serial, self.test_dir, max_workers=1)
+        
+        parallel = SimpleDocumentProcessor()
+        report = ingest_directory(parallel, self.test_dir, max_workers=2, pages_per_task=1)
+        
+        self.assertEqual(parallel.document_chunks, serial.document_chunks)
+        self.assertEqual(parallel.chunk_sources, serial.chunk_sources)
+        self.assertEqual(report['chunks'], len(serial.document_chunks))
+        self.assertEqual([serial.chunks.provenance(row) for row in range(len(serial.chunks))],
+                         [parallel.chunks.provenance(row) for row in range(len(parallel.chunks))])
+    
+    def test_files_indexed_one_at_a_time(self):
+        """Test that each file is added to the index on its own, in sorted order"""
+        processor = SimpleDocumentProcessor()
+        with patch.object(processor, 'add_documents', wraps=processor.add_documents) as add_documents:
+            ingest_directory(processor, self.test_dir, max_workers=2, pages_per_task=1)
+        
+        added = [list(call.args[0]) for call in add_documents.call_args_list]
+        self.assertEqual(added, [[os.path.join(self.test_dir, name)]
+                                 for name in ('a_investing.pdf', 'b_retirement.pdf', 'c_tax.pdf')])
+    
+    def test_page_provenance(self):
+        """Test that chunks from page ranges extracted by different workers keep their page numbers"""
+        processor = SimpleDocumentProcessor()
+        retirement = os.path.join(self.test_dir, 'b_retirement.pdf')
+        ingest_files(processor, [retirement], max_workers=2, pages_per_task=1, chunk_size=40)
+        
+        pages = [processor.chunks.provenance(row)['page'] for row in range(len(processor.chunks))]
+        self.assertEqual(pages, [0, 1, 2])
+    
+    def test_throughput_report(self):
+        """Test that throughput statistics are reported"""
+        processor = SimpleDocumentProcessor()
+        paths = [os.path.join(self.test_dir, 'c_tax.pdf')]
+        report = ingest_files(processor, paths, max_workers=1)
+        
+        self.assertGreater(report['bytes'], 0)
+        self.assertGreater(report['pages_per_second'], 0)
+        self.assertGreater(report['mb_per_second'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
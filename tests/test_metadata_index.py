@@ -0,0 +1,50 @@
+import unittest
+import datetime
+import numpy as np
+from chunk_store import ChunkStore
+from metadata_index import MetadataIndex, as_date
+
+class TestMetadataIndex(unittest.TestCase):
+    """Test cases for the row sets behind filtered searches"""
+    
+    def setUp(self):
+        """Index interleaved chunks of three documents, one duplicate referencing a fourth"""
+        store = ChunkStore()
+        for doc_id in ('investing', 'tax', 'investing', 'retirement', 'tax'):
+            store.extend(doc_id, [f"{doc_id} chunk"])
+        store.add_reference(1, 'estate')
+        metadata = {
+            'investing': {'topics': ['investing'], 'date': '2023-05-01'},
+            'tax': {'topics': ['tax'], 'date': '2024-04-15'},
+            'retirement': {'topics': ['retirement', 'tax'], 'date': None},
+            'estate': {'topics': ['estate'], 'date': '2024-01-01'}
+        }
+        self.index = MetadataIndex(store.rows_by_source(), metadata)
+    
+    def test_rows_by_source_and_topic(self):
+        """Test that documents and topics resolve to sorted rows, including references"""
+        self.assertIsNone(self.index.rows())
+        np.testing.assert_array_equal(self.index.rows(sources='investing'), [0, 2])
+        np.testing.assert_array_equal(self.index.rows(sources=['estate', 'retirement']), [1, 3])
+        np.testing.assert_array_equal(self.index.rows(topics='tax'), [1, 3, 4])
+        self.assertEqual(len(self.index.rows(topics='crypto')), 0)
+    
+    def test_date_ranges(self):
+        """Test that date bounds are inclusive, accept dates and skip undated documents"""
+        np.testing.assert_array_equal(self.index.rows(since='2024-01-01'), [1, 4])
+        np.testing.assert_array_equal(self.index.rows(until=datetime.date(2024, 1, 1)), [0, 1, 2])
+        np.testing.assert_array_equal(self.index.rows(topics='tax', since=datetime.datetime(2024, 4, 15, 12)), [1, 4])
+        np.testing.assert_array_equal(self.index.rows(since='20240101'), [1, 4])
+    
+    def test_as_date(self):
+        """Test that dates are parsed into YYYY-MM-DD and malformed dates rejected"""
+        self.assertEqual(as_date('20240301'), '2024-03-01')
+        self.assertEqual(as_date('2024-03-01T09:30:00'), '2024-03-01')
+        self.assertEqual(as_date(datetime.datetime(2024, 3, 1, 23, 59)), '2024-03-01')
+        self.assertEqual(as_date(datetime.date(2024, 3, 1)), '2024-03-01')
+        for value in ('soon', '2024-13-01', 20240301.5):
+            with self.assertRaises(ValueError):
+                as_date(value)
+
+if __name__ == '__main__':
+    unittest.main()
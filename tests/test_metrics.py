@@ -0,0 +1,78 @@
+import unittest
+from metrics import Histogram, MetricsRegistry, REGISTRY
+from document_processor import SimpleDocumentProcessor
+from chatbot import FinancialAdvisorRAG
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for pipeline metrics"""
+    
+    def setUp(self):
+        """Set up an empty registry"""
+        self.registry = MetricsRegistry()
+    
+    def test_histogram_quantiles(self):
+        """Test that quantiles are interpolated within buckets"""
+        histogram = Histogram((1.0, 2.0, 4.0))
+        for value in (0.5, 1.5, 1.5, 3.0, 10.0):
+            histogram.observe(value)
+        
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 5)
+        self.assertEqual(snapshot['sum'], 16.5)
+        self.assertEqual(snapshot['buckets'], {1.0: 1, 2.0: 3, 4.0: 4})
+        self.assertAlmostEqual(snapshot['p50'], 1.75)
+        self.assertEqual(snapshot['p99'], 4.0)
+    
+    def test_counters_and_timers(self):
+        """Test that counters and stage timers are keyed by labels"""
+        self.registry.inc('queries')
+        self.registry.inc('queries', 2)
+        self.registry.inc('errors', stage='response')
+        with self.registry.timer('scoring'):
+            pass
+        
+        snapshot = self.registry.snapshot()
+        self.assertEqual(snapshot['counters'], {'errors{stage="response"}': 1, 'queries': 3})
+        self.assertEqual(snapshot['histograms']['stage_seconds{stage="scoring"}']['count'], 1)
+    
+    def test_disabled_registry_records_nothing(self):
+        """Test that a disabled registry ignores every call"""
+        registry = MetricsRegistry(enabled=False)
+        registry.inc('queries')
+        registry.observe('query_seconds', 0.1)
+        with registry.timer('scoring'):
+            pass
+        self.assertEqual(registry.snapshot(), {'counters': {}, 'histograms': {}})
+    
+    def test_prometheus_format(self):
+        """Test the text exposition format"""
+        self.registry.inc('queries', 3)
+        self.registry.observe('stage_seconds', 0.0002, stage='top_k')
+        text = self.registry.to_prometheus()
+        
+        self.assertIn('# TYPE rag_queries counter\nrag_queries 3\n', text)
+        self.assertIn('# TYPE rag_stage_seconds histogram\n', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="top_k",le="0.0001"} 0\n', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="top_k",le="0.00025"} 1\n', text)
+        self.assertIn('rag_stage_seconds_bucket{stage="top_k",le="+Inf"} 1\n', text)
+        self.assertIn('rag_stage_seconds_count{stage="top_k"} 1\n', text)
+    
+    def test_pipeline_stages_recorded(self):
+        """Test that a query is attributed to each retrieval and composition stage"""
+        processor = SimpleDocumentProcessor()
+        processor.add_documents({'investing': ["Diversification across asset classes reduces portfolio risk "
+                                               "over long investment horizons."]})
+        advisor = FinancialAdvisorRAG(processor)
+        
+        REGISTRY.reset()
+        advisor.generate_response("How do I reduce portfolio risk?")
+        
+        histograms = REGISTRY.snapshot()['histograms']
+        for stage in ('vectorization', 'query_transform', 'scoring', 'top_k', 'composition'):
+            self.assertGreater(histograms[f'stage_seconds{{stage="{stage}"}}']['count'], 0, stage)
+        self.assertEqual(histograms['query_seconds']['count'], 1)
+        self.assertEqual(histograms['response_seconds']['count'], 1)
+        self.assertEqual(histograms['result_score']['count'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from query_cache import QueryCache, normalize_query
+
+class FakeClock:
+    """Manually advanced clock for TTL tests"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class TestQueryCache(unittest.TestCase):
+    """Test cases for the QueryCache class"""
+    
+    def setUp(self):
+        """Set up a small cache with a controllable clock"""
+        self.clock = FakeClock()
+        self.cache = QueryCache(max_entries=2, ttl=10.0, clock=self.clock)
+    
+    def test_normalize_query(self):
+        """Test that case, whitespace and trailing punctuation are ignored"""
+        self.assertEqual(normalize_query("  How should I   DIVERSIFY?"), "how should i diversify")
+        self.assertEqual(normalize_query("Roth vs traditional IRA"), normalize_query("roth vs traditional ira."))
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.cache.put('c', 3)
+        
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+    
+    def test_ttl_expiry(self):
+        """Test that entries expire after their time-to-live"""
+        self.cache.put('a', 1)
+        self.clock.now = 5.0
+        self.assertEqual(self.cache.get('a'), 1)
+        self.clock.now = 11.0
+        self.assertEqual(self.cache.get('a', 'missing'), 'missing')
+        self.assertEqual(len(self.cache), 0)
+    
+    def test_stats(self):
+        """Test hit and miss accounting"""
+        self.cache.put('a', None)
+        self.assertIsNone(self.cache.get('a', 'missing'))
+        self.cache.get('b')
+        
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
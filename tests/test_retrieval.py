@@ -0,0 +1,165 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from document_processor import SimpleDocumentProcessor
+from retrieval import (top_k_indices, top_k_rows, ranking_agreement, AppendedRowsSearcher, ExactSearcher,
+                       InvertedIndex, QuantizedIndex, ShardedSearcher)
+
+class TestRetrieval(unittest.TestCase):
+    """Test cases for the retrieval backends"""
+    
+    def setUp(self):
+        """Build a random normalized TF-IDF-like matrix"""
+        self.rng = np.random.default_rng(42)
+        self.vectors = normalize(sp.random(500, 300, density=0.05, random_state=self.rng, format='csr'))
+    
+    def test_top_k_breaks_ties_by_index(self):
+        """Test that partial selection orders ties deterministically"""
+        scores = np.array([0.5, 0.9, 0.5, 0.1, 0.5])
+        np.testing.assert_array_equal(top_k_indices(scores, 3), [1, 0, 2])
+        np.testing.assert_array_equal(top_k_indices(scores, 10), [1, 0, 2, 4, 3])
+        self.assertEqual(len(top_k_indices(scores, 0)), 0)
+    
+    def test_top_k_rows_matches_per_row_selection(self):
+        """Test that vectorized per-row selection matches top_k_indices row by row"""
+        scores = np.round(self.rng.random((20, 50)), 1)
+        indices, values = top_k_rows(scores, 4)
+        for row in range(20):
+            np.testing.assert_array_equal(indices[row], top_k_indices(scores[row], 4))
+            np.testing.assert_array_equal(values[row], scores[row][indices[row]])
+    
+    def test_inverted_index_matches_exact(self):
+        """Test that pruned inverted-index retrieval returns the exact top k"""
+        exact = ExactSearcher(self.vectors)
+        inverted = InvertedIndex(self.vectors)
+        for _ in range(50):
+            query = normalize(sp.random(1, 300, density=0.03, random_state=self.rng, format='csr'))
+            for k in (1, 3, 10):
+                expected_rows, expected_scores = exact.search(query, k)
+                rows, scores = inverted.search(query, k)
+                np.testing.assert_array_equal(rows, expected_rows)
+                np.testing.assert_allclose(scores, expected_scores)
+    
+    def test_inverted_index_pads_sparse_matches(self):
+        """Test that queries matching fewer than k rows are padded like the exact path"""
+        query = sp.csr_matrix(([1.0], ([0], [self.vectors.indices[0]])), shape=(1, 300))
+        rows, scores = InvertedIndex(self.vectors).search(query, 500)
+        expected_rows, _ = ExactSearcher(self.vectors).search(query, 500)
+        np.testing.assert_array_equal(rows, expected_rows)
+    
+    def test_appended_rows_match_exact(self):
+        """Test that a backend built on the leading rows plus exact scoring of new rows matches exact search"""
+        # The first 300 rows predate terms 250 and up
+        vectors = self.vectors.tolil()
+        vectors[:300, 250:] = 0
+        vectors = normalize(vectors.tocsr())
+        appended = AppendedRowsSearcher(InvertedIndex(vectors[:300, :250]), vectors)
+        exact = ExactSearcher(vectors)
+        for _ in range(30):
+            query = normalize(sp.random(1, 300, density=0.03, random_state=self.rng, format='csr'))
+            for k in (1, 10):
+                expected_rows, expected_scores = exact.search(query, k)
+                rows, scores = appended.search(query, k)
+                np.testing.assert_array_equal(rows, expected_rows)
+                np.testing.assert_allclose(scores, expected_scores)
+    
+    def test_sharded_matches_exact(self):
+        """Test that merging per-shard top k lists reproduces the single-index results exactly"""
+        exact = ExactSearcher(self.vectors)
+        sharded = ShardedSearcher(self.vectors, num_shards=3)
+        try:
+            self.assertEqual(sharded.shard_bounds, [(0, 166), (166, 333), (333, 500)])
+            for _ in range(20):
+                query = normalize(sp.random(1, 300, density=0.03, random_state=self.rng, format='csr'))
+                for k in (1, 10, 600):
+                    expected_rows, expected_scores = exact.search(query, k)
+                    rows, scores = sharded.search(query, k)
+                    np.testing.assert_array_equal(rows, expected_rows)
+                    np.testing.assert_array_equal(scores, expected_scores)
+        finally:
+            sharded.close()
+        self.assertFalse(any(worker.is_alive() for worker in sharded._workers))
+    
+    def test_sharded_concurrent_requests(self):
+        """Test that requests sharing the shard workers over separate pipes get their own results"""
+        exact = ExactSearcher(self.vectors)
+        queries = [normalize(sp.random(1, 300, density=0.03, random_state=self.rng, format='csr'))
+                   for _ in range(40)]
+        sharded = ShardedSearcher(self.vectors, num_shards=2, num_channels=3)
+        try:
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                results = list(executor.map(lambda query: sharded.search(query, 5), queries))
+        finally:
+            sharded.close()
+        for query, (rows, scores) in zip(queries, results):
+            expected_rows, expected_scores = exact.search(query, 5)
+            np.testing.assert_array_equal(rows, expected_rows)
+            np.testing.assert_array_equal(scores, expected_scores)
+        self.assertFalse(any(worker.is_alive() for worker in sharded._workers))
+    
+    def test_quantized_rankings_agree(self):
+        """Test that quantized postings are smaller and rank like the float64 matrix"""
+        queries = normalize(sp.random(50, 300, density=0.03, random_state=self.rng, format='csr'))
+        reference = ExactSearcher(self.vectors)
+        float64_bytes = self.vectors.data.nbytes + self.vectors.indices.nbytes + self.vectors.indptr.nbytes
+        
+        previous_bytes = float64_bytes
+        for precision, min_overlap in (('uint16', 0.99), ('uint8', 0.95)):
+            searcher = QuantizedIndex.from_vectors(self.vectors, precision)
+            self.assertLess(searcher.nbytes, previous_bytes)
+            previous_bytes = searcher.nbytes
+            
+            report = ranking_agreement(reference, searcher, queries, k=10)
+            self.assertEqual(report['queries'], 50)
+            self.assertGreaterEqual(report['mean_overlap'], min_overlap, precision)
+            self.assertLess(report['max_score_error'], 0.01)
+        
+        with self.assertRaises(ValueError):
+            QuantizedIndex.from_vectors(self.vectors, 'int4')
+    
+    def test_quantized_updates_match_rebuild(self):
+        """Test that appending, dropping and scoring quantized rows matches quantizing from scratch"""
+        head = self.vectors[:300, :250]
+        index = QuantizedIndex.from_vectors(head, 'uint8').append(self.vectors[300:])
+        padded = sp.hstack([head, sp.csr_matrix((300, 50))])
+        rebuilt = QuantizedIndex.from_vectors(sp.vstack([padded, self.vectors[300:]]).tocsr(), 'uint8')
+        np.testing.assert_allclose(index.tocsr().toarray(), rebuilt.tocsr().toarray())
+        
+        keep = self.rng.random(500) < 0.7
+        np.testing.assert_allclose(index.keep_rows(keep).tocsr().toarray(), rebuilt.tocsr().toarray()[keep])
+        
+        queries = normalize(sp.random(8, 300, density=0.03, random_state=self.rng, format='csr'))
+        rows = np.flatnonzero(keep)
+        dequantized = rebuilt.tocsr()
+        np.testing.assert_allclose(rebuilt.score_block(queries, rows), (queries @ dequantized[rows].T).toarray())
+        np.testing.assert_allclose(rebuilt.score(queries[0]), dequantized.dot(queries[0].toarray()[0]))
+    
+    def test_processor_backends_agree(self):
+        """Test that the processor returns identical results with either backend"""
+        documents = {
+            'investing': ["Diversify your portfolio across stocks and bonds.",
+                          "Rebalance the portfolio when allocations drift."],
+            'tax': ["Harvest tax losses to offset capital gains.",
+                    "Hold bonds in tax-advantaged accounts."]
+        }
+        exact = SimpleDocumentProcessor(search_backend='exact')
+        inverted = SimpleDocumentProcessor(search_backend='inverted')
+        sharded = SimpleDocumentProcessor(search_backend='sharded', search_options={'num_shards': 2})
+        exact.add_documents(documents)
+        inverted.add_documents(documents)
+        sharded.add_documents(documents)
+        sharded.prepare()
+        
+        for query in ["portfolio bonds", "tax losses", "unrelated words"]:
+            expected = exact.search_similar_content(query, k=3)
+            self.assertEqual(inverted.search_similar_content(query, k=3), expected)
+            self.assertEqual(sharded.search_similar_content(query, k=3), expected)
+        sharded.close()
+        
+        with self.assertRaises(ValueError):
+            SimpleDocumentProcessor(search_backend='unknown')
+
+if __name__ == '__main__':
+    unittest.main()
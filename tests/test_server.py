@@ -0,0 +1,163 @@
+import unittest
+import json
+import time
+import asyncio
+import threading
+from unittest.mock import MagicMock
+from server import ChatServer
+from metrics import REGISTRY
+
+async def send_request(port, method, path, payload=None):
+    """Send one HTTP request and return the status code and decoded body"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    
+    head, _, content = raw.partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    if b'application/json' not in head:
+        return status, content.decode('utf-8')
+    return status, json.loads(content)
+
+class TestChatServer(unittest.TestCase):
+    """Test cases for the asyncio ChatServer"""
+    
+    def setUp(self):
+        """Set up a mock advisor"""
+        self.advisor = MagicMock()
+        self.advisor.generate_response.side_effect = lambda query, session_id: f"answer to {query}"
+        self.advisor.cache.stats.return_value = {'hits': 0}
+        self.advisor.conversations.stats.return_value = {'sessions': 0}
+    
+    def run_with_server(self, scenario, **kwargs):
+        """Run a coroutine against a started server on a free port"""
+        async def runner():
+            server = ChatServer(self.advisor, port=0, **kwargs)
+            await server.start()
+            try:
+                return await scenario(server)
+            finally:
+                await server.close()
+        return asyncio.run(runner())
+    
+    def test_chat_endpoint(self):
+        """Test that chat requests are answered with the session id"""
+        async def scenario(server):
+            return await send_request(server.port, 'POST', '/chat', {'query': 'How do bonds work?', 'session_id': 'alice'})
+        
+        status, payload = self.run_with_server(scenario)
+        self.assertEqual(status, 200)
+        self.assertEqual(payload['response'], 'answer to How do bonds work?')
+        self.assertEqual(payload['session_id'], 'alice')
+        self.advisor.generate_response.assert_called_once_with('How do bonds work?', 'alice')
+    
+    def test_concurrent_requests(self):
+        """Test that many clients are served concurrently"""
+        async def scenario(server):
+            requests = [send_request(server.port, 'POST', '/chat', {'query': f'q{i}'}) for i in range(20)]
+            return await asyncio.gather(*requests), server.stats()
+        
+        responses, stats = self.run_with_server(scenario, max_workers=4)
+        self.assertEqual([status for status, _ in responses], [200] * 20)
+        self.assertEqual(sorted(payload['response'] for _, payload in responses),
+                         sorted(f'answer to q{i}' for i in range(20)))
+        self.assertEqual(stats['requests'], 20)
+    
+    def test_bad_requests(self):
+        """Test error responses for unknown paths, wrong methods and missing queries"""
+        async def scenario(server):
+            return [
+                await send_request(server.port, 'GET', '/missing'),
+                await send_request(server.port, 'GET', '/chat'),
+                await send_request(server.port, 'POST', '/chat', {'session_id': 'alice'}),
+                await send_request(server.port, 'GET', '/health')
+            ]
+        
+        statuses = [status for status, _ in self.run_with_server(scenario)]
+        self.assertEqual(statuses, [404, 405, 400, 200])
+    
+    def test_error_statuses(self):
+        """Test that malformed requests get 400 and failures inside the server 500"""
+        self.advisor.generate_response.side_effect = RuntimeError("index unavailable")
+        
+        async def raw_request(port, request):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            writer.write_eof()
+            raw = await reader.read()
+            writer.close()
+            return int(raw.split()[1])
+        
+        async def scenario(server):
+            return [
+                await send_request(server.port, 'POST', '/chat', {'query': 'q'}),
+                await raw_request(server.port, b"POST /chat HTTP/1.1\r\nContent-Length: ten\r\n\r\n"),
+                await raw_request(server.port, b"POST /chat HTTP/1.1\r\nContent-Length: 50\r\n\r\n{}")
+            ]
+        
+        (status, payload), *malformed = self.run_with_server(scenario)
+        self.assertEqual((status, payload['error']), (500, 'Internal server error'))
+        self.assertEqual(malformed, [400, 400])
+    
+    def test_chat_filters(self):
+        """Test that search filters are passed to the advisor and unknown filters rejected"""
+        self.advisor.generate_response.side_effect = lambda query, session_id, filters: f"{filters['topics']}"
+        
+        async def scenario(server):
+            return [
+                await send_request(server.port, 'POST', '/chat', {'query': 'q', 'filters': filters})
+                for filters in ({'topics': ['tax']}, {'topics': 'tax', 'since': '20240101'}, {'color': 'red'},
+                                {'topics': 5}, {'sources': ['a.pdf', 3]}, {'since': 5}, {'until': 'soon'})
+            ]
+        
+        (status, payload), (string_status, _), *bad = self.run_with_server(scenario)
+        self.assertEqual((status, payload['response']), (200, "['tax']"))
+        self.assertEqual(string_status, 200)
+        self.assertEqual(self.advisor.generate_response.call_args_list[1].args[2]['since'], '2024-01-01')
+        self.assertEqual([bad_status for bad_status, _ in bad], [400] * 5)
+    
+    def test_metrics_endpoint(self):
+        """Test that pipeline metrics are exported as Prometheus text"""
+        async def scenario(server):
+            return await send_request(server.port, 'GET', '/metrics')
+        
+        REGISTRY.inc('queries')
+        status, text = self.run_with_server(scenario)
+        self.assertEqual(status, 200)
+        self.assertIn('# TYPE rag_queries counter', text)
+    
+    def test_backpressure_and_timeout(self):
+        """Test that excess requests are rejected and slow ones time out"""
+        release = threading.Event()
+        
+        def slow_response(query, session_id):
+            release.wait(5)
+            return "late answer"
+        self.advisor.generate_response.side_effect = slow_response
+        
+        async def scenario(server):
+            slow = asyncio.ensure_future(send_request(server.port, 'POST', '/chat', {'query': 'slow'}))
+            while server.in_flight < 1:
+                await asyncio.sleep(0.01)
+            rejected = await send_request(server.port, 'POST', '/chat', {'query': 'extra'})
+            timed_out = await slow
+            # The timed-out worker still holds its slot until it finishes
+            busy = await send_request(server.port, 'POST', '/chat', {'query': 'while busy'})
+            self.assertEqual(busy[0], 503)
+            self.assertEqual(server.in_flight, 1)
+            release.set()
+            while server.in_flight:
+                await asyncio.sleep(0.01)
+            return rejected, timed_out, server.stats()
+        
+        rejected, timed_out, stats = self.run_with_server(scenario, max_pending=1, request_timeout=0.5)
+        self.assertEqual(rejected[0], 503)
+        self.assertEqual(timed_out[0], 504)
+        self.assertEqual(stats['rejected'], 2)
+        self.assertEqual(stats['timeouts'], 1)
+
+if __name__ == '__main__':
+    unittest.main()